@@ -0,0 +1,178 @@
+import asyncio
+import collections
+import concurrent.futures
+import queue
+import sys
+import threading
+
+__author__ = "Pierre Monnin"
+
+
+class AsyncServerManager:
+    """
+    Sends the queries of a ServerManager concurrently from an asyncio event loop running in a background thread.
+    This is not asynchronous I/O: requests is blocking, so each query runs in a thread of the executor of the loop (a
+    thread pool of max_concurrent_queries threads, which caps the number of queries running at the same time) and the
+    loop only schedules them. Rows are streamed to the caller in chunks through a bounded queue for each query. It must
+    be closed (see close) once the edges are consumed
+    """
+
+    # Edges are yielded as pairs of URIs, interned by RDFGraph
+    INTERNED_EDGES = False
+
+    # Maximum number of chunks of rows of a query received but not consumed yet
+    _MAX_PENDING_CHUNKS = 10
+
+    def __init__(self, server_manager, max_concurrent_queries):
+        """
+        Builds the AsyncServerManager and starts its event loop
+        :param server_manager: the server manager object used to send each query (its HTTP connections are shared)
+        :param max_concurrent_queries: maximum number of queries running at the same time
+        """
+
+        self._server_manager = server_manager
+        self._max_concurrent_queries = max_concurrent_queries
+        # Rows are sent to the caller in chunks of the size of a page
+        self._chunk_size = server_manager.max_rows
+
+        self._executor = concurrent.futures.ThreadPoolExecutor(max_workers=max_concurrent_queries)
+        self._loop = asyncio.new_event_loop()
+        self._loop.set_default_executor(self._executor)
+        self._loop_thread = threading.Thread(target=self._loop.run_forever, daemon=True)
+        self._loop_thread.start()
+
+        # Queries scheduled in the loop, and event stopping the queries still running once closed
+        self._queries = []
+        self._closed = threading.Event()
+
+    def _put(self, results, item):
+        """
+        Puts an item in the queue of the results of a query, waiting for the caller to consume previous items
+        :param results: the queue of the results of the query
+        :param item: a chunk of rows, an exception or None (end of the results)
+        :return: false if the AsyncServerManager was closed before the item was put
+        """
+
+        while not self._closed.is_set():
+            try:
+                results.put(item, timeout=0.1)
+                return True
+
+            except queue.Full:
+                pass
+
+        return False
+
+    def _stream_rows(self, where_clause, results):
+        """
+        Queries the pairs of elements matching the where clause and puts them in chunks in the queue of results,
+        followed by None, or the exception raised by the query
+        :param where_clause: the where clause of the query
+        :param results: the queue of the results of the query
+        """
+
+        try:
+            chunk = []
+
+            for row in self._server_manager.query_two_elements_stream(where_clause):
+                chunk.append(row)
+
+                if len(chunk) == self._chunk_size:
+                    if not self._put(results, chunk):
+                        return
+
+                    chunk = []
+
+            if self._put(results, chunk):
+                self._put(results, None)
+
+        except Exception as e:
+            self._put(results, e)
+
+    async def query_two_elements(self, where_clause, results):
+        """
+        Coroutine querying the pairs of elements matching the where clause in a thread of the executor of the loop
+        :param where_clause: the where clause of the query
+        :param results: the queue receiving the chunks of pairs of elements matching the where clause (see _put)
+        """
+
+        await self._loop.run_in_executor(None, self._stream_rows, where_clause, results)
+
+    @staticmethod
+    def _get_rows(results):
+        """
+        Returns a generator of the rows of a query, as they are received
+        :param results: the queue of the results of the query
+        :return: generator of the pairs of elements of the query
+        """
+
+        while True:
+            chunk = results.get()
+
+            if chunk is None:
+                return
+
+            elif isinstance(chunk, Exception):
+                raise chunk
+
+            for row in chunk:
+                yield row
+
+    def query_predicates_edges(self, predicates, verbose=False):
+        """
+        Returns a generator of the edges of each predicate (results of query_two_elements), in order. Queries are sent
+        concurrently while previous results are processed by the caller, and their rows are yielded as they arrive. At
+        most _MAX_PENDING_CHUNKS chunks of rows of each query are received but not consumed, which bounds the memory
+        used by results waiting to be processed
+        :param predicates: list of predicates URIs
+        :param verbose: unused, progress bars of concurrent queries are not displayed
+        :return: generator of the generators of pairs of elements linked by each predicate (in order)
+        """
+
+        pending_results = collections.deque()
+
+        for predicate in predicates:
+            results = queue.Queue(self._MAX_PENDING_CHUNKS)
+            self._queries.append(asyncio.run_coroutine_threadsafe(
+                self.query_two_elements("?e1 <%s> ?e2 . " % predicate, results), self._loop
+            ))
+            pending_results.append(results)
+
+            if len(pending_results) == self._max_concurrent_queries:
+                yield self._get_rows(pending_results.popleft())
+
+        while len(pending_results) != 0:
+            yield self._get_rows(pending_results.popleft())
+
+    def close(self, cancel=False):
+        """
+        Stops the event loop and its executor
+        :param cancel: if true (e.g., on errors), queries not started yet are cancelled and running queries stop at
+        their next chunk of rows, without waiting for them
+        """
+
+        self._closed.set()
+
+        if cancel:
+            for query in self._queries:
+                query.cancel()
+
+            # Queries are cancelled in the loop before it is stopped
+            self._loop.call_soon_threadsafe(self._loop.call_soon, self._loop.stop)
+
+            if sys.version_info >= (3, 9):
+                self._executor.shutdown(wait=False, cancel_futures=True)
+
+            else:
+                self._executor.shutdown(wait=False)
+
+        else:
+            # Queries end once their last rows are consumed
+            concurrent.futures.wait(self._queries)
+            self._loop.call_soon_threadsafe(self._loop.stop)
+
+        self._loop_thread.join()
+        self._loop.close()
+
+        if not cancel:
+            self._executor.shutdown()
@@ -1,3 +1,5 @@
+import array
+
 __author__ = "Pierre Monnin"
 
 
@@ -6,6 +8,9 @@ class CacheManager:
         self._cache = {}
         self._inverse_cache = []
 
+        # Prefix index: indices of the elements sorted by element, new elements are merged into it when needed
+        self._sorted_indices = array.array('l')
+
     def get_element_index(self, element):
         if element not in self._cache:
             self._cache[element] = len(self._cache)
@@ -25,12 +30,63 @@ class CacheManager:
     def get_size(self):
         return len(self._cache)
 
+    def _bisect_left(self, start_string, low=0):
+        """
+        Returns the position in the prefix index of the first element >= start_string
+        :param start_string: the string searched
+        :param low: the position from which the element is searched
+        :return: the position of the first element >= start_string
+        """
+
+        high = len(self._sorted_indices)
+        while low < high:
+            middle = (low + high) // 2
+
+            if self._inverse_cache[self._sorted_indices[middle]] < start_string:
+                low = middle + 1
+
+            else:
+                high = middle
+
+        return low
+
+    def _update_prefix_index(self):
+        nb_indexed_elements = len(self._sorted_indices)
+
+        if nb_indexed_elements != len(self._inverse_cache):
+            # Only the new elements are sorted, then merged with the sorted elements
+            new_indices = sorted(range(nb_indexed_elements, len(self._inverse_cache)),
+                                 key=self._inverse_cache.__getitem__)
+
+            if len(new_indices) * 64 < nb_indexed_elements:
+                # Few new elements are inserted at their positions (binary search), runs between them are copied
+                sorted_indices = array.array('l')
+                position = 0
+                for i in new_indices:
+                    next_position = self._bisect_left(self._inverse_cache[i], position)
+                    sorted_indices.extend(self._sorted_indices[position:next_position])
+                    sorted_indices.append(i)
+                    position = next_position
+
+                sorted_indices.extend(self._sorted_indices[position:])
+                self._sorted_indices = sorted_indices
+
+            else:
+                # Both sorted runs are merged by the sort
+                self._sorted_indices = array.array('l', sorted(self._sorted_indices.tolist() + new_indices,
+                                                               key=self._inverse_cache.__getitem__))
+
     def get_element_indexes_from_start_string(self, start_string):
-        ret_val = set()
+        self._update_prefix_index()
+
+        # Elements starting with start_string are contiguous in the sorted elements, from the first one >= start_string
+        position = self._bisect_left(start_string)
 
-        for e in self._cache:
-            if e.startswith(start_string):
-                ret_val.add(self._cache[e])
+        ret_val = set()
+        while position < len(self._sorted_indices) and \
+                self._inverse_cache[self._sorted_indices[position]].startswith(start_string):
+            ret_val.add(self._sorted_indices[position])
+            position += 1
 
         return ret_val
 
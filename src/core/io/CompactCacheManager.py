@@ -0,0 +1,188 @@
+import array
+import zlib
+
+__author__ = "Pierre Monnin"
+
+
+class CompactCacheManager:
+    """
+    CacheManager (URI <-> index) storing URIs compactly. Each URI is split into a namespace (up to its last '/', '#' or
+    ':') and a local name. Namespaces are few and stored once, local names are stored as UTF-8 bytes in one contiguous
+    buffer with an array of offsets. The URI -> index mapping is an open-addressing hash table (linear probing) of
+    indices, using the CRC32 of each URI (stored to resize the table without hashing URIs again).
+    It has the same API as CacheManager
+    """
+
+    _SEPARATORS = "/#:"
+
+    def __init__(self):
+        self._namespaces = []
+        self._namespaces_ids = {}
+
+        # Element i: namespace _namespaces[_elements_namespaces[i]] and local name
+        # _local_names[_offsets[i]:_offsets[i + 1]]
+        self._elements_namespaces = array.array('i')
+        self._local_names = bytearray()
+        self._offsets = array.array('q', [0])
+        self._hashes = array.array('I')
+
+        # Hash table: 0 is an empty slot, i + 1 is element i
+        self._table = array.array('i', [0]) * 1024
+        self._mask = len(self._table) - 1
+
+        # Prefix index: for each namespace, the indices of its elements sorted by local name (UTF-8 bytes order is the
+        # code points order), rebuilt when new elements were added
+        self._prefix_index = []
+        self._prefix_index_size = 0
+
+    @classmethod
+    def _split(cls, element):
+        """
+        Splits an element into its namespace and its local name
+        :param element: the element (URI)
+        :return: a tuple (namespace, local name)
+        """
+
+        split_position = max(element.rfind(separator) for separator in cls._SEPARATORS) + 1
+        return element[:split_position], element[split_position:]
+
+    def _find(self, namespace_id, local_name, element_hash):
+        """
+        Finds the slot of an element in the hash table
+        :param namespace_id: the id of the namespace of the element
+        :param local_name: the UTF-8 bytes of the local name of the element
+        :param element_hash: the hash of the element
+        :return: the slot containing the element or the empty slot where it should be inserted
+        """
+
+        slot = element_hash & self._mask
+
+        while True:
+            i = self._table[slot] - 1
+
+            if i == -1 or (self._hashes[i] == element_hash and self._elements_namespaces[i] == namespace_id and
+                           self._local_names[self._offsets[i]:self._offsets[i + 1]] == local_name):
+                return slot
+
+            slot = (slot + 1) & self._mask
+
+    def _resize(self):
+        """
+        Doubles the size of the hash table and inserts all elements again
+        """
+
+        self._table = array.array('i', [0]) * (2 * len(self._table))
+        self._mask = len(self._table) - 1
+
+        for i, element_hash in enumerate(self._hashes):
+            slot = element_hash & self._mask
+
+            while self._table[slot] != 0:
+                slot = (slot + 1) & self._mask
+
+            self._table[slot] = i + 1
+
+    def _lookup(self, element):
+        """
+        Looks an element up
+        :param element: the element (URI)
+        :return: a tuple (slot, namespace id or -1 if the namespace is unknown, namespace, local name bytes, hash)
+        """
+
+        namespace, local_name = self._split(element)
+        local_name = local_name.encode("utf-8")
+        element_hash = zlib.crc32(local_name, zlib.crc32(namespace.encode("utf-8")))
+
+        namespace_id = self._namespaces_ids.get(namespace, -1)
+        slot = self._find(namespace_id, local_name, element_hash) if namespace_id != -1 else -1
+
+        return slot, namespace_id, namespace, local_name, element_hash
+
+    def get_element_index(self, element):
+        slot, namespace_id, namespace, local_name, element_hash = self._lookup(element)
+
+        if slot != -1 and self._table[slot] != 0:
+            return self._table[slot] - 1
+
+        # New element
+        if namespace_id == -1:
+            namespace_id = len(self._namespaces)
+            self._namespaces.append(namespace)
+            self._namespaces_ids[namespace] = namespace_id
+            slot = self._find(namespace_id, local_name, element_hash)
+
+        index = len(self._hashes)
+        self._elements_namespaces.append(namespace_id)
+        self._local_names += local_name
+        self._offsets.append(len(self._local_names))
+        self._hashes.append(element_hash)
+        self._table[slot] = index + 1
+
+        # Load factor kept under 1/2
+        if 2 * len(self._hashes) > len(self._table):
+            self._resize()
+
+        return index
+
+    def get_element_from_index(self, index):
+        if index >= len(self._hashes):
+            return ""
+
+        return self._namespaces[self._elements_namespaces[index]] + \
+            self._local_names[self._offsets[index]:self._offsets[index + 1]].decode("utf-8")
+
+    def is_element_in_cache(self, element):
+        slot = self._lookup(element)[0]
+        return slot != -1 and self._table[slot] != 0
+
+    def get_size(self):
+        return len(self._hashes)
+
+    def _get_local_name(self, index):
+        return self._local_names[self._offsets[index]:self._offsets[index + 1]]
+
+    def _update_prefix_index(self):
+        if self._prefix_index_size != len(self._hashes):
+            namespaces_elements = [array.array('i') for _ in self._namespaces]
+            for i, namespace_id in enumerate(self._elements_namespaces):
+                namespaces_elements[namespace_id].append(i)
+
+            self._prefix_index = [array.array('i', sorted(elements, key=self._get_local_name))
+                                  for elements in namespaces_elements]
+            self._prefix_index_size = len(self._hashes)
+
+    def get_element_indexes_from_start_string(self, start_string):
+        self._update_prefix_index()
+
+        ret_val = set()
+        for namespace_id, namespace in enumerate(self._namespaces):
+            if namespace.startswith(start_string):
+                ret_val.update(self._prefix_index[namespace_id])
+
+            elif start_string.startswith(namespace):
+                # Local names starting with the rest of start_string are contiguous, from the first one >= it
+                local_start = start_string[len(namespace):].encode("utf-8")
+                elements = self._prefix_index[namespace_id]
+
+                low, high = 0, len(elements)
+                while low < high:
+                    middle = (low + high) // 2
+
+                    if self._get_local_name(elements[middle]) < local_start:
+                        low = middle + 1
+
+                    else:
+                        high = middle
+
+                while low < len(elements) and self._get_local_name(elements[low]).startswith(local_start):
+                    ret_val.add(elements[low])
+                    low += 1
+
+        return ret_val
+
+    def __str__(self):
+        retval = "-- CompactCacheManager --\n"
+        for i in range(0, len(self._hashes)):
+            retval += self.get_element_from_index(i) + " <=> " + str(i) + "\n"
+        retval += "--"
+        return retval
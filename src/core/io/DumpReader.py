@@ -0,0 +1,247 @@
+import array
+import gzip
+import hashlib
+import logging
+import re
+
+import rdflib
+import rdflib.store
+import tqdm
+
+__author__ = "Pierre Monnin"
+
+
+class DumpReader:
+    """
+    Reads the edges of the RDF graph from local dumps (.nt, .nt.gz, .ttl or .ttl.gz files) instead of a SPARQL endpoint.
+    Files are read once, only triples whose predicate is needed are kept: their URIs are interned in the CacheManager
+    and edges are stored as arrays of nodes indices. N-Triples files are streamed line by line. Turtle files are parsed
+    by rdflib into a store keeping only the needed edges, parsed triples are never stored, but rdflib reads the whole
+    text of each Turtle file before parsing it: N-Triples should be preferred for dumps larger than the memory.
+    It answers the queries of RDFGraph and DimensionOntology as a ServerManager would
+    """
+
+    class EdgesStore(rdflib.store.Store):
+        """
+        rdflib store receiving the triples parsed from a Turtle file, only the edges of the needed predicates are kept
+        """
+
+        def __init__(self, edges, get_element_index):
+            """
+            Builds the EdgesStore
+            :param edges: dictionary predicate URI -> (array of subjects indices, array of objects indices), completed
+            :param get_element_index: function value of a term -> node index
+            """
+
+            super().__init__()
+            self._edges = edges
+            self._get_element_index = get_element_index
+
+        def add(self, triple, context, quoted=False):
+            subject, predicate, obj = triple
+
+            if str(predicate) in self._edges:
+                self._edges[str(predicate)][0].append(self._get_element_index(subject))
+                self._edges[str(predicate)][1].append(self._get_element_index(obj))
+
+    # Edges are yielded as pairs of nodes indices, URIs are interned while files are read
+    INTERNED_EDGES = True
+
+    _RDF_TYPE = "http://www.w3.org/1999/02/22-rdf-syntax-ns#type"
+    _RDFS_SUBCLASSOF = "http://www.w3.org/2000/01/rdf-schema#subClassOf"
+    _OWL_CLASS = "http://www.w3.org/2002/07/owl#Class"
+
+    # Escape sequences of N-Triples IRIs and literals
+    _ESCAPE = re.compile(r'\\(?:u([0-9A-Fa-f]{4})|U([0-9A-Fa-f]{8})|(.))')
+    _ESCAPED_CHARACTERS = {"t": "\t", "b": "\b", "n": "\n", "r": "\r", "f": "\f", '"': '"', "'": "'", "\\": "\\"}
+
+    def __init__(self, file_paths, cache_manager):
+        """
+        Builds the DumpReader, files are read when the edges are first requested
+        :param file_paths: paths of the dump files
+        :param cache_manager: global cache manager for the scripts (URI <-> node index in the graph)
+        """
+
+        self._file_paths = file_paths
+        self._cache_manager = cache_manager
+        self._logger = logging.getLogger()
+
+        # Nodes indices of the candidate classes of dimension ontologies (instances of owl:Class, objects of rdf:type
+        # and nodes of rdfs:subClassOf edges), None until files are read
+        self._classes_candidates = None
+
+    @classmethod
+    def _unescape(cls, value):
+        """
+        Returns the value with its N-Triples escape sequences replaced
+        :param value: the escaped value
+        :return: the unescaped value
+        """
+
+        if "\\" not in value:
+            return value
+
+        return cls._ESCAPE.sub(
+            lambda m: chr(int(m.group(1) or m.group(2), 16)) if m.group(3) is None
+            else cls._ESCAPED_CHARACTERS.get(m.group(3), m.group(0)),
+            value
+        )
+
+    @classmethod
+    def _parse_term(cls, term):
+        """
+        Returns the value of an N-Triples term, as a SPARQL endpoint would return it (URI, blank node label or lexical
+        form of a literal)
+        :param term: the N-Triples term
+        :return: the value of the term
+        """
+
+        if term.startswith("<"):
+            return cls._unescape(term[1:term.index(">")])
+
+        elif term.startswith('"'):
+            # Closing quote: the last quote not escaped, before an optional language tag or datatype
+            end = term.rindex('"')
+            return cls._unescape(term[1:end])
+
+        return term
+
+    def _read_ntriples(self, file, edges):
+        """
+        Reads the triples of an N-Triples file and adds the edges of the needed predicates
+        :param file: the N-Triples file object (text mode)
+        :param edges: dictionary predicate URI -> (array of subjects indices, array of objects indices)
+        """
+
+        for line in tqdm.tqdm(file):
+            # The predicate is checked first, most triples are skipped without being parsed
+            terms = line.split(None, 2)
+
+            if len(terms) != 3 or terms[0].startswith("#"):
+                continue
+
+            predicate = self._unescape(terms[1][1:-1])
+
+            if predicate in edges:
+                # The object is followed by " ." and the end of line
+                subject = self._parse_term(terms[0])
+                obj = self._parse_term(terms[2].rstrip()[:-1].rstrip())
+
+                edges[predicate][0].append(self._cache_manager.get_element_index(subject))
+                edges[predicate][1].append(self._cache_manager.get_element_index(obj))
+
+    def _read_turtle(self, file, edges):
+        """
+        Reads the triples of a Turtle file with rdflib and adds the edges of the needed predicates
+        :param file: the Turtle file object (binary mode)
+        :param edges: dictionary predicate URI -> (array of subjects indices, array of objects indices)
+        """
+
+        store = self.EdgesStore(edges,
+                                lambda term: self._cache_manager.get_element_index(self._get_rdflib_term_value(term)))
+        rdflib.Graph(store=store).parse(file, format="turtle")
+
+    @staticmethod
+    def _get_rdflib_term_value(term):
+        """
+        Returns the value of an rdflib term, consistently with _parse_term
+        :param term: the rdflib term
+        :return: the value of the term
+        """
+
+        if isinstance(term, rdflib.BNode):
+            return "_:" + str(term)
+
+        return str(term)
+
+    def _read_files(self, predicates):
+        """
+        Reads all files once and returns the edges of the given predicates. Candidate classes of dimension ontologies
+        are also computed
+        :param predicates: list of predicates URIs
+        :return: dictionary predicate URI -> (array of subjects indices, array of objects indices)
+        """
+
+        # Classes candidates need rdf:type and rdfs:subClassOf edges
+        edges = {p: (array.array('i'), array.array('i'))
+                 for p in set(predicates) | {self._RDF_TYPE, self._RDFS_SUBCLASSOF}}
+
+        for file_path in self._file_paths:
+            self._logger.info("Reading %s" % file_path)
+            compressed = file_path.endswith(".gz")
+            turtle = file_path[:-3].endswith(".ttl") if compressed else file_path.endswith(".ttl")
+
+            if turtle:
+                with (gzip.open(file_path, "rb") if compressed else open(file_path, "rb")) as file:
+                    self._read_turtle(file, edges)
+
+            else:
+                with (gzip.open(file_path, "rt", encoding="utf-8") if compressed
+                      else open(file_path, "r", encoding="utf-8")) as file:
+                    self._read_ntriples(file, edges)
+
+        self._classes_candidates = set(edges[self._RDF_TYPE][1])
+        self._classes_candidates |= set(edges[self._RDFS_SUBCLASSOF][0])
+        self._classes_candidates |= set(edges[self._RDFS_SUBCLASSOF][1])
+
+        if self._cache_manager.is_element_in_cache(self._OWL_CLASS):
+            owl_class_index = self._cache_manager.get_element_index(self._OWL_CLASS)
+            self._classes_candidates |= {s for s, o in zip(*edges[self._RDF_TYPE]) if o == owl_class_index}
+
+        return edges
+
+    def get_fingerprint(self):
+        """
+        Returns a fingerprint of the dumps: SHA-256 checksum of the content of each file, files being read by chunks
+        :return: a string identifying the dumps
+        """
+
+        checksums = []
+        for file_path in self._file_paths:
+            checksum = hashlib.sha256()
+
+            with open(file_path, 'rb') as file:
+                for chunk in iter(lambda: file.read(1 << 20), b""):
+                    checksum.update(chunk)
+
+            checksums.append(checksum.hexdigest())
+
+        return " ".join(checksums)
+
+    def query_predicates_edges(self, predicates, verbose=False):
+        """
+        Returns a generator of the edges of each predicate. Files are read when the first edges are requested
+        :param predicates: list of predicates URIs
+        :param verbose: unused, progress bars are displayed while files are read
+        :return: generator of the iterables of pairs of nodes indices linked by each predicate (in order)
+        """
+
+        edges = self._read_files(predicates)
+
+        for predicate in predicates:
+            subjects, objects = edges[predicate]
+            yield zip(subjects, objects)
+
+    def query_classes(self, base_uris, nb_threads):
+        """
+        Returns the URIs of classes whose URI matches one of the base URIs (case-insensitive regex, as the SPARQL
+        queries of ServerManager), i.e., instances of owl:Class, objects of rdf:type and subjects or objects of
+        rdfs:subClassOf. Files must have been read by query_predicates_edges
+        :param base_uris: base URIs of the classes
+        :param nb_threads: unused, classes are filtered in memory
+        :return: the set of URIs of the classes
+        """
+
+        if self._classes_candidates is None:
+            raise RuntimeError("Dumps should be read (RDFGraph built) before querying classes")
+
+        patterns = [re.compile(base_uri, re.IGNORECASE) for base_uri in base_uris]
+
+        results = set()
+        for i in tqdm.tqdm(self._classes_candidates):
+            uri = self._cache_manager.get_element_from_index(i)
+
+            if any(pattern.search(uri) for pattern in patterns):
+                results.add(uri)
+
+        return results
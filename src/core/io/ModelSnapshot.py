@@ -0,0 +1,105 @@
+import hashlib
+import json
+import logging
+import os
+import pickle
+
+__author__ = "Pierre Monnin"
+
+
+class ModelSnapshot:
+    """
+    Versioned on-disk snapshot of the built model (CacheManager and RelationshipsModel, whose preorders hold the
+    DimensionOntologies). The file contains a header followed by the model, both pickled. The header contains the
+    snapshot format version, hashes of the configuration and of the integration ontology file, the fingerprint of the
+    source of the RDF graph (triplestore state or dumps) and the options changing the model. A snapshot is only loaded
+    if its header matches. Adjacencies are stored as arrays, which are pickled as raw bytes
+    """
+
+    # To be incremented whenever the pickled classes change
+    VERSION = 4
+
+    # Errors of pickle.load on truncated or corrupted files, or on classes that cannot be found anymore
+    _LOAD_ERRORS = (pickle.UnpicklingError, EOFError, AttributeError, ImportError)
+
+    def __init__(self, file_path, configuration_parameters, integration_ontology_file_path, source_fingerprint,
+                 model_options):
+        """
+        Builds the ModelSnapshot and its expected header
+        :param file_path: path of the snapshot file
+        :param configuration_parameters: configuration parameters of the scripts
+        :param integration_ontology_file_path: file path of the integration ontology
+        :param source_fingerprint: fingerprint of the source of the RDF graph (ServerManager or DumpReader)
+        :param model_options: dictionary of the command line options changing the built model
+        """
+
+        self._file_path = file_path
+        self._logger = logging.getLogger()
+
+        with open(integration_ontology_file_path, 'rb') as integration_ontology_file:
+            integration_ontology_hash = hashlib.sha256(integration_ontology_file.read()).hexdigest()
+
+        self._header = {
+            "version": self.VERSION,
+            "configuration": hashlib.sha256(
+                json.dumps(configuration_parameters, sort_keys=True).encode("utf-8")
+            ).hexdigest(),
+            "integration-ontology": integration_ontology_hash,
+            "source": source_fingerprint,
+            "options": model_options
+        }
+
+    def load(self, integration_ontology, comparison_cache_size):
+        """
+        Loads the model from the snapshot file if it exists and its header matches
+        :param integration_ontology: the integration ontology (not stored in the snapshot)
+        :param comparison_cache_size: maximum number of comparisons of sets of elements kept in the ComparisonCache
+        :return: a tuple (CacheManager, RelationshipsModel) or None if there is no valid snapshot
+        """
+
+        if not os.path.isfile(self._file_path):
+            self._logger.info("No snapshot found at %s" % self._file_path)
+            return None
+
+        with open(self._file_path, 'rb') as snapshot_file:
+            try:
+                header = pickle.load(snapshot_file)
+
+            except self._LOAD_ERRORS as e:
+                self._logger.warning("Invalid snapshot %s (%s)" % (self._file_path, e))
+                return None
+
+            if not isinstance(header, dict) or header != self._header:
+                outdated = [key for key in self._header if not isinstance(header, dict) or
+                            header.get(key) != self._header[key]]
+                self._logger.info("Snapshot %s is outdated (%s)" % (self._file_path, ", ".join(outdated)))
+                return None
+
+            self._logger.info("Loading snapshot %s" % self._file_path)
+            try:
+                cache_manager, relationships = pickle.load(snapshot_file)
+
+            except self._LOAD_ERRORS as e:
+                # Truncated or corrupted model (e.g., interrupted copy of the file)
+                self._logger.warning("Invalid snapshot %s (%s)" % (self._file_path, e))
+                return None
+
+        relationships.restore(integration_ontology, comparison_cache_size)
+
+        return cache_manager, relationships
+
+    def save(self, cache_manager, relationships):
+        """
+        Saves the model in the snapshot file. The file is replaced atomically
+        :param cache_manager: the global CacheManager
+        :param relationships: the RelationshipsModel
+        """
+
+        self._logger.info("Saving snapshot %s" % self._file_path)
+
+        temporary_file_path = self._file_path + ".tmp"
+        with open(temporary_file_path, 'wb') as snapshot_file:
+            pickle.dump(self._header, snapshot_file, protocol=pickle.HIGHEST_PROTOCOL)
+            pickle.dump((cache_manager, relationships), snapshot_file, protocol=pickle.HIGHEST_PROTOCOL)
+
+        os.replace(temporary_file_path, self._file_path)
@@ -0,0 +1,106 @@
+import logging
+import threading
+
+__author__ = "Pierre Monnin"
+
+
+class PageSizeController:
+    """
+    Adapts the page size of paged queries to each query shape (where clause) with an additive increase /
+    multiplicative decrease (AIMD) policy. The page size of a shape is halved when one of its pages fails, takes more
+    than the target latency or returns more than the maximum payload size, otherwise it is increased by a tenth of the
+    maximum page size. Page sizes start at and never exceed the maximum page size (ResultSetMaxRows of the server) and
+    are never decreased below the minimum page size. A slow page of a shape whose page size was decreased for slowness
+    does not decrease it again if it is not faster than the pages before the decrease: its latency does not depend on
+    the page size. It is shared by the threads fetching pages
+    """
+
+    def __init__(self, max_page_size, target_latency, max_payload_size, min_page_size=500):
+        """
+        Builds the PageSizeController
+        :param max_page_size: maximum number of rows in a page (ResultSetMaxRows of the server)
+        :param target_latency: maximum duration (in seconds) of a page before its shape's page size is decreased
+        :param max_payload_size: maximum size (in bytes) of the response of a page before its shape's page size is
+        decreased
+        :param min_page_size: minimum number of rows in a page, lowered to max_page_size if it is greater
+        """
+
+        self._max_page_size = max_page_size
+        self._min_page_size = max(1, min(min_page_size, max_page_size))
+        self._increase_step = max(1, max_page_size // 10)
+        self._target_latency = target_latency
+        self._max_payload_size = max_payload_size
+
+        self._page_sizes = {}
+        # Shape -> latency of the slow page that caused the last decrease of its page size, while pages are still slow
+        self._slow_latencies = {}
+        self._lock = threading.Lock()
+        self._logger = logging.getLogger()
+
+    def get_page_size(self, shape):
+        """
+        Returns the current page size of a query shape
+        :param shape: the query shape (where clause)
+        :return: the number of rows to request in the next page of this shape
+        """
+
+        with self._lock:
+            return self._page_sizes.get(shape, self._max_page_size)
+
+    def _decrease(self, shape, page_size, reason):
+        """
+        Halves the page size of a query shape, unless it was already decreased below the size of the page or it is the
+        minimum page size
+        :param shape: the query shape (where clause)
+        :param page_size: the page size of the page that caused the decrease
+        :param reason: reason of the decrease, logged
+        :return: true if the page size was decreased
+        """
+
+        current_page_size = self._page_sizes.get(shape, self._max_page_size)
+
+        # Concurrent pages of the same shape only decrease the page size once
+        if current_page_size >= page_size and current_page_size > self._min_page_size:
+            self._page_sizes[shape] = max(self._min_page_size, page_size // 2)
+            self._logger.info("%s: page size decreased to %d for %s" % (reason, self._page_sizes[shape],
+                                                                         " ".join(shape.split())))
+            return True
+
+        return False
+
+    def record_failure(self, shape, page_size):
+        """
+        Records a failed page of a query shape and decreases its page size
+        :param shape: the query shape (where clause)
+        :param page_size: the page size of the failed page
+        """
+
+        with self._lock:
+            self._decrease(shape, page_size, "Page failed")
+
+    def record_success(self, shape, page_size, latency, payload_size):
+        """
+        Records a successful page of a query shape and adapts its page size
+        :param shape: the query shape (where clause)
+        :param page_size: the page size of the page
+        :param latency: the duration of the page (in seconds)
+        :param payload_size: the size of the response (in bytes)
+        """
+
+        with self._lock:
+            if latency > self._target_latency:
+                # Smaller pages that are not faster are not decreased further
+                if latency < self._slow_latencies.get(shape, float("inf")) and \
+                        self._decrease(shape, page_size, "Slow page (%.2fs)" % latency):
+                    self._slow_latencies[shape] = latency
+
+                return
+
+            self._slow_latencies.pop(shape, None)
+
+            if payload_size > self._max_payload_size:
+                self._decrease(shape, page_size, "Large page (%d bytes)" % payload_size)
+
+            else:
+                current_page_size = self._page_sizes.get(shape, self._max_page_size)
+                self._page_sizes[shape] = min(self._max_page_size, current_page_size + self._increase_step)
@@ -1,14 +1,12 @@
 import threading
 
-from core.io.ServerManager import ServerManager
-
 __author__ = "Pierre Monnin"
 
 
 class QueryElementsThread(threading.Thread):
-    def __init__(self, configuration_parameters, max_rows, query):
+    def __init__(self, server_manager, query):
         threading.Thread.__init__(self)
-        self._server_manager = ServerManager(configuration_parameters, max_rows)
+        self._server_manager = server_manager
         self._query = query
         self._results = set()
 
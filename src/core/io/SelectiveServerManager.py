@@ -0,0 +1,193 @@
+import logging
+
+__author__ = "Pierre Monnin"
+
+
+class SelectiveServerManager:
+    """
+    Queries only the part of the RDF graph needed by the relationships model instead of all the edges of each predicate.
+    Starting from the relationships nodes, the frontier is expanded with batched VALUES queries of a ServerManager:
+    linking predicates edges of relationships, then owl:sameAs, dependsOn, partOf / hasPart and rdf:type edges of the
+    reached elements. rdfs:subClassOf and owl:sameAs edges of classes are only queried for the ancestors of the types
+    of the reached nodes (property paths from these types), which is all the type expansion and the dimension
+    ontologies need from them. It answers the queries of RDFGraph as a ServerManager would, with the edges of the
+    frontier only
+    """
+
+    # Edges are yielded as pairs of URIs, interned by RDFGraph
+    INTERNED_EDGES = False
+
+    _OWL_SAMEAS = "http://www.w3.org/2002/07/owl#sameAs"
+    _RDFS_SUBCLASSOF = "http://www.w3.org/2000/01/rdf-schema#subClassOf"
+    _RDF_TYPE = "http://www.w3.org/1999/02/22-rdf-syntax-ns#type"
+    # Path from a class to its ancestors (or from a descendant to a class), including the class itself
+    _SUBSUMPTION_PATH = "(rdfs:subClassOf|owl:sameAs|^owl:sameAs)*"
+
+    def __init__(self, server_manager, configuration_parameters, integration_ontology):
+        """
+        Builds the SelectiveServerManager
+        :param server_manager: the server manager object used to send the queries
+        :param configuration_parameters: configuration parameters of the scripts (relationships classes, dimensions
+        top classes, partOf, hasPart and dependsOn predicates)
+        :param integration_ontology: the integration ontology used to represent relationships
+        """
+
+        self._server_manager = server_manager
+        self._configuration_parameters = configuration_parameters
+        self._integration_ontology = integration_ontology
+        self._logger = logging.getLogger()
+
+        # owl:sameAs neighbors of the nodes whose owl:sameAs edges were queried (explored nodes)
+        self._sameas_neighbors = {}
+        self._sameas_explored = set()
+
+    def _query_values_edges(self, predicate, values_variable, values):
+        """
+        Returns the edges of the predicate whose subject (values_variable e1) or object (values_variable e2) is one of
+        the given values
+        :param predicate: the predicate URI
+        :param values_variable: "e1" or "e2"
+        :param values: iterable of URIs
+        :return: set of pairs of URIs linked by the predicate
+        """
+
+        return set(self._server_manager.query_values_rows(["e1", "e2"], "?e1 <%s> ?e2 . " % predicate,
+                                                          values_variable, values, verbose=True))
+
+    def _get_sameas_closure(self, nodes):
+        """
+        Returns the nodes connected with the given nodes via owl:sameAs links. owl:sameAs edges of nodes not explored
+        yet are queried (in both directions), one breadth-first layer at a time. Blank nodes reached are returned but
+        their owl:sameAs edges cannot be queried (see ServerManager.query_sameas_neighbors)
+        :param nodes: seed nodes URIs
+        :return: set of the nodes URIs connected with the seed nodes, including the seed nodes
+        """
+
+        retval = set(nodes)
+        frontier = set(nodes)
+
+        while len(frontier) != 0:
+            unexplored = frontier - self._sameas_explored
+
+            if len(unexplored) != 0:
+                self._sameas_explored |= unexplored
+
+                for e1, e2 in self._server_manager.query_sameas_neighbors(unexplored):
+                    self._sameas_neighbors.setdefault(e1, set()).add(e2)
+                    self._sameas_neighbors.setdefault(e2, set()).add(e1)
+
+            next_frontier = set()
+            for n in frontier:
+                next_frontier |= self._sameas_neighbors.get(n, set())
+
+            frontier = next_frontier - retval
+            retval |= frontier
+
+        return retval
+
+    def _query_subgraph(self, verbose):
+        """
+        Queries the edges of the part of the RDF graph needed by the relationships model
+        :param verbose: whether a progress bar is displayed for the queries of classes
+        :return: dictionary predicate URI -> set of pairs of URIs
+        """
+
+        edges = {}
+
+        # Classes whose instances are relationships: descendants of relationships classes following rdfs:subClassOf
+        # and owl:sameAs links
+        relationships_classes = set(self._configuration_parameters["integration-ontology-relationships-classes"])
+        self._logger.info("Querying descendants of %d relationships classes" % len(relationships_classes))
+        relationships_classes |= {e1 for e1, e2 in self._server_manager.query_values_rows(
+            ["e1", "e2"], "?e1 %s ?e2 . " % self._SUBSUMPTION_PATH, "e2", relationships_classes, verbose
+        )}
+
+        # Relationships nodes and their owl:sameAs nodes
+        self._logger.info("Querying relationships instantiating %d classes" % len(relationships_classes))
+        edges[self._RDF_TYPE] = self._query_values_edges(self._RDF_TYPE, "e2", relationships_classes)
+        relationships = self._get_sameas_closure({e1 for e1, e2 in edges[self._RDF_TYPE]})
+        self._logger.info("%d relationships nodes" % len(relationships))
+
+        # Linking predicates edges of relationships (edges towards relationships only matter for inverses). Elements
+        # are all the nodes of these edges
+        elements = set()
+        for lp in sorted(self._integration_ontology.get_linking_predicates()):
+            self._logger.info("Querying linking predicate %s edges of relationships" % lp)
+            edges[lp] = self._query_values_edges(lp, "e1", relationships)
+
+            if len(self._integration_ontology.get_linking_predicate_inverses(lp)) != 0:
+                edges[lp] |= self._query_values_edges(lp, "e2", relationships)
+
+            for e1, e2 in edges[lp]:
+                elements.add(e1)
+                elements.add(e2)
+
+        self._logger.info("Querying owl:sameAs edges of %d elements" % len(elements))
+        elements = self._get_sameas_closure(elements)
+
+        # Elements linked by dependsOn are compared with the elements of relationships
+        depends_on_elements = set()
+        for predicate in self._configuration_parameters["depends-on-predicates"]:
+            self._logger.info("Querying %s edges of elements" % predicate)
+            edges[predicate] = self._query_values_edges(predicate, "e1", elements)
+            depends_on_elements |= {e2 for e1, e2 in edges[predicate]}
+
+        self._logger.info("Querying owl:sameAs edges of %d elements linked by dependsOn" % len(depends_on_elements))
+        elements |= self._get_sameas_closure(depends_on_elements)
+        del depends_on_elements
+
+        for predicate in self._configuration_parameters["part-of-predicates"]:
+            self._logger.info("Querying %s edges of elements" % predicate)
+            edges[predicate] = edges.get(predicate, set()) | self._query_values_edges(predicate, "e1", elements)
+
+        for predicate in self._configuration_parameters["has-part-predicates"]:
+            self._logger.info("Querying %s edges of elements" % predicate)
+            edges[predicate] = edges.get(predicate, set()) | self._query_values_edges(predicate, "e2", elements)
+
+        # Types of relationships and elements
+        self._logger.info("Querying rdf:type edges of %d nodes" % len(elements | relationships))
+        edges[self._RDF_TYPE] |= self._query_values_edges(self._RDF_TYPE, "e1", elements | relationships)
+
+        # Classes hierarchy above these types, relationships classes and dimensions top classes, and owl:sameAs links
+        # of its classes: the type expansion and the dimension ontologies only need the ancestors of these classes
+        classes = relationships_classes | {e2 for e1, e2 in edges[self._RDF_TYPE]}
+        for d in self._configuration_parameters["dimensions"]:
+            classes |= set(d["integration-ontology-top-classes"])
+
+        self._logger.info("Querying rdfs:subClassOf edges of the ancestors of %d classes" % len(classes))
+        edges[self._RDFS_SUBCLASSOF] = set(self._server_manager.query_values_rows(
+            ["e1", "e2"], "?c %s ?e1 . ?e1 rdfs:subClassOf ?e2 . " % self._SUBSUMPTION_PATH, "c", classes, verbose
+        ))
+
+        for e1, e2 in edges[self._RDFS_SUBCLASSOF]:
+            classes.add(e1)
+            classes.add(e2)
+
+        self._logger.info("Querying owl:sameAs edges of %d classes" % len(classes))
+        self._get_sameas_closure(classes)
+
+        edges[self._OWL_SAMEAS] = {(n1, n2) for n1 in self._sameas_neighbors for n2 in self._sameas_neighbors[n1]}
+
+        return edges
+
+    def get_fingerprint(self):
+        """
+        Returns the fingerprint of the triplestore (see ServerManager.get_fingerprint)
+        :return: a string identifying the state of the triplestore
+        """
+
+        return self._server_manager.get_fingerprint()
+
+    def query_predicates_edges(self, predicates, verbose=False):
+        """
+        Returns a generator of the edges of each predicate restricted to the part of the RDF graph needed by the
+        relationships model. The whole part is queried when the first edges are requested
+        :param predicates: list of predicates URIs
+        :param verbose: whether a progress bar is displayed for each query
+        :return: generator of the sets of pairs of URIs linked by each predicate (in order)
+        """
+
+        edges = self._query_subgraph(verbose)
+
+        for predicate in predicates:
+            yield edges.get(predicate, set())
@@ -1,22 +1,46 @@
+import collections
+import concurrent.futures
 import json
 import logging
-import socket
+import threading
+import time
 import requests
+import requests.adapters
 import tqdm
 
+from core.io.PageSizeController import PageSizeController
+from core.io.QueryElementsThread import QueryElementsThread
+
 __author__ = "Pierre Monnin"
 
 
 class ServerManager:
-    def __init__(self, configuration_parameters, max_rows):
+    # Edges are yielded as pairs of URIs, interned by RDFGraph
+    INTERNED_EDGES = False
+
+    def __init__(self, configuration_parameters, max_rows, prefetch_workers=1, prefetch_window=None):
         self.server_address = configuration_parameters["server-address"]
         self.json_conf_attribute = configuration_parameters["url-json-conf-attribute"]
         self.json_conf_value = configuration_parameters["url-json-conf-value"]
         self.default_graph_attribute = configuration_parameters["url-default-graph-attribute"]
         self.default_graph_value = configuration_parameters["url-default-graph-value"]
         self.query_attribute = configuration_parameters["url-query-attribute"]
-        socket.setdefaulttimeout(configuration_parameters["timeout"])
+        # Change marker of the content of the triplestore, used in the fingerprints of snapshots
+        self.dataset_version = configuration_parameters.get("dataset-version")
+        self.timeout = configuration_parameters["timeout"]
+        self.max_retries = configuration_parameters.get("max-retries", 10)
+        self.retry_backoff = configuration_parameters.get("retry-backoff", 1.0)
         self.max_rows = max_rows
+        # Number of URIs in each VALUES block of batched queries
+        self.values_batch_size = configuration_parameters.get("values-batch-size", 100)
+        # Number of threads fetching pages concurrently and maximum number of pages requested but not consumed yet
+        self.prefetch_workers = prefetch_workers
+        self.prefetch_window = max(1, prefetch_window if prefetch_window is not None else 2 * prefetch_workers)
+        # Page sizes adapted to each query shape, between page-min-size (at most max_rows) and max_rows
+        self._page_size_controller = PageSizeController(max_rows,
+                                                        configuration_parameters.get("page-target-latency", 10.0),
+                                                        configuration_parameters.get("page-max-bytes", 50000000),
+                                                        configuration_parameters.get("page-min-size", 500))
         self.prefixes = "PREFIX pgxo:<http://pgxo.loria.fr/> " + \
                         "PREFIX rdfs:<http://www.w3.org/2000/01/rdf-schema#> " + \
                         "PREFIX rdf:<http://www.w3.org/1999/02/22-rdf-syntax-ns#> " + \
@@ -24,30 +48,115 @@ class ServerManager:
                         "PREFIX obo:<http://purl.obolibrary.org/obo/> "
         self._logger = logging.getLogger()
 
-    def query_server(self, query):
-        done = False
-
-        content = {}
-
-        while not done:
-            done = True
-
-            query_parameters = {
-                self.json_conf_attribute: self.json_conf_value,
-                self.default_graph_attribute: self.default_graph_value,
-                self.query_attribute: query
-            }
-
-            content = requests.get(self.server_address, query_parameters)
-
-            if content.status_code == 404:
-                done = False
-                self._logger.critical("404 error. New try...")
+        # Keep-alive connections are pooled in an adapter shared by the sessions of all the threads using this
+        # ServerManager (the pool is thread-safe, sessions are not guaranteed to be)
+        self._adapter = requests.adapters.HTTPAdapter(pool_connections=1,
+                                                      pool_maxsize=configuration_parameters.get("pool-size", 10),
+                                                      pool_block=True)
+        self._thread_local = threading.local()
+
+    def _get_session(self):
+        """
+        Returns the HTTP session of the current thread, all sessions share the same connection pool
+        :return: the requests.Session of the current thread
+        """
+
+        if not hasattr(self._thread_local, "session"):
+            self._thread_local.session = requests.Session()
+            self._thread_local.session.mount("http://", self._adapter)
+            self._thread_local.session.mount("https://", self._adapter)
+
+        return self._thread_local.session
+
+    def _try_query(self, query):
+        """
+        Sends a query to the server once. Connection errors, timeouts, 404 and 5xx responses and invalid JSON responses
+        are logged and reported as failures to be retried, other responses than 200 raise an HTTPError
+        :param query: the SPARQL query to send
+        :return: a tuple (JSON results of the query, size of the response in bytes) or None if the query failed
+        """
+
+        query_parameters = {
+            self.json_conf_attribute: self.json_conf_value,
+            self.default_graph_attribute: self.default_graph_value,
+            self.query_attribute: query
+        }
+
+        try:
+            content = self._get_session().get(self.server_address, params=query_parameters, timeout=self.timeout)
+
+        except requests.RequestException as e:
+            self._logger.critical("Request failed (%s). New try..." % e)
+            return None
+
+        if content.status_code == 404 or content.status_code >= 500:
+            self._logger.critical("%d error. New try..." % content.status_code)
+            return None
+
+        elif content.status_code != 200:
+            self._logger.critical(content.content)
+            raise requests.HTTPError("%d response from %s" % (content.status_code, self.server_address),
+                                     response=content)
+
+        try:
+            return json.loads(content.text), len(content.content)
+
+        except ValueError as e:
+            self._logger.critical("Invalid JSON response (%s). New try..." % e)
+            return None
 
-            elif content.status_code != 200:
-                self._logger.critical(content.content)
-
-        return json.loads(content.text)
+    def query_server(self, query):
+        """
+        Sends a query to the server and returns its JSON results. Failed queries (see _try_query) are retried with an
+        exponential backoff up to max_retries times
+        :param query: the SPARQL query to send
+        :return: the JSON results of the query
+        """
+
+        for i in range(0, self.max_retries + 1):
+            if i != 0:
+                time.sleep(self.retry_backoff * 2 ** (i - 1))
+
+            results = self._try_query(query)
+
+            if results is not None:
+                return results[0]
+
+        raise requests.ConnectionError("No valid response from %s after %d tries" % (self.server_address,
+                                                                                     self.max_retries + 1))
+
+    def _query_page(self, shape, query, offset=None, page_size=None):
+        """
+        Sends the query of a page and returns its bindings. The LIMIT of the page is the current page size of its
+        shape given by the PageSizeController, which is updated with the latency and the size of the response. A
+        failed page is retried as query_server does, with the decreased page size unless the page size is imposed
+        :param shape: the shape of the query (where clause) whose page size is used
+        :param query: the SPARQL query without its LIMIT and OFFSET clauses
+        :param offset: the OFFSET of the page (None if the query is not paged by offset)
+        :param page_size: imposed page size (e.g., pages whose offsets are already computed), None to use the page
+        size of the shape
+        :return: a tuple (page size, list of the bindings of the page)
+        """
+
+        for i in range(0, self.max_retries + 1):
+            if i != 0:
+                time.sleep(self.retry_backoff * 2 ** (i - 1))
+
+            limit = page_size if page_size is not None else self._page_size_controller.get_page_size(shape)
+            page_query = query + " LIMIT " + str(limit) + (" OFFSET " + str(offset) if offset is not None else "")
+
+            start = time.time()
+            results = self._try_query(page_query)
+
+            if results is None:
+                self._page_size_controller.record_failure(shape, limit)
+
+            else:
+                self._page_size_controller.record_success(shape, limit, time.time() - start, results[1])
+                return limit, results[0]["results"]["bindings"]
+
+        raise requests.ConnectionError("No valid response from %s after %d tries" % (self.server_address,
+                                                                                     self.max_retries + 1))
 
     def query_count_elements(self, where_clause):
         results_json = self.query_server(self.prefixes + " select count(distinct ?e) as ?count where { " +
@@ -55,79 +164,397 @@ class ServerManager:
 
         return int(results_json["results"]["bindings"][0]["count"]["value"])
 
-    def query_count_two_elements(self, where_clause):
+    def query_count_rows(self, variables, where_clause):
+        """
+        Returns the number of distinct rows of values of the variables matching the where clause
+        :param variables: list of the names of the variables
+        :param where_clause: the where clause of the query
+        :return: the number of distinct rows
+        """
+
         results_json = self.query_server(self.prefixes + " select count(*) as ?count where { "
-                                                         "select distinct ?e1 ?e2 where {" + where_clause +
-                                                         " } }")
+                                                         "select distinct " + " ".join("?" + v for v in variables) +
+                                         " where {" + where_clause + " } }")
         return int(results_json["results"]["bindings"][0]["count"]["value"])
 
-    def query_elements(self, where_clause):
-        ret_val = []
-        elements_count = self.query_count_elements(where_clause)
-
-        while len(ret_val) != elements_count:
-            ret_val = []
+    def query_count_two_elements(self, where_clause):
+        return self.query_count_rows(["e1", "e2"], where_clause)
+
+    @staticmethod
+    def _to_string_literal(value):
+        """
+        Returns the SPARQL string literal representing the given value
+        :param value: the string value to represent
+        :return: the escaped SPARQL string literal
+        """
+
+        return '"' + value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n").replace("\r", "\\r") + '"'
+
+    def _query_listing(self, variables, shape, rows_count, listings):
+        """
+        Returns a generator of the rows of paged listings, checked against their total number of rows. Each listing
+        ends on a page that is not full or once rows_count rows are listed. Virtuoso silently truncates results to
+        ResultSetMaxRows rows and returns partial results after a timeout as successful responses: while rows are
+        missing, the listings that did not end on an empty page resume after the last row they received. Passes that
+        bring no new row are retried as failed queries
+        :param variables: list of the names of the selected variables
+        :param shape: the shape of the queries whose page size is used
+        :param rows_count: the total number of rows of the listings
+        :param listings: list of functions (bindings of the last row of the listing or None, number of rows of the
+        listing) -> tuple (query of the next page without its LIMIT and OFFSET clauses, OFFSET of the page or None)
+        :return: generator of tuples of the values of the variables
+        """
+
+        # Bindings of the last row, number of rows and whether an empty page ended it, for each listing
+        states = [[None, 0, False] for _ in listings]
+        nb_rows = 0
+        nb_empty_passes = 0
+
+        while True:
+            pass_nb_rows = nb_rows
+
+            for get_page_query, state in zip(listings, states):
+                while not state[2] and nb_rows < rows_count:
+                    query, offset = get_page_query(state[0], state[1])
+                    page_size, bindings = self._query_page(shape, query, offset)
+
+                    for result in bindings:
+                        yield tuple(str(result[v]["value"]) for v in variables)
+
+                    if len(bindings) != 0:
+                        state[0] = bindings[-1]
+
+                    state[1] += len(bindings)
+                    state[2] = len(bindings) == 0
+                    nb_rows += len(bindings)
+
+                    if len(bindings) < page_size:
+                        break
+
+            if nb_rows >= rows_count:
+                return
+
+            elif nb_rows != pass_nb_rows:
+                nb_empty_passes = 0
+                self._logger.warning("Pages not full (%d of %d rows listed), resuming after their last rows" %
+                                     (nb_rows, rows_count))
+
+            else:
+                nb_empty_passes += 1
+                if nb_empty_passes > self.max_retries:
+                    raise requests.ConnectionError("Listing of %s stopped after %d of %d rows" %
+                                                   (" ".join(shape.split()), nb_rows, rows_count))
+
+                self._logger.critical("Empty pages (%d of %d rows listed). New try..." % (nb_rows, rows_count))
+                time.sleep(self.retry_backoff * 2 ** (nb_empty_passes - 1))
+
+                # Empty pages may be partial results after a timeout: all the listings are tried again
+                for state in states:
+                    state[2] = False
+
+    def _query_rows(self, variables, where_clause, shape=None, rows_count=None):
+        """
+        Returns a generator of all the distinct rows of values of the variables matching the where clause.
+        Rows without blank nodes are paged by keyset, i.e., ordered by the string values of the variables, each page
+        starting after the last row of the previous page. Distinct terms with the same string value (an IRI and a
+        literal, literals with different languages or datatypes) are ordered by a key of their kind, language or
+        datatype. Keyset pages avoid deep OFFSETs (rejected by Virtuoso beyond MaxSortedTopRows) but are not cheaper:
+        as string values are computed, the server filters and sorts the remaining rows for each page, i.e., about
+        rows² / page size sorted rows for a whole listing. As blank nodes have no string value, rows with blank nodes
+        are paged afterwards with LIMIT / OFFSET. Both listings are checked against the number of rows (see
+        _query_listing). Page sizes are adapted to the shape of the query, never below the minimum page size
+        :param variables: list of the names of the variables to select
+        :param where_clause: the where clause of the query
+        :param shape: the shape of the query whose page size is used (default: the where clause)
+        :param rows_count: the number of distinct rows matching the where clause (None to count them)
+        :return: generator of tuples of the values of the variables
+        """
+
+        shape = shape if shape is not None else where_clause
+        rows_count = rows_count if rows_count is not None else self.query_count_rows(variables, where_clause)
+
+        if rows_count == 0:
+            return
+
+        not_blank = " && ".join("!isBlank(?%s)" % v for v in variables)
+        blank = " || ".join("isBlank(?%s)" % v for v in variables)
+
+        # Key of the kind, language or datatype of each value, breaking ties between terms with the same string value
+        keys = " ".join('BIND(COALESCE(IF(isIRI(?%s), "", IF(LANG(?%s) != "", CONCAT("@", LANG(?%s)), '
+                        'CONCAT("^", STR(DATATYPE(?%s))))), "^") AS ?key_%s) ' % ((v,) * 5) for v in variables)
+        keyset_select = self.prefixes + " select distinct " + " ".join("?%s ?key_%s" % (v, v) for v in variables) + \
+            " where { " + where_clause + " FILTER(" + not_blank + ") " + keys
+        blank_select = self.prefixes + " select distinct " + " ".join("?" + v for v in variables) + " where { " + \
+            where_clause + " FILTER(" + blank + ") } ORDER BY " + " ".join("?" + v for v in variables)
+
+        def get_keyset_page_query(last_result, nb_rows):
+            keyset_filter = ""
+
+            if last_result is not None:
+                # Lexicographic comparison of the (string value, key) of the variables with the last row listed
+                last_keys = []
+                for v in variables:
+                    last_keys.append(("STR(?%s)" % v, self._to_string_literal(last_result[v]["value"])))
+                    last_keys.append(("?key_" + v, self._to_string_literal(last_result["key_" + v]["value"])))
+
+                after_last_row = "%s > %s" % last_keys[-1]
+                for key, value in reversed(last_keys[:-1]):
+                    after_last_row = "%s > %s || (%s = %s && (%s))" % (key, value, key, value, after_last_row)
+
+                keyset_filter = "FILTER(" + after_last_row + ") "
+
+            return keyset_select + keyset_filter + "} ORDER BY " + \
+                " ".join("STR(?%s) ?key_%s" % (v, v) for v in variables), None
+
+        def get_blank_page_query(last_result, nb_rows):
+            return blank_select, nb_rows
+
+        for row in self._query_listing(variables, shape, rows_count, [get_keyset_page_query, get_blank_page_query]):
+            yield row
+
+    def _query_rows_concurrently(self, variables, where_clause, rows_count):
+        """
+        Returns a generator of all the distinct rows of values of the variables matching the where clause.
+        As the number of rows is known, pages are independent LIMIT / OFFSET queries on rows ordered by the variables
+        values. They are fetched concurrently by prefetch_workers threads, with at most prefetch_window pages in flight,
+        and yielded in order. Pages after rows_count are fetched until a page is not full. The size of each page is the
+        page size of the shape of the query when the page is requested. A page cut short by the server is completed
+        before the next pages are yielded. Each page sorts all the rows: deep offsets cost the server more and more, and
+        Virtuoso rejects pages whose OFFSET + LIMIT exceeds its MaxSortedTopRows parameter
+        :param variables: list of the names of the variables to select
+        :param where_clause: the where clause of the query
+        :param rows_count: the number of rows matching the where clause
+        :return: generator of tuples of the values of the variables
+        """
+
+        query = self.prefixes + " select distinct " + " ".join("?" + v for v in variables) + " where { " + \
+            where_clause + " } ORDER BY " + " ".join("?" + v for v in variables)
+
+        with concurrent.futures.ThreadPoolExecutor(max_workers=self.prefetch_workers) as executor:
+            pages = collections.deque()
             offset = 0
-            while offset <= elements_count:
-                results_json = self.query_server(self.prefixes + " select distinct ?e where { " + where_clause
-                                                 + " } LIMIT " + str(self.max_rows) + " OFFSET " + str(offset))
+            done = False
+
+            while not done:
+                # Only fetch pages after rows_count when all previous pages are consumed and the last one was full
+                while len(pages) < self.prefetch_window and (offset < rows_count or len(pages) == 0):
+                    # Offsets of the following pages depend on the size of this page, it is kept if it is retried
+                    page_size = self._page_size_controller.get_page_size(where_clause)
+                    pages.append((offset, executor.submit(self._query_page, where_clause, query, offset, page_size)))
+                    offset += page_size
+
+                page_offset, page = pages.popleft()
+                page_size, bindings = page.result()
+
+                # A page truncated by the server (ResultSetMaxRows, partial result after a timeout) is completed, as
+                # the offsets of the next pages are already fixed
+                while len(bindings) < page_size and (len(pages) != 0 or page_offset + len(bindings) < rows_count):
+                    missing_bindings = self._query_page(where_clause, query, page_offset + len(bindings),
+                                                        page_size - len(bindings))[1]
+
+                    if len(missing_bindings) == 0:
+                        raise requests.ConnectionError("Page of %s at offset %d stopped after %d of %d rows" %
+                                                       (" ".join(where_clause.split()), page_offset, len(bindings),
+                                                        page_size))
+
+                    bindings += missing_bindings
+
+                for result in bindings:
+                    yield tuple(str(result[v]["value"]) for v in variables)
+
+                done = len(pages) == 0 and len(bindings) < page_size
+
+    @staticmethod
+    def _is_iri(value):
+        """
+        Returns true if the value can be written as an IRI in a query, i.e., it is not a blank node label, it has a
+        scheme (blank nodes are returned by SPARQL endpoints as bare labels) and it does not contain characters
+        forbidden in IRIs
+        :param value: the value of an element
+        :return: true if the value can be written as <value> in a query
+        """
+
+        return not value.startswith("_:") and ":" in value and not any(c in value for c in '<>"{}|^`\\ \n\r\t')
+
+    def query_values_rows(self, variables, where_clause, values_variable, values, verbose=False):
+        """
+        Returns a generator of the distinct rows of values of the variables matching the where clause, where
+        values_variable is bound to one of the given values. Values are sent in VALUES blocks of values_batch_size
+        URIs, each batch is sent as one query of at most max_rows rows and paged by _query_rows only when its result
+        reaches max_rows rows. Values that cannot be written as IRIs (blank nodes, literals) are skipped, their number
+        is logged
+        :param variables: list of the names of the variables to select
+        :param where_clause: the where clause of the query, using values_variable
+        :param values_variable: the name of the variable bound by the VALUES blocks
+        :param values: iterable of URIs
+        :param verbose: whether a progress bar of the batches is displayed
+        :return: generator of tuples of the values of the variables
+        """
+
+        values = set(values)
+        nb_values = len(values)
+        values = sorted(v for v in values if self._is_iri(v))
+
+        if len(values) != nb_values:
+            self._logger.warning("%d values skipped in VALUES blocks of %s (blank nodes or literals)"
+                                 % (nb_values - len(values), where_clause))
+
+        batches = range(0, len(values), self.values_batch_size)
+        for i in (tqdm.tqdm(batches) if verbose else batches):
+            values_block = "VALUES ?%s { %s } " % (values_variable,
+                                                  " ".join("<%s>" % v for v in values[i:i + self.values_batch_size]))
+
+            # Batches are usually small: each one is sent once, unpaged, and only paged if it reaches max_rows rows
+            query = self.prefixes + " select distinct " + " ".join("?" + v for v in variables) + " where { " + \
+                values_block + where_clause + " }"
+            page_size, bindings = self._query_page(where_clause, query, page_size=self.max_rows)
+
+            if len(bindings) < page_size:
+                for result in bindings:
+                    yield tuple(str(result[v]["value"]) for v in variables)
+
+            else:
+                for row in self._query_rows(variables, values_block + where_clause, shape=where_clause):
+                    yield row
+
+    def get_fingerprint(self):
+        """
+        Returns a fingerprint of the triplestore: its address, its default graph and the optional dataset-version of
+        the configuration. The content of the triplestore is not checked, dataset-version is the change marker to
+        update when the triplestore is updated
+        :return: a string identifying the state of the triplestore
+        """
+
+        return "%s %s %s" % (self.server_address, self.default_graph_value, self.dataset_version)
 
-                for result in results_json["results"]["bindings"]:
-                    ret_val.append(str(result["e"]["value"]))
-
-                offset += self.max_rows
-
-            if len(ret_val) != elements_count:
-                self._logger.critical("Number of elements different from count, retry...")
-
-        return ret_val
-
-    def query_two_elements(self, where_clause, verbose=False):
-        ret_val = []
+    def query_elements(self, where_clause):
+        return [e for e, in self._query_rows(["e"], where_clause)]
+
+    def query_two_elements_stream(self, where_clause, verbose=False):
+        """
+        Returns a generator of the pairs of elements matching the where clause. Pairs are yielded page by page as the
+        results arrive, so that the whole list of pairs is never in memory
+        :param where_clause: the where clause of the query
+        :param verbose: whether a progress bar is displayed
+        :return: generator of the pairs of elements matching the where clause
+        """
+
+        # The count checks the listing and gives the total of the progress bar
         elements_count = self.query_count_two_elements(where_clause)
 
         if verbose and elements_count != 0:
             pbar = tqdm.tqdm(total=elements_count)
 
-        while len(ret_val) != elements_count:
-            ret_val = []
-            offset = 0
-
-            while offset <= elements_count:
-                results_json = self.query_server(self.prefixes + " select distinct ?e1 ?e2 where { " + where_clause +
-                                                 " } LIMIT " + str(self.max_rows) + " OFFSET " + str(offset))
+        if self.prefetch_workers > 1:
+            rows = self._query_rows_concurrently(["e1", "e2"], where_clause, elements_count)
 
-                for result in results_json["results"]["bindings"]:
-                    ret_val.append((str(result["e1"]["value"]), str(result["e2"]["value"])))
-                    if verbose and elements_count != 0:
-                        pbar.update(1)
+        else:
+            rows = self._query_rows(["e1", "e2"], where_clause, rows_count=elements_count)
 
-                offset += self.max_rows
+        for row in rows:
+            yield row
 
-            if len(ret_val) != elements_count:
-                self._logger.critical("Number of elements different from count, retry...")
-
-                if verbose and elements_count != 0:
-                    pbar.close()
-                    pbar = tqdm.tqdm(total=elements_count)
+            if verbose and elements_count != 0:
+                pbar.update(1)
 
         if verbose and elements_count != 0:
             pbar.close()
 
-        return ret_val
+    def query_two_elements(self, where_clause, verbose=False):
+        return list(self.query_two_elements_stream(where_clause, verbose))
+
+    def query_predicates_edges(self, predicates, verbose=False):
+        """
+        Returns a generator of the edges of each predicate (results of query_two_elements_stream). Each predicate is
+        queried when the edges of the previous one have been consumed
+        :param predicates: list of predicates URIs
+        :param verbose: whether a progress bar is displayed for each query
+        :return: generator of the generators of pairs of elements linked by each predicate (in order)
+        """
+
+        for predicate in predicates:
+            yield self.query_two_elements_stream("?e1 <%s> ?e2 . " % predicate, verbose)
+
+    def query_classes(self, base_uris, nb_threads):
+        """
+        Returns the URIs of classes whose URI matches one of the base URIs (case-insensitive regex), i.e., instances of
+        owl:Class, objects of rdf:type and subjects or objects of rdfs:subClassOf
+        :param base_uris: base URIs of the classes
+        :param nb_threads: number of threads sending queries at the same time
+        :return: the set of URIs of the classes
+        """
+
+        queries = [
+            """
+                ?e rdf:type owl:Class .
+                FILTER(REGEX(STR(?e), "%s", "i")) .
+            """,
+            """
+                ?s rdf:type ?e .
+                FILTER(REGEX(STR(?e), "%s", "i")) .
+            """,
+            """
+               ?s rdfs:subClassOf ?e .
+                FILTER(REGEX(STR(?e), "%s", "i")) . 
+            """,
+            """
+                ?e rdfs:subClassOf ?s .
+                FILTER(REGEX(STR(?e), "%s", "i")) .
+            """
+        ]
+
+        # Thread creation
+        threads = []
+        for base_uri in base_uris:
+            for query in queries:
+                threads.append(QueryElementsThread(self, query % base_uri))
+
+        # Thread running and joining
+        i = 0
+        results = set()
+        with tqdm.tqdm(total=len(threads)) as pbar:
+            while i < len(threads):
+                for j in range(0, min(nb_threads, len(threads) - i)):
+                    threads[i + j].start()
+
+                for j in range(0, min(nb_threads, len(threads) - i)):
+                    threads[i + j].join()
+                    results |= threads[i + j].get_results()
+
+                pbar.update(min(nb_threads, len(threads) - i))
+                i += min(nb_threads, len(threads) - i)
+
+        return results
+
+    def query_sameas_neighbors(self, individuals):
+        """
+        Returns a generator of the owl:sameAs neighbors of the given individuals, in both directions. Individuals are
+        sent in VALUES blocks, both directions are asked in the same query. Individuals that are blank nodes cannot be
+        sent in VALUES blocks, their neighbors are not returned (their number is logged by query_values_rows)
+        :param individuals: iterable of URIs
+        :return: generator of pairs (individual, URI linked to the individual by owl:sameAs in either direction)
+        """
+
+        return self.query_values_rows(["e1", "e2"], "{ ?e1 owl:sameAs ?e2 } UNION { ?e2 owl:sameAs ?e1 } ", "e1",
+                                      individuals)
 
     def sameas_expansion(self, individuals):
-        ret_val = set(individuals)
-        diff = set(individuals)
+        """
+        Returns the individuals and all URIs connected to them via owl:sameAs links. The expansion is breadth-first:
+        the neighbors of all the individuals of the frontier are queried together, so that the number of queries
+        depends on the depth of the expansion and on values_batch_size rather than on the number of individuals.
+        Blank nodes linked by owl:sameAs are returned but not expanded: their own owl:sameAs neighbors are dropped
+        :param individuals: seed URIs
+        :return: set of the URIs connected with the seed URIs, including the seed URIs
+        """
 
-        while len(diff) != 0:
-            current_set = set(ret_val)
+        ret_val = set(individuals)
+        frontier = set(individuals)
 
-            for i in diff:
-                current_set |= set(self.query_elements("?e owl:sameAs <" + i + ">"))
-                current_set |= set(self.query_elements("<" + i + "> owl:sameAs ?e"))
+        while len(frontier) != 0:
+            neighbors = {e2 for e1, e2 in self.query_sameas_neighbors(frontier)}
 
-            diff = current_set - ret_val
-            ret_val = current_set
+            frontier = neighbors - ret_val
+            ret_val |= frontier
 
         return ret_val
@@ -2,11 +2,27 @@ __author__ = "Pierre Monnin"
 
 
 class TTLWriter:
-    def __init__(self, file_path):
+    def __init__(self, file_path, flush_interval=10000):
+        """
+        Builds the TTLWriter
+        :param file_path: path of the output TTL file
+        :param flush_interval: number of triples after which the file is flushed, so that partial output is on disk
+        """
+
         self._file = open(file_path, 'w')
+        self._flush_interval = flush_interval
+        self._nb_unflushed_triples = 0
 
     def write_triple(self, subject, predicate, obj):
         self._file.write(subject + " " + predicate + " " + obj + ".\n")
 
+        self._nb_unflushed_triples += 1
+        if self._nb_unflushed_triples >= self._flush_interval:
+            self.flush()
+
+    def flush(self):
+        self._file.flush()
+        self._nb_unflushed_triples = 0
+
     def close(self):
         self._file.close()
@@ -0,0 +1,135 @@
+import array
+import bisect
+import collections
+
+__author__ = "Pierre Monnin"
+
+
+class CSRAdjacency:
+    """
+    Frozen adjacency between nodes indices stored in compressed sparse row (CSR) format. Only non-empty rows are
+    stored: rows contains the sorted nodes indices having neighbors, the neighbors of rows[i] are the sorted nodes
+    indices indices[indptr[i]:indptr[i + 1]]. It uses 4 bytes per edge instead of a Python set entry
+    """
+
+    def __init__(self, adjacency):
+        """
+        Builds the CSRAdjacency from a dictionary node index -> set of nodes indices. The dictionary is emptied while
+        the CSRAdjacency is built so that both are not fully in memory at the same time
+        :param adjacency: dictionary node index -> set of nodes indices
+        """
+
+        self._rows = array.array('i')
+        self._indptr = array.array('q', [0])
+        self._indices = array.array('i')
+
+        for n in sorted(adjacency):
+            neighbors = adjacency.pop(n)
+
+            if len(neighbors) != 0:
+                self._rows.append(n)
+                self._indices.extend(sorted(neighbors))
+                self._indptr.append(len(self._indices))
+
+    def _get_row(self, node_index):
+        """
+        Returns the position of the row of the given node index
+        :param node_index: the node index whose row is needed
+        :return: the position of the row or -1 if the node has no neighbor
+        """
+
+        i = bisect.bisect_left(self._rows, node_index)
+
+        if i < len(self._rows) and self._rows[i] == node_index:
+            return i
+
+        return -1
+
+    def __contains__(self, node_index):
+        return self._get_row(node_index) != -1
+
+    def __len__(self):
+        return len(self._rows)
+
+    def get_nb_edges(self):
+        """
+        Returns the number of edges in the adjacency
+        :return: the number of edges in the adjacency
+        """
+
+        return len(self._indices)
+
+    def get_nodes(self):
+        """
+        Returns the nodes indices having at least one neighbor
+        :return: sorted array of nodes indices having at least one neighbor
+        """
+
+        return self._rows
+
+    def get_neighbors(self, node_index):
+        """
+        Returns the neighbors of the given node index
+        :param node_index: the node index whose neighbors are needed
+        :return: sorted array of the nodes indices adjacent to node_index (empty if node_index has no neighbor)
+        """
+
+        i = self._get_row(node_index)
+
+        if i == -1:
+            return array.array('i')
+
+        return self._indices[self._indptr[i]:self._indptr[i + 1]]
+
+    def has_neighbor(self, node_index, neighbor_index):
+        """
+        Returns true if neighbor_index is adjacent to node_index
+        :param node_index: the source node index
+        :param neighbor_index: the target node index
+        :return: true if neighbor_index is adjacent to node_index
+        """
+
+        i = self._get_row(node_index)
+
+        if i == -1:
+            return False
+
+        j = bisect.bisect_left(self._indices, neighbor_index, self._indptr[i], self._indptr[i + 1])
+        return j < self._indptr[i + 1] and self._indices[j] == neighbor_index
+
+    def get_edges(self):
+        """
+        Returns a generator of all edges of the adjacency
+        :return: generator of tuples (node_index, neighbor_index)
+        """
+
+        for i, n in enumerate(self._rows):
+            for j in range(self._indptr[i], self._indptr[i + 1]):
+                yield n, self._indices[j]
+
+    def get_transpose(self):
+        """
+        Returns the transposed adjacency, i.e., n2 is adjacent to n1 in the transpose iff n1 is adjacent to n2
+        :return: a new CSRAdjacency with reversed edges
+        """
+
+        transpose = CSRAdjacency({})
+
+        # Counting sort on targets: rows are visited in increasing order, so transposed rows are sorted
+        counts = collections.Counter(self._indices)
+        transpose._rows = array.array('i', sorted(counts))
+
+        next_positions = {}
+        for n in transpose._rows:
+            next_positions[n] = transpose._indptr[-1]
+            transpose._indptr.append(transpose._indptr[-1] + counts[n])
+
+        del counts
+        transpose._indices = array.array('i', [0]) * len(self._indices)
+        for i, n in enumerate(self._rows):
+            for j in range(self._indptr[i], self._indptr[i + 1]):
+                neighbor = self._indices[j]
+                transpose._indices[next_positions[neighbor]] = n
+                next_positions[neighbor] += 1
+
+        return transpose
@@ -2,8 +2,6 @@ import logging
 
 import tqdm
 
-from core.io.QueryElementsThread import QueryElementsThread
-
 __author__ = "Pierre Monnin"
 
 
@@ -65,6 +63,25 @@ class DimensionOntology:
 
             return set(self._descendants)
 
+        def get_ancestors_frozenset(self):
+            """
+            Returns the frozenset of ontology classes indices that are ancestors of the current ontology class without
+            copying it. Only available after freeze
+            :return: frozenset of ontology classes indices that are ancestors of the current ontology class
+            """
+
+            return self._ancestors
+
+        def freeze(self, interned_sets):
+            """
+            Replaces the ancestors and descendants sets with interned frozensets, shared between classes having the same
+            ancestors (resp. descendants). No ancestor or descendant can be added afterwards
+            :param interned_sets: dictionary frozenset -> interned frozenset, shared between classes
+            """
+
+            self._ancestors = interned_sets.setdefault(frozenset(self._ancestors), frozenset(self._ancestors))
+            self._descendants = interned_sets.setdefault(frozenset(self._descendants), frozenset(self._descendants))
+
         def __str__(self):
             retval = "Ontology class [" + \
                      "uris_indices:" + str(self._uris_indices) + \
@@ -72,15 +89,18 @@ class DimensionOntology:
                      "; descendants: " + str(self._descendants) + "]"
             return retval
 
-    def __init__(self, base_uris, configuration_parameters, max_rows, nb_threads, cache_manager, rdf_graph):
+    def __init__(self, base_uris, server_manager, nb_threads, cache_manager, rdf_graph, local_classes=False):
         """
         Builds the DimensionOntology
         :param base_uris: base URIs to be considered to build the DimensionOntology (list of strings)
-        :param configuration_parameters: configuration parameters of the scripts
-        :param max_rows: max rows that can be queried from the triplestore
+        :param server_manager: the server manager object to send SPARQL queries to the triplestore (shared by threads)
+        or the DumpReader the RDF graph was built from
         :param nb_threads: number of threads that can be used
         :param cache_manager: global cache manager for the scripts (URI <-> node index in the graph)
         :param rdf_graph: the RDF Graph model
+        :param local_classes: if true, classes are the classes candidates of the RDF graph whose URI starts with one of
+        the base URIs (no query sent), otherwise classes are queried (URI matching one of the base URIs as a
+        case-insensitive regex)
         """
 
         logger = logging.getLogger()
@@ -90,67 +110,40 @@ class DimensionOntology:
         # Classes indices are classes grouped by owl:sameAs connected components, they may correspond to multiple nodes
         self._cache_index_to_class_index = {}
         self._classes = []
+        # Frozen ancestors of each class, indexed by class index (shared frozensets)
+        self._ancestors = []
 
         self._base_uris = set(base_uris)
+        # Nodes indices whose URI starts with one of the base URIs
+        self._namespaces_indices = set()
 
         if len(base_uris) != 0:
-            # Querying classes
-            logger.info("Querying classes")
-
-            queries = [
-                """
-                    ?e rdf:type owl:Class .
-                    FILTER(REGEX(STR(?e), "%s", "i")) .
-                """,
-                """
-                    ?s rdf:type ?e .
-                    FILTER(REGEX(STR(?e), "%s", "i")) .
-                """,
-                """
-                   ?s rdfs:subClassOf ?e .
-                    FILTER(REGEX(STR(?e), "%s", "i")) . 
-                """,
-                """
-                    ?e rdfs:subClassOf ?s .
-                    FILTER(REGEX(STR(?e), "%s", "i")) .
-                """
-            ]
-
-            # Thread creation
-            threads = []
-            for base_uri in base_uris:
-                for query in queries:
-                    threads.append(QueryElementsThread(configuration_parameters, max_rows, query % base_uri))
-
-            # Thread running and joining
-            i = 0
-            results = set()
-            with tqdm.tqdm(total=len(threads)) as pbar:
-                while i < len(threads):
-                    for j in range(0, min(nb_threads, len(threads) - i)):
-                        threads[i + j].start()
-
-                    for j in range(0, min(nb_threads, len(threads) - i)):
-                        threads[i + j].join()
-                        results |= threads[i + j].get_results()
-
-                    pbar.update(min(nb_threads, len(threads) - i))
-                    i += min(nb_threads, len(threads) - i)
-
-            del threads
+            # Classes are interned before the namespaces are computed with the prefix index of the cache manager
+            classes_candidates = []
+            if not local_classes:
+                # Querying classes
+                logger.info("Querying classes")
+                classes_candidates = [self._cache_manager.get_element_index(class_uri)
+                                      for class_uri in server_manager.query_classes(base_uris, nb_threads)]
+
+            for base_uri in self._base_uris:
+                self._namespaces_indices |= self._cache_manager.get_element_indexes_from_start_string(base_uri)
+
+            if local_classes:
+                # Selecting classes from the RDF graph, without any query
+                logger.info("Selecting classes from the RDF graph")
+                classes_candidates = [n for n in rdf_graph.get_classes_candidates() if n in self._namespaces_indices]
 
             # owl:sameAs reduction
             logger.info("owl:sameAs reduction")
-            for class_uri in tqdm.tqdm(results):
-                class_cache_index = self._cache_manager.get_element_index(class_uri)
-
+            for class_cache_index in tqdm.tqdm(classes_candidates):
                 if class_cache_index not in self._cache_index_to_class_index:
                     classes_cache_indices = {class_cache_index}
 
                     # Consider all the URIs that can be part of the OntologyClass (from sameAs expansion)
                     for same_class_cache_index in rdf_graph.get_node_sameas_adjacency(class_cache_index):
                         # Keep indices that are in the base_uris namespaces
-                        if not self._exclude_class(self._cache_manager.get_element_from_index(same_class_cache_index)):
+                        if not self._exclude_class(same_class_cache_index):
                             classes_cache_indices.add(same_class_cache_index)
 
                     ontology_class = DimensionOntology.OntologyClass(classes_cache_indices)
@@ -166,13 +159,19 @@ class DimensionOntology:
 
                 for n in expansion:
                     # Exclude classes that are not from the base_uris namespaces and self classes
-                    if not self._exclude_class(self._cache_manager.get_element_from_index(n)):
+                    if not self._exclude_class(n):
                         ancestor_class_index = self._cache_index_to_class_index[n]
 
                         if ancestor_class_index != i:
                             ontology_class.add_ancestor(ancestor_class_index)
                             self._classes[ancestor_class_index].add_descendant(i)
 
+            # Classes with the same ancestors (e.g., siblings) share the same frozenset
+            interned_sets = {}
+            for ontology_class in self._classes:
+                ontology_class.freeze(interned_sets)
+                self._ancestors.append(ontology_class.get_ancestors_frozenset())
+
     def get_classes_indices_from_uris_indices(self, uris_indices):
         """
         Returns classes indices from URIs indices (nodes indices in the CacheManager)
@@ -196,13 +195,8 @@ class DimensionOntology:
         :return: min(classes_indices) = {Ci | not exists Di in classes_indices such as Di != Ci and Di <= Ci}
         """
 
-        retval = set()
-
-        for c in classes_indices:
-            if not any(c in self._classes[d].get_ancestors() for d in classes_indices - {c}):
-                retval.add(c)
-
-        return retval
+        # A class is never its own ancestor: Ci is not minimum iff it is an ancestor of one class of classes_indices
+        return set(classes_indices).difference(*(self._ancestors[c] for c in classes_indices))
 
     def is_subsumed(self, c1, c2):
         """
@@ -212,7 +206,26 @@ class DimensionOntology:
         :return: tue if c1 <= c2
         """
 
-        return c1 == c2 or c2 in self._classes[c1].get_ancestors()
+        return c1 == c2 or c2 in self._ancestors[c1]
+
+    def is_subsumed_by_any(self, c1, classes_indices):
+        """
+        Returns true if c1 <= c2 for at least one class c2 in classes_indices
+        :param c1: class index
+        :param classes_indices: set of classes indices
+        :return: true if c1 <= c2 for at least one class c2 in classes_indices
+        """
+
+        return c1 in classes_indices or not self._ancestors[c1].isdisjoint(classes_indices)
+
+    def get_ancestors(self, class_index):
+        """
+        Returns the classes indices that are ancestors of the given class (shared frozenset, not to be modified)
+        :param class_index: class index whose ancestors are needed
+        :return: frozenset of classes indices that are ancestors of the given class
+        """
+
+        return self._ancestors[class_index]
 
     def get_base_uris(self):
         """
@@ -222,18 +235,15 @@ class DimensionOntology:
 
         return set(self._base_uris)
 
-    def _exclude_class(self, class_uri):
+    def _exclude_class(self, class_cache_index):
         """
-        Returns true if the class URI should be exluded from the current DimensionOntology (not in the namespace)
-        :param class_uri: class URI to check if belonging to the namespace of the current DimensionOntology
-        :return: true if the class URIs should be exluded from the current DimensionOntology (not in the namespace)
+        Returns true if the class should be exluded from the current DimensionOntology (not in the namespace)
+        :param class_cache_index: class node index to check if belonging to the namespace of the current
+        DimensionOntology
+        :return: true if the class should be exluded from the current DimensionOntology (not in the namespace)
         """
 
-        for base_uri in self._base_uris:
-            if class_uri.startswith(base_uri):
-                return False
-
-        return True
+        return class_cache_index not in self._namespaces_indices
 
     def __str__(self):
         retval = "-- DimensionOntology --\n"
@@ -1,7 +1,12 @@
+import array
+import bisect
 import logging
-import queue
+
 import tqdm
 
+from core.model.CSRAdjacency import CSRAdjacency
+from core.model.SubsumptionClosure import SubsumptionClosure
+
 __author__ = "Pierre Monnin"
 
 
@@ -10,17 +15,21 @@ class RDFGraph:
     Represents several adjacencies in the RDF Graph from the triplestore. It is not exactly the RDF Graph from
     the triplestore as only a subset of the triples are queried, some adjacencies are expanded and some predicates
     are considered together (for exemple partOf adjacency can be built from several predicates).
+    Once built, adjacencies are frozen in CSRAdjacency objects (compressed sparse rows).
     """
 
     def __init__(self, cache_manager, server_manager, integration_ontology, part_of_predicates, has_part_predicates,
                  depends_on_predicates):
         """
         Builds the local RDFGraph model
-        - owl:sameAs adjacency is expanded with symmetry and transitivity
+        - owl:sameAs links are grouped in connected components (symmetry and transitivity)
         - type adjacency is expanded with owl:sameAs and rdfs:subClassOf adjacencies
         - linking predicates adjacencies are expanded following the linking predicates hierarchy and inverses
         :param cache_manager: global cache for the scripts (URI <-> node index in the graph)
-        :param server_manager: the server manager object to send SPARQL queries to the triplestore
+        :param server_manager: the server manager object to send SPARQL queries to the triplestore (a ServerManager
+        queries adjacencies one after another, an AsyncServerManager queries them concurrently, a DumpReader reads them
+        from local dumps), its edges are pairs of URIs or, if its INTERNED_EDGES attribute is true, pairs of nodes
+        indices interned in the cache manager
         :param integration_ontology: the integration ontology used to represent relationships
         :param part_of_predicates: list of predicates used for partOf adjacency
         :param has_part_predicates: list of predicates used for inversely completing partOf adjacency
@@ -29,10 +38,23 @@ class RDFGraph:
 
         self._cache_manager = cache_manager
 
-        self._sameas_adjacency = {}
+        # owl:sameAs connected components: node index -> component id and component id -> tuple of nodes indices
+        self._sameas_component = {}
+        self._sameas_components = []
 
         self._subclassof_adjacency = {}
-        self._type_adjacency = {}
+        # Closure of nodes following owl:sameAs and rdfs:subClassOf links
+        self._subsumption_closure = None
+        # Expanded rdf:type adjacency, nodes having the same types share the same interned type set: typed nodes
+        # (sorted) and their type sets ids, classes of each type set, nodes of each type set and type sets of each class
+        self._typed_nodes = array.array('i')
+        self._typed_nodes_type_sets = array.array('i')
+        self._type_sets = None
+        self._type_sets_nodes = None
+        self._classes_type_sets = None
+        # Sorted nodes indices of the classes of the graph (asserted objects of rdf:type, instances of owl:Class and
+        # nodes of rdfs:subClassOf edges)
+        self._classes_candidates = None
 
         self._partOf_adjacency = {}
         self._dependsOn_adjacency = {}
@@ -42,116 +64,165 @@ class RDFGraph:
         # Get logger (only used for the constructor)
         logger = logging.getLogger()
 
+        # All queries are independent, their results are streamed and processed in the order of the queries: edges are
+        # added to adjacencies as pages arrive and lists of URIs of edges are never built. URIs of edges are interned
+        # once here, unless the server manager already yields nodes indices (INTERNED_EDGES)
+        linking_predicates = sorted(integration_ontology.get_linking_predicates())
+        predicates = [
+            "http://www.w3.org/2002/07/owl#sameAs",
+            "http://www.w3.org/2000/01/rdf-schema#subClassOf",
+            "http://www.w3.org/1999/02/22-rdf-syntax-ns#type"
+        ]
+        predicates += part_of_predicates + has_part_predicates + depends_on_predicates + linking_predicates
+        edges_lists = server_manager.query_predicates_edges(predicates, verbose=True)
+
         # Querying owl:sameAs edges
         logger.info("Querying owl:sameAs edges")
-        edges = server_manager.query_two_elements("?e1 owl:sameAs ?e2 . ", verbose=True)
+        edges = self._get_edges_indices(next(edges_lists), server_manager.INTERNED_EDGES)
 
-        logger.info("Processing owl:sameAs edges")
-        for e in tqdm.tqdm(edges):
-            n1 = self._cache_manager.get_element_index(e[0])
-            if n1 not in self._sameas_adjacency:
-                self._sameas_adjacency[n1] = set()
+        # Union-find forest (node index -> parent node index), symmetry and transitivity are implied
+        sameas_parent = {}
+        sameas_size = {}
+        for n1, n2 in edges:
+            n1 = self._find_sameas_root(sameas_parent, n1)
+            n2 = self._find_sameas_root(sameas_parent, n2)
 
-            n2 = self._cache_manager.get_element_index(e[1])
-            if n2 not in self._sameas_adjacency:
-                self._sameas_adjacency[n2] = set()
+            if n1 != n2:
+                # Union by size
+                if sameas_size.get(n1, 1) < sameas_size.get(n2, 1):
+                    n1, n2 = n2, n1
 
-            self._sameas_adjacency[n1].add(n2)
+                sameas_parent[n2] = n1
+                sameas_size[n1] = sameas_size.get(n1, 1) + sameas_size.pop(n2, 1)
 
-        # Completing edges
-        logger.info("Completing owl:sameAs edges with symmetry")
-        for node_index in tqdm.tqdm(self._sameas_adjacency):
-            for neighbor in self._sameas_adjacency[node_index]:
-                if node_index not in self._sameas_adjacency[neighbor]:
-                    self._sameas_adjacency[neighbor].add(node_index)
+        del edges
 
-        logger.info("Completing owl:sameAs edges with transitivity")
-        to_compute = set(self._sameas_adjacency.keys())
-        with tqdm.tqdm(total=len(to_compute)) as pbar:
-            while len(to_compute) != 0:
-                current_node = to_compute.pop()
-                connected_component = self._compute_sameas_connected_component(current_node)
+        logger.info("Building owl:sameAs connected components")
+        roots_to_components = {}
+        for n in tqdm.tqdm(sameas_parent):
+            root = self._find_sameas_root(sameas_parent, n)
+
+            # Roots are not keys of the forest, they are added with the first node of their component
+            if root not in roots_to_components:
+                roots_to_components[root] = len(roots_to_components)
+                self._sameas_component[root] = roots_to_components[root]
+                self._sameas_components.append([root])
+
+            self._sameas_component[n] = roots_to_components[root]
+            self._sameas_components[roots_to_components[root]].append(n)
 
-                for n in connected_component:
-                    self._sameas_adjacency[n] = connected_component.difference({n})
-                    to_compute -= {n}
-                    pbar.update(1)
+        self._sameas_components = [tuple(component) for component in self._sameas_components]
+        del sameas_parent, sameas_size, roots_to_components
 
         # Querying rdfs:subClassOf edges
         logger.info("Querying rdfs:subClassOf edges")
-        edges = server_manager.query_two_elements("?e1 rdfs:subClassOf ?e2 . ", verbose=True)
+        edges = self._get_edges_indices(next(edges_lists), server_manager.INTERNED_EDGES)
 
-        logger.info("Processing rdfs:subClassOf edges")
-        for e in tqdm.tqdm(edges):
-            n1 = self._cache_manager.get_element_index(e[0])
+        for n1, n2 in edges:
             if n1 not in self._subclassof_adjacency:
                 self._subclassof_adjacency[n1] = set()
 
-            n2 = self._cache_manager.get_element_index(e[1])
             if n2 not in self._subclassof_adjacency:
                 self._subclassof_adjacency[n2] = set()
 
             self._subclassof_adjacency[n1].add(n2)
 
+        del edges
+        classes_candidates = set(self._subclassof_adjacency.keys())
+        self._subclassof_adjacency = CSRAdjacency(self._subclassof_adjacency)
+
+        logger.info("Computing owl:sameAs and rdfs:subClassOf closure")
+        self._subsumption_closure = SubsumptionClosure(self._sameas_component, self._sameas_components,
+                                                       self._subclassof_adjacency)
+
         # Querying rdf:type edges
         logger.info("Querying rdf:type edges")
-        edges = server_manager.query_two_elements("?e1 rdf:type ?e2 . ", verbose=True)
+        edges = self._get_edges_indices(next(edges_lists), server_manager.INTERNED_EDGES)
 
-        logger.info("Processing rdf:type edges")
-        for e in tqdm.tqdm(edges):
-            n1 = self._cache_manager.get_element_index(e[0])
-            if n1 not in self._type_adjacency:
-                self._type_adjacency[n1] = set()
+        owl_class = self._cache_manager.get_element_index("http://www.w3.org/2002/07/owl#Class")
+        type_adjacency = {}
+        for n1, n2 in edges:
+            if n1 not in type_adjacency:
+                type_adjacency[n1] = set()
 
-            n2 = self._cache_manager.get_element_index(e[1])
-            if n2 not in self._type_adjacency:
-                self._type_adjacency[n2] = set()
+            if n2 not in type_adjacency:
+                type_adjacency[n2] = set()
 
-            self._type_adjacency[n1].add(n2)
+            type_adjacency[n1].add(n2)
 
-        # Expanding rdf:type edges with owl:sameAs and rdfs:subClassOf links
+            # Classes candidates are recorded before the expansion of rdf:type edges
+            classes_candidates.add(n2)
+            if n2 == owl_class:
+                classes_candidates.add(n1)
+
+        del edges
+        self._classes_candidates = array.array('i', sorted(classes_candidates))
+        del classes_candidates
+
+        # Expanding rdf:type edges with owl:sameAs and rdfs:subClassOf links, expanded types are interned
         logger.info("Expanding rdf:type edges with owl:sameAs and rdfs:subClassOf links")
-        to_compute = set(self._type_adjacency.keys())
+        type_sets_ids = {}
+        nodes_type_sets = {}
+        to_compute = set(type_adjacency.keys())
         with tqdm.tqdm(total=len(to_compute)) as pbar:
             while len(to_compute) != 0:
                 current_node = to_compute.pop()
-
-                type_expansion = self._type_adjacency[current_node]
+                same_nodes = self._get_sameas_members(current_node)
 
                 # Expansion with sameAs nodes
-                if current_node in self._sameas_adjacency:
-                    for same_node in self._sameas_adjacency[current_node]:
-                        if same_node in self._type_adjacency:
-                            type_expansion |= self._type_adjacency[same_node]
+                type_expansion = set()
+                for same_node in same_nodes:
+                    if same_node in type_adjacency:
+                        type_expansion |= type_adjacency.pop(same_node)
 
                 # Expansion with rdfs:subClassOf and sameAs nodes in type_expansion
-                type_expansion = self.get_nodes_sameas_subclassof_expansion(type_expansion)
+                type_expansion = frozenset(self.get_nodes_sameas_subclassof_expansion(type_expansion))
+
+                # Type set affectation for each node (current_node and sameAs nodes)
+                type_set_id = type_sets_ids.setdefault(type_expansion, len(type_sets_ids)) \
+                    if len(type_expansion) != 0 else -1
+
+                for same_node in same_nodes:
+                    if same_node in to_compute or same_node == current_node:
+                        to_compute.discard(same_node)
+                        pbar.update(1)
+
+                    if type_set_id != -1:
+                        nodes_type_sets[same_node] = type_set_id
+
+        del type_adjacency
+        logger.info("%d distinct type sets for %d typed nodes" % (len(type_sets_ids), len(nodes_type_sets)))
+
+        logger.info("Freezing rdf:type adjacency")
+        self._type_sets = CSRAdjacency({type_set_id: type_set for type_set, type_set_id in type_sets_ids.items()})
+        del type_sets_ids
+
+        type_sets_nodes = {}
+        for n in sorted(nodes_type_sets):
+            type_set_id = nodes_type_sets.pop(n)
+            self._typed_nodes.append(n)
+            self._typed_nodes_type_sets.append(type_set_id)
 
-                # Type affectation for each node (current_node and sameAs nodes)
-                self._type_adjacency[current_node] = type_expansion
-                pbar.update(1)
+            if type_set_id not in type_sets_nodes:
+                type_sets_nodes[type_set_id] = []
 
-                if current_node in self._sameas_adjacency:
-                    for same_node in self._sameas_adjacency[current_node]:
-                        if same_node in self._type_adjacency:
-                            to_compute -= {same_node}
-                            pbar.update(1)
+            type_sets_nodes[type_set_id].append(n)
 
-                        self._type_adjacency[same_node] = type_expansion
+        self._type_sets_nodes = CSRAdjacency(type_sets_nodes)
+
+        logger.info("Building instances index")
+        self._classes_type_sets = self._type_sets.get_transpose()
 
         # Querying partOf edges
         logger.info("Building partOf adjacency")
         for part_of_predicate in part_of_predicates:
             logger.info("Querying %s edges" % part_of_predicate)
-            edges = server_manager.query_two_elements("?e1 <%s> ?e2 . " % part_of_predicate, verbose=True)
+            edges = self._get_edges_indices(next(edges_lists), server_manager.INTERNED_EDGES)
 
-            logger.info("Processing %s edges" % part_of_predicate)
-            for e in tqdm.tqdm(edges):
-                n1 = self._cache_manager.get_element_index(e[0])
+            for n1, n2 in edges:
                 if n1 not in self._partOf_adjacency:
                     self._partOf_adjacency[n1] = set()
 
-                n2 = self._cache_manager.get_element_index(e[1])
                 if n2 not in self._partOf_adjacency:
                     self._partOf_adjacency[n2] = set()
 
@@ -161,58 +232,53 @@ class RDFGraph:
         logger.info("Completing partOf adjacency with hasPart edges")
         for has_part_predicate in has_part_predicates:
             logger.info("Querying %s edges" % has_part_predicate)
-            edges = server_manager.query_two_elements("?e1 <%s> ?e2 . " % has_part_predicate, verbose=True)
+            edges = self._get_edges_indices(next(edges_lists), server_manager.INTERNED_EDGES)
 
-            logger.info("Processing %s edges" % has_part_predicate)
-            for e in tqdm.tqdm(edges):
-                n1 = self._cache_manager.get_element_index(e[0])
+            for n1, n2 in edges:
                 if n1 not in self._partOf_adjacency:
                     self._partOf_adjacency[n1] = set()
 
-                n2 = self._cache_manager.get_element_index(e[1])
                 if n2 not in self._partOf_adjacency:
                     self._partOf_adjacency[n2] = set()
 
                 # We add n2 -> n1 in partOf adjacency as hasPart is the inverse of partOf
                 self._partOf_adjacency[n2].add(n1)
 
+        self._partOf_adjacency = CSRAdjacency(self._partOf_adjacency)
+
         # Querying dependsOn edges
         logger.info("Building dependsOn adjacency")
         for depends_on_predicate in depends_on_predicates:
             logging.info("Querying %s edges" % depends_on_predicate)
-            edges = server_manager.query_two_elements("?e1 <%s> ?e2 . " % depends_on_predicate, verbose=True)
+            edges = self._get_edges_indices(next(edges_lists), server_manager.INTERNED_EDGES)
 
-            logger.info("Processing %s edges" % depends_on_predicate)
-            for e in tqdm.tqdm(edges):
-                n1 = self._cache_manager.get_element_index(e[0])
+            for n1, n2 in edges:
                 if n1 not in self._dependsOn_adjacency:
                     self._dependsOn_adjacency[n1] = set()
 
-                n2 = self._cache_manager.get_element_index(e[1])
                 if n2 not in self._dependsOn_adjacency:
                     self._dependsOn_adjacency[n2] = set()
 
                 self._dependsOn_adjacency[n1].add(n2)
 
+        self._dependsOn_adjacency = CSRAdjacency(self._dependsOn_adjacency)
+
         # Querying entities linked by linking predicates
-        for lp in integration_ontology.get_linking_predicates():
+        for lp in linking_predicates:
             logger.info("Querying linking predicate %s edges" % lp)
-            edges = server_manager.query_two_elements("?e1 <%s> ?e2 . " % lp, verbose=True)
+            edges = self._get_edges_indices(next(edges_lists), server_manager.INTERNED_EDGES)
 
             self._linking_predicates_adjacency[lp] = {}
-            if len(edges) != 0:
-                logger.info("Processing linking predicate %s edges" % lp)
-                for e in tqdm.tqdm(edges):
-                    n1 = self._cache_manager.get_element_index(e[0])
-                    if n1 not in self._linking_predicates_adjacency[lp]:
-                        self._linking_predicates_adjacency[lp][n1] = set()
-
-                    n2 = self._cache_manager.get_element_index(e[1])
-                    if n2 not in self._linking_predicates_adjacency[lp]:
-                        self._linking_predicates_adjacency[lp][n2] = set()
-
-                    self._linking_predicates_adjacency[lp][n1].add(n2)
-            else:
+            for n1, n2 in edges:
+                if n1 not in self._linking_predicates_adjacency[lp]:
+                    self._linking_predicates_adjacency[lp][n1] = set()
+
+                if n2 not in self._linking_predicates_adjacency[lp]:
+                    self._linking_predicates_adjacency[lp][n2] = set()
+
+                self._linking_predicates_adjacency[lp][n1].add(n2)
+
+            if len(self._linking_predicates_adjacency[lp]) == 0:
                 logger.info("No edge found")
 
         # Completing linking predicates adjacencies with inverses
@@ -239,27 +305,54 @@ class RDFGraph:
                     else:
                         self._linking_predicates_adjacency[a][n] |= set(self._linking_predicates_adjacency[lp][n])
 
-    def _compute_sameas_connected_component(self, current_node_index):
+        logger.info("Freezing linking predicates adjacencies")
+        for lp in self._linking_predicates_adjacency:
+            self._linking_predicates_adjacency[lp] = CSRAdjacency(self._linking_predicates_adjacency[lp])
+
+    def _get_edges_indices(self, edges, interned):
         """
-        Computes the sameAs connected component the current_node_index belongs to
-        :param current_node_index: the seed node index for the connected component computation
-        :return: the set of nodes indices forming the connected component the current_node_index belongs to
-        (including itself)
+        Returns the edges as pairs of nodes indices, URIs are interned as edges are consumed
+        :param edges: iterable of the edges of a predicate, pairs of URIs or pairs of nodes indices
+        :param interned: whether edges are already pairs of nodes indices
+        :return: iterable of pairs of nodes indices
         """
 
-        connected_component = {current_node_index}
-        q = queue.Queue()
-        q.put(current_node_index)
+        if interned:
+            return edges
+
+        get_element_index = self._cache_manager.get_element_index
+        return ((get_element_index(e1), get_element_index(e2)) for e1, e2 in edges)
 
-        while not q.empty():
-            n = q.get()
+    @staticmethod
+    def _find_sameas_root(sameas_parent, node_index):
+        """
+        Returns the root of the node in the owl:sameAs union-find forest, halving the path on the way
+        :param sameas_parent: the union-find forest (node index -> parent node index, roots are not keys)
+        :param node_index: the node index whose root is needed
+        :return: the node index of the root
+        """
 
-            for n2 in self._sameas_adjacency[n]:
-                if n2 not in connected_component:
-                    connected_component.add(n2)
-                    q.put(n2)
+        while node_index in sameas_parent:
+            parent = sameas_parent[node_index]
 
-        return connected_component
+            if parent in sameas_parent:
+                sameas_parent[node_index] = sameas_parent[parent]
+
+            node_index = parent
+
+        return node_index
+
+    def _get_sameas_members(self, node_index):
+        """
+        Returns the nodes indices of the owl:sameAs connected component of the given node (shared tuple)
+        :param node_index: the node index whose connected component is needed
+        :return: tuple of nodes indices in the connected component of node_index (including itself)
+        """
+
+        if node_index not in self._sameas_component:
+            return node_index,
+
+        return self._sameas_components[self._sameas_component[node_index]]
 
     def get_node_sameas_adjacency(self, node_index):
         """
@@ -267,10 +360,7 @@ class RDFGraph:
         :param node_index:
         :return: the set of nodes indices that are same as the given node_index
         """
-        if node_index not in self._sameas_adjacency:
-            return set()
-
-        return set(self._sameas_adjacency[node_index])
+        return set(self._get_sameas_members(node_index)).difference({node_index})
 
     def get_nodes_sameas_subclassof_expansion(self, nodes_indices):
         """
@@ -280,23 +370,16 @@ class RDFGraph:
         seed nodes
         """
 
-        retval = set(nodes_indices)
-        diff = set(nodes_indices)
+        return self._subsumption_closure.get_closure(nodes_indices)
 
-        while len(diff) != 0:
-            temp = set(retval)
-
-            for n in diff:
-                if n in self._sameas_adjacency:
-                    temp |= self._sameas_adjacency[n]
-
-                if n in self._subclassof_adjacency:
-                    temp |= self._subclassof_adjacency[n]
-
-            diff = temp - retval
-            retval = temp
+    def get_classes_candidates(self):
+        """
+        Returns the nodes indices that may be classes of dimension ontologies, i.e., asserted objects of rdf:type,
+        instances of owl:Class and subjects or objects of rdfs:subClassOf (as the classes queries of ServerManager)
+        :return: sorted array of nodes indices of the classes candidates
+        """
 
-        return retval
+        return self._classes_candidates
 
     def get_nodes_typed_by(self, class_uri):
         """
@@ -305,16 +388,26 @@ class RDFGraph:
         :return: the set of of nodes indices that have the class_uri in their type adjacency
         """
 
-        class_uri_index = self._cache_manager.get_element_index(class_uri)
+        if not self._cache_manager.is_element_in_cache(class_uri):
+            return set()
 
         retval = set()
-
-        for n in self._type_adjacency:
-            if class_uri_index in self._type_adjacency[n]:
-                retval.add(n)
+        for type_set_id in self._classes_type_sets.get_neighbors(self._cache_manager.get_element_index(class_uri)):
+            retval.update(self._type_sets_nodes.get_neighbors(type_set_id))
 
         return retval
 
+    def get_node_linking_predicate_adjacency(self, node_index, linking_predicate):
+        """
+        Returns all nodes indices n such that node_index -- linking_predicate --> n.
+        owl:sameAs links are not considered on the seed node or the returned nodes
+        :param node_index: the initial seed node index
+        :param linking_predicate: URI of the linking predicate used to connect the node_index with the returned nodes
+        :return: set of all nodes n such that node_index -- linking_predicate --> n
+        """
+
+        return set(self._linking_predicates_adjacency[linking_predicate].get_neighbors(node_index))
+
     def get_node_linking_predicate_adjacency_typed_by(self, node_index, linking_predicate, class_uri):
         """
         Returns all nodes indices n such that node_index -- linking_predicate --> n and n is typed by class_uri.
@@ -325,16 +418,15 @@ class RDFGraph:
         :return: set of all nodes n such that node_index -- linking_predicate --> n and n is typed by class_uri
         """
 
-        class_uri_index = self._cache_manager.get_element_index(class_uri)
-
-        retval = set()
+        if not self._cache_manager.is_element_in_cache(class_uri):
+            return set()
 
-        if node_index in self._linking_predicates_adjacency[linking_predicate]:
-            for n in self._linking_predicates_adjacency[linking_predicate][node_index]:
-                if n in self._type_adjacency and class_uri_index in self._type_adjacency[n]:
-                    retval.add(n)
+        class_uri_index = self._cache_manager.get_element_index(class_uri)
 
-        return retval
+        return {
+            n for n in self._linking_predicates_adjacency[linking_predicate].get_neighbors(node_index)
+            if self._type_sets.has_neighbor(self.get_node_type_set_id(n), class_uri_index)
+        }
 
     def get_part_of_links(self):
         """
@@ -342,13 +434,7 @@ class RDFGraph:
         :return: set of tuple (n_index_1, n_index_2) of nodes indices having a partOf adjacency
         """
 
-        retval = set()
-
-        for n1 in self._partOf_adjacency:
-            for n2 in self._partOf_adjacency[n1]:
-                retval.add((n1, n2))
-
-        return retval
+        return set(self._partOf_adjacency.get_edges())
 
     def get_depends_on_links(self):
         """
@@ -356,13 +442,30 @@ class RDFGraph:
         :return: set of tuple (n_index_1, n_index_2) of nodes indices having a dependsOn adjacency
         """
 
-        retval = set()
+        return set(self._dependsOn_adjacency.get_edges())
 
-        for n1 in self._dependsOn_adjacency:
-            for n2 in self._dependsOn_adjacency[n1]:
-                retval.add((n1, n2))
+    def get_node_type_set_id(self, node_index):
+        """
+        Returns the id of the interned type set of the given node index (its expanded type adjacency)
+        :param node_index: the node index whose type set is needed
+        :return: the type set id or -1 if the node has no type
+        """
 
-        return retval
+        i = bisect.bisect_left(self._typed_nodes, node_index)
+
+        if i < len(self._typed_nodes) and self._typed_nodes[i] == node_index:
+            return self._typed_nodes_type_sets[i]
+
+        return -1
+
+    def get_type_set(self, type_set_id):
+        """
+        Returns the set of nodes indices of the classes in the given type set
+        :param type_set_id: the type set id (-1 for the empty type set)
+        :return: set of nodes indices of the classes in the type set
+        """
+
+        return set(self._type_sets.get_neighbors(type_set_id))
 
     def get_type_adjacency(self, node_index):
         """
@@ -371,7 +474,4 @@ class RDFGraph:
         :return: set of nodes indices being instantiated by the given node_index
         """
 
-        if node_index not in self._type_adjacency:
-            return set()
-
-        return set(self._type_adjacency[node_index])
+        return self.get_type_set(self.get_node_type_set_id(node_index))
@@ -0,0 +1,203 @@
+import array
+import logging
+
+import tqdm
+
+__author__ = "Pierre Monnin"
+
+
+class SubsumptionClosure:
+    """
+    Closure of nodes following owl:sameAs and rdfs:subClassOf links, computed once for all nodes of the rdfs:subClassOf
+    hierarchy. owl:sameAs connected components are condensed into vertices, cycles of the condensed rdfs:subClassOf
+    graph are condensed into strongly connected components (SCCs) with an iterative Tarjan algorithm and the closure of
+    each SCC is computed by dynamic programming in topological order from the closures of its direct successors.
+    SCCs nodes and closure rows (sorted SCCs ids) are stored in compressed sparse row format. An SCC with a single
+    successor SCC shares the closure of its successor instead of copying it: its row only contains itself and its
+    successor is stored as its next SCC, the closure of an SCC being its row and the closure of its next SCC. Chains of
+    the hierarchy are thus stored once
+    """
+
+    def __init__(self, sameas_component, sameas_components, subclassof_adjacency):
+        """
+        Builds the SubsumptionClosure
+        :param sameas_component: dictionary node index -> owl:sameAs component id
+        :param sameas_components: list component id -> tuple of nodes indices
+        :param subclassof_adjacency: the CSRAdjacency of rdfs:subClassOf edges
+        """
+
+        self._sameas_component = sameas_component
+        self._sameas_components = sameas_components
+
+        # Node index -> SCC id, only for nodes of the rdfs:subClassOf hierarchy (and their owl:sameAs nodes)
+        self._node_scc = {}
+        # Nodes of SCC s: _scc_nodes[_scc_indptr[s]:_scc_indptr[s + 1]]
+        self._scc_indptr = array.array('q', [0])
+        self._scc_nodes = array.array('i')
+        # Closure row of SCC s, sorted SCCs ids: _closure_indices[_closure_indptr[s]:_closure_indptr[s + 1]]
+        self._closure_indptr = array.array('q', [0])
+        self._closure_indices = array.array('i')
+        # Next SCC of SCC s, whose closure is shared by s, -1 if the row of s is its whole closure
+        self._closure_next = array.array('i')
+
+        logger = logging.getLogger()
+
+        # Vertex of a node: -1 - component id for nodes in an owl:sameAs component, the node index otherwise
+        vertex_scc = {}
+        vertex_order = {}
+        vertex_lowlink = {}
+        tarjan_stack = []
+        nb_cycles = 0
+
+        for root_node in tqdm.tqdm(subclassof_adjacency.get_nodes()):
+            root = self._get_vertex(root_node)
+            if root in vertex_order:
+                continue
+
+            vertex_order[root] = vertex_lowlink[root] = len(vertex_order)
+            tarjan_stack.append(root)
+            dfs_stack = [(root, self._get_successors(root, subclassof_adjacency))]
+
+            while len(dfs_stack) != 0:
+                vertex, successors = dfs_stack[-1]
+
+                for successor in successors:
+                    if successor not in vertex_order:
+                        vertex_order[successor] = vertex_lowlink[successor] = len(vertex_order)
+                        tarjan_stack.append(successor)
+                        dfs_stack.append((successor, self._get_successors(successor, subclassof_adjacency)))
+                        break
+
+                    elif successor not in vertex_scc:
+                        # The successor is still on the Tarjan stack
+                        vertex_lowlink[vertex] = min(vertex_lowlink[vertex], vertex_order[successor])
+
+                else:
+                    dfs_stack.pop()
+                    if len(dfs_stack) != 0:
+                        parent = dfs_stack[-1][0]
+                        vertex_lowlink[parent] = min(vertex_lowlink[parent], vertex_lowlink[vertex])
+
+                    if vertex_lowlink[vertex] == vertex_order[vertex]:
+                        # SCCs are found in reverse topological order: all their successors already have a closure
+                        scc = []
+                        while True:
+                            scc_vertex = tarjan_stack.pop()
+                            scc.append(scc_vertex)
+                            if scc_vertex == vertex:
+                                break
+
+                        if len(scc) > 1:
+                            nb_cycles += 1
+
+                        self._add_scc(scc, vertex_scc, subclassof_adjacency)
+
+        logger.info("%d SCCs, %d rdfs:subClassOf cycles condensed" % (len(self._scc_indptr) - 1, nb_cycles))
+
+    def _get_vertex(self, node_index):
+        """
+        Returns the vertex of a node in the condensed graph
+        :param node_index: the node index
+        :return: -1 - owl:sameAs component id if the node is in a component, the node index otherwise
+        """
+
+        if node_index in self._sameas_component:
+            return -1 - self._sameas_component[node_index]
+
+        return node_index
+
+    def _get_vertex_nodes(self, vertex):
+        """
+        Returns the nodes of a vertex of the condensed graph
+        :param vertex: the vertex
+        :return: tuple of nodes indices
+        """
+
+        if vertex < 0:
+            return self._sameas_components[-1 - vertex]
+
+        return vertex,
+
+    def _get_successors(self, vertex, subclassof_adjacency):
+        """
+        Returns a generator of the successors of a vertex in the condensed rdfs:subClassOf graph
+        :param vertex: the vertex
+        :param subclassof_adjacency: the CSRAdjacency of rdfs:subClassOf edges
+        :return: generator of vertices (possibly repeated)
+        """
+
+        for n in self._get_vertex_nodes(vertex):
+            for superclass in subclassof_adjacency.get_neighbors(n):
+                yield self._get_vertex(superclass)
+
+    def _add_scc(self, scc, vertex_scc, subclassof_adjacency):
+        """
+        Adds an SCC and computes its closure from the closures of its successors
+        :param scc: list of the vertices of the SCC
+        :param vertex_scc: dictionary vertex -> SCC id, updated
+        :param subclassof_adjacency: the CSRAdjacency of rdfs:subClassOf edges
+        """
+
+        scc_id = len(self._scc_indptr) - 1
+
+        for vertex in scc:
+            vertex_scc[vertex] = scc_id
+
+            for n in self._get_vertex_nodes(vertex):
+                self._node_scc[n] = scc_id
+                self._scc_nodes.append(n)
+
+        self._scc_indptr.append(len(self._scc_nodes))
+
+        successors_sccs = {vertex_scc[successor] for vertex in scc
+                           for successor in self._get_successors(vertex, subclassof_adjacency)}
+        successors_sccs.discard(scc_id)
+
+        # Successors have smaller ids than scc_id: closures stay sorted when scc_id is appended
+        if len(successors_sccs) == 1:
+            self._closure_next.append(successors_sccs.pop())
+
+        else:
+            closure = set()
+            for s in successors_sccs:
+                self._add_scc_closure(s, closure)
+
+            self._closure_indices.extend(sorted(closure))
+            self._closure_next.append(-1)
+
+        self._closure_indices.append(scc_id)
+        self._closure_indptr.append(len(self._closure_indices))
+
+    def _add_scc_closure(self, scc_id, sccs):
+        """
+        Adds the closure of an SCC to a set of SCCs ids, following the chain of its next SCCs. The chain is stopped at
+        the first SCC already in the set: the set only contains whole closures
+        :param scc_id: the SCC id
+        :param sccs: set of SCCs ids closed by the rdfs:subClassOf relation, updated
+        """
+
+        while scc_id != -1 and scc_id not in sccs:
+            sccs.update(self._closure_indices[self._closure_indptr[scc_id]:self._closure_indptr[scc_id + 1]])
+            scc_id = self._closure_next[scc_id]
+
+    def get_closure(self, nodes_indices):
+        """
+        Returns the nodes connected via owl:sameAs and rdfs:subClassOf links with the given nodes
+        :param nodes_indices: seed nodes indices
+        :return: set of the nodes indices connected with the seed nodes, including the seed nodes
+        """
+
+        retval = set()
+        sccs = set()
+
+        for n in nodes_indices:
+            if n in self._node_scc:
+                self._add_scc_closure(self._node_scc[n], sccs)
+
+            else:
+                retval.update(self._get_vertex_nodes(self._get_vertex(n)))
+
+        for s in sccs:
+            retval.update(self._scc_nodes[self._scc_indptr[s]:self._scc_indptr[s + 1]])
+
+        return retval
@@ -33,6 +33,17 @@ class Preorder:
 
         pass
 
+    @abc.abstractmethod
+    def get_blocking_keys(self, element):
+        """
+        Returns the blocking keys of a RelationshipElement. If {element} <= set2 according to preorder, then the upper
+        keys of element intersect the own keys of at least one RelationshipElement of set2
+        :param element: a RelationshipElement (not an index)
+        :return: a tuple (own keys, upper keys) of sets of hashable keys
+        """
+
+        pass
+
     def compare(self, set1, set2):
         """
         Compare two sets of RelationshipElements w.r.t the preorder
@@ -70,6 +81,12 @@ class PartOfPreorder(Preorder):
 
         return False
 
+    def get_blocking_keys(self, element):
+        own_keys = {("element", element.get_element_index())}
+        upper_keys = own_keys | {("element", i) for i in element.get_part_of_adjacency()}
+
+        return own_keys, upper_keys
+
 
 class MsciPreorder(Preorder):
     """
@@ -90,6 +107,9 @@ class MsciPreorder(Preorder):
             return True
 
         if len(set1) != 0:
+            # Union of the MSCI of set2, each class of MSCI(i1) must be subsumed by one of them
+            msci2 = set().union(*(i2.msci(self._dimension_ontology) for i2 in set2))
+
             return all(
                 i1 in set2
                 or
@@ -97,11 +117,7 @@ class MsciPreorder(Preorder):
                     len(i1.msci(self._dimension_ontology)) != 0
                     and
                     all(
-                        any(
-                            any(
-                                self._dimension_ontology.is_subsumed(c1, c2)
-                                for c2 in i2.msci(self._dimension_ontology)
-                            ) for i2 in set2)
+                        self._dimension_ontology.is_subsumed_by_any(c1, msci2)
                         for c1 in i1.msci(self._dimension_ontology)
                     )
                 )
@@ -109,3 +125,13 @@ class MsciPreorder(Preorder):
             )
 
         return False
+
+    def get_blocking_keys(self, element):
+        msci = element.msci(self._dimension_ontology)
+
+        own_keys = {("element", element.get_element_index())} | {("class", c) for c in msci}
+        upper_keys = own_keys | {
+            ("class", a) for c in msci for a in self._dimension_ontology.get_ancestors(c)
+        }
+
+        return own_keys, upper_keys
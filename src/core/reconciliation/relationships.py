@@ -1,11 +1,34 @@
+import collections
 import itertools
 import logging
+import multiprocessing
 import tqdm
 
 from core.reconciliation.preorders import OrderResult, PartOfPreorder, MsciPreorder
 
 __author__ = "Pierre Monnin"
 
+# (RelationshipsModel, profiles, BlockingIndex) inherited by processes forked in reconcile_parallel
+_forked_reconciliation = None
+
+
+def _reconcile_rows_in_worker(rows):
+    """
+    Reconciles a chunk of rows in a worker process forked by RelationshipsModel.reconcile_parallel
+    :param rows: list of positions of profiles
+    :return: a tuple (number of rows, list of results for these rows, comparison cache hits, comparison cache misses)
+    """
+
+    model, profiles, blocking_index = _forked_reconciliation
+    hits, misses = model.get_comparison_cache_statistics()
+
+    results = []
+    for i in rows:
+        results.extend(model._reconcile_row(profiles, blocking_index, i))
+
+    new_hits, new_misses = model.get_comparison_cache_statistics()
+    return len(rows), results, new_hits - hits, new_misses - misses
+
 
 class RelationshipElement:
     """
@@ -64,15 +87,18 @@ class RelationshipElement:
         """
         self._depends_on_adjacency.add(element_index)
 
-    def set_classes_instantiated(self, dimension_ontology, classes_indices):
+    def set_classes_instantiated(self, dimension_ontology, classes_indices, msci):
         """
-        Defines the set of classes instantiated by the RelationshipElement w.r.t. the dimension ontology
+        Defines the set of classes instantiated by the RelationshipElement w.r.t. the dimension ontology. Both
+        frozensets are shared by elements having the same type set, they are not copied
         :param dimension_ontology: dimension ontology whose classes belongs to
-        :param classes_indices: indices of classes from the DimensionOntology that the RelationshipElement instantiates
+        :param classes_indices: frozenset of indices of classes from the DimensionOntology that the RelationshipElement
+        instantiates
+        :param msci: frozenset of the minimum classes of classes_indices (dimension_ontology.min(classes_indices))
         """
 
-        self._classes_instantiated[dimension_ontology] = set(classes_indices)
-        self._msci[dimension_ontology] = dimension_ontology.min(classes_indices)
+        self._classes_instantiated[dimension_ontology] = classes_indices
+        self._msci[dimension_ontology] = msci
 
     def get_classes_instantiated(self, dimension_ontology):
         """
@@ -86,6 +112,14 @@ class RelationshipElement:
 
         return set(self._classes_instantiated[dimension_ontology])
 
+    def get_part_of_adjacency(self):
+        """
+        Returns the set of indices of RelationshipElements that the current element is part of
+        :return: set of indices of RelationshipElements that the current element is part of
+        """
+
+        return set(self._part_of_adjacency)
+
     def get_depends_on_adjacency(self):
         """
         Returns the set of indices of RelationshipElements that are adjacent via dependsOn with the current element
@@ -162,7 +196,7 @@ class Relationship:
         if dimension_name not in self._dimensions:
             self._dimensions[dimension_name] = {}
 
-        self._dimensions[dimension_name][linking_predicate] = set(elements_indices)
+        self._dimensions[dimension_name][linking_predicate] = frozenset(elements_indices)
 
     def get_dimension(self, dimension_name, linking_predicate):
         """
@@ -177,6 +211,48 @@ class Relationship:
 
         return set()
 
+    def get_dimension_frozenset(self, dimension_name, linking_predicate):
+        """
+        Returns the frozenset of RelationshipElements indices that are in the dimension dimension_name/linking predicate
+        without copying it
+        :param dimension_name: dimension name defining the dimension
+        :param linking_predicate: linking predicate used to link RelationshipElements to the Relationship
+        :return: frozenset of RelationshipElements indices that are in the dimension dimension_name/linking predicate
+        """
+
+        if dimension_name in self._dimensions and linking_predicate in self._dimensions[dimension_name]:
+            return self._dimensions[dimension_name][linking_predicate]
+
+        return frozenset()
+
+    def get_signature(self):
+        """
+        Returns a canonical hashable signature of the content of the dimensions of the Relationship. Two relationships
+        with the same signature have the same non-empty sets of RelationshipElements for each dimension / linking
+        predicate, and are thus EQUAL
+        :return: frozenset of tuples ((dimension_name, linking_predicate), frozenset of RelationshipElements indices)
+        """
+
+        return frozenset(
+            ((dimension_name, lp), self._dimensions[dimension_name][lp])
+            for dimension_name in self._dimensions
+            for lp in self._dimensions[dimension_name]
+            if len(self._dimensions[dimension_name][lp]) != 0
+        )
+
+    def get_non_empty_dimensions(self):
+        """
+        Returns the pairs dimension name / linking predicate whose set of RelationshipElements is non-empty
+        :return: set of tuples (dimension_name, linking_predicate) whose set of RelationshipElements is non-empty
+        """
+
+        return {
+            (dimension_name, lp)
+            for dimension_name in self._dimensions
+            for lp in self._dimensions[dimension_name]
+            if len(self._dimensions[dimension_name][lp]) != 0
+        }
+
     def __str__(self):
         retval = "-- Relationship (node index: " + str(self._uri_index) + ") --\n"
         for dimension_name in self._dimensions:
@@ -187,12 +263,208 @@ class Relationship:
         return retval
 
 
+class ComparisonCache:
+    """
+    LRU-bounded memo of the comparisons of two sets of RelationshipElements on a dimension. Keys are tuples
+    (dimension_name, frozenset of elements indices, frozenset of elements indices) whose frozensets should be interned
+    """
+
+    def __init__(self, max_size):
+        """
+        Builds the ComparisonCache
+        :param max_size: maximum number of comparisons kept in the cache
+        """
+
+        self._max_size = max_size
+        self._results = collections.OrderedDict()
+        self._hits = 0
+        self._misses = 0
+
+    def get(self, key):
+        """
+        Returns the cached result of a comparison and counts a hit or a miss
+        :param key: tuple (dimension_name, frozenset of elements indices, frozenset of elements indices)
+        :return: the cached OrderResult or None if the comparison is not in the cache
+        """
+
+        result = self._results.get(key)
+
+        if result is None:
+            self._misses += 1
+
+        else:
+            self._hits += 1
+            self._results.move_to_end(key)
+
+        return result
+
+    def put(self, key, result):
+        """
+        Adds the result of a comparison in the cache, evicting the least recently used comparison if needed
+        :param key: tuple (dimension_name, frozenset of elements indices, frozenset of elements indices)
+        :param result: the OrderResult of the comparison
+        """
+
+        self._results[key] = result
+
+        if len(self._results) > self._max_size:
+            self._results.popitem(last=False)
+
+    def add_statistics(self, hits, misses):
+        """
+        Adds hits and misses counted elsewhere (e.g., in worker processes) to the counters
+        :param hits: number of hits to add
+        :param misses: number of misses to add
+        """
+
+        self._hits += hits
+        self._misses += misses
+
+    def get_statistics(self):
+        """
+        Returns the hits and misses counters of the cache
+        :return: a tuple (hits, misses)
+        """
+
+        return self._hits, self._misses
+
+
+class BlockingIndex:
+    """
+    Inverted indexes from blocking keys of RelationshipElements to relationships, for each pair dimension / linking
+    predicate. Used to only compare pairs of relationships that can be ordered or DO_RELATED.
+    A pair whose supports (pairs dimension / linking predicate with non-empty sets) are not nested is INCOMPARABLE for
+    rules 1, 2 and 3 as the empty set is lower than any set. Nested supports must share a blocking key in each common
+    pair dimension / linking predicate. Rule 4 needs a common pair whose dimension is not the dependsOn dimension.
+    Relationships with an empty support are comparable with every relationship.
+    """
+
+    def __init__(self, relationships, elements, preorders, do_dimensions_names):
+        """
+        Builds the BlockingIndex
+        :param relationships: list of Relationships, positions in this list are used in the index
+        :param elements: list of RelationshipElements of the RelationshipsModel
+        :param preorders: dictionary dimension name -> Preorder
+        :param do_dimensions_names: set of names of the dimensions enabling dependsOn similarity
+        """
+
+        self._supports = []
+        self._own_keys = []
+        self._upper_keys = []
+        self._empty_support_positions = []
+
+        # Dictionaries (dimension_name, linking_predicate) -> key -> set of positions
+        self._own_index = {}
+        self._upper_index = {}
+
+        # Pairs dimension / linking predicate on which a shared key may lead to a DO_RELATED result
+        self._do_candidates_dimensions = {
+            dimension_name for dimension_name in preorders
+            if any(do_name != dimension_name for do_name in do_dimensions_names)
+        }
+
+        elements_keys = {}
+        for position, relationship in enumerate(relationships):
+            support = relationship.get_non_empty_dimensions()
+            own_keys = {}
+            upper_keys = {}
+
+            for dimension_lp in support:
+                dimension_name, lp = dimension_lp
+                own_keys[dimension_lp] = set()
+                upper_keys[dimension_lp] = set()
+
+                for i in relationship.get_dimension(dimension_name, lp):
+                    if (dimension_name, i) not in elements_keys:
+                        elements_keys[(dimension_name, i)] = preorders[dimension_name].get_blocking_keys(elements[i])
+
+                    own_keys[dimension_lp] |= elements_keys[(dimension_name, i)][0]
+                    upper_keys[dimension_lp] |= elements_keys[(dimension_name, i)][1]
+
+                self._add_to_index(self._own_index, dimension_lp, own_keys[dimension_lp], position)
+                self._add_to_index(self._upper_index, dimension_lp, upper_keys[dimension_lp], position)
+
+            if len(support) == 0:
+                self._empty_support_positions.append(position)
+
+            self._supports.append(support)
+            self._own_keys.append(own_keys)
+            self._upper_keys.append(upper_keys)
+
+    @staticmethod
+    def _add_to_index(index, dimension_lp, keys, position):
+        """
+        Adds the position of a relationship in the index for each of the given keys
+        :param index: the inverted index to complete
+        :param dimension_lp: the pair dimension name / linking predicate
+        :param keys: the blocking keys of the relationship for dimension_lp
+        :param position: the position of the relationship
+        """
+
+        if dimension_lp not in index:
+            index[dimension_lp] = {}
+
+        for k in keys:
+            if k not in index[dimension_lp]:
+                index[dimension_lp][k] = set()
+
+            index[dimension_lp][k].add(position)
+
+    def get_candidates(self, position):
+        """
+        Returns the positions of relationships that are after the given position and that may not be INCOMPARABLE with
+        the relationship at the given position
+        :param position: position of the relationship
+        :return: sorted list of candidate positions greater than position
+        """
+
+        support = self._supports[position]
+
+        if len(support) == 0:
+            return list(range(position + 1, len(self._supports)))
+
+        matched = {}
+        for dimension_lp in support:
+            own_index = self._own_index[dimension_lp]
+            upper_index = self._upper_index[dimension_lp]
+
+            positions = set()
+            for k in self._upper_keys[position][dimension_lp]:
+                if k in own_index:
+                    positions |= own_index[k]
+
+            for k in self._own_keys[position][dimension_lp]:
+                if k in upper_index:
+                    positions |= upper_index[k]
+
+            for p in positions:
+                if p > position:
+                    if p not in matched:
+                        matched[p] = set()
+
+                    matched[p].add(dimension_lp)
+
+        candidates = {p for p in self._empty_support_positions if p > position}
+        for p, matched_dimensions in matched.items():
+            other_support = self._supports[p]
+
+            if (support <= other_support or other_support <= support) and \
+                    matched_dimensions == support & other_support:
+                candidates.add(p)
+
+            elif any(dimension_name in self._do_candidates_dimensions for dimension_name, _ in matched_dimensions):
+                candidates.add(p)
+
+        return sorted(candidates)
+
+
 class RelationshipsModel:
     """
     Main class to use for the reconciliation of relationship. Represents the global model for the reconciliation.
     """
 
-    def __init__(self, rdf_graph, integration_ontology, dimensions_ontologies, configuration_parameters, cache_manager):
+    def __init__(self, rdf_graph, integration_ontology, dimensions_ontologies, configuration_parameters, cache_manager,
+                 comparison_cache_size=1000000):
         """
         Builds the Relationships Model
         :param rdf_graph: the RDFGraph used for the reconciliation
@@ -200,6 +472,7 @@ class RelationshipsModel:
         :param dimensions_ontologies: the dimensions ontologies used for each dimension
         :param configuration_parameters: the configuration parameters of the scripts
         :param cache_manager: the global cache manager of the scripts (URI <-> node index in the graph)
+        :param comparison_cache_size: maximum number of comparisons of sets of elements kept in the ComparisonCache
         """
 
         self._logger = logging.getLogger()
@@ -216,6 +489,11 @@ class RelationshipsModel:
         self._do_related_enabled = any(d["depends-on-similarity"] for d in self._dimensions)
         self._relationships = {}
 
+        # Sets of elements indices are interned so that comparisons are memoized on identical frozensets
+        self._interned_elements_sets = {}
+        self._depends_on_unions = {}
+        self._comparison_cache = ComparisonCache(comparison_cache_size)
+
         # Build preorders
         self._preorders = {}
         for d in self._dimensions:
@@ -225,6 +503,18 @@ class RelationshipsModel:
             else:
                 self._preorders[d["name"]] = MsciPreorder(dimensions_ontologies[d["name"]])
 
+        # Nodes instantiating the top classes of each dimension, relationships components are intersected with them
+        lp_dimensions = {}
+        dimensions_nodes = {}
+        for dimension in configuration_parameters["dimensions"]:
+            lp_dimensions[dimension["name"]] = integration_ontology.linking_predicates_descendants_expansion(
+                dimension["integration-ontology-top-linking-predicates"]
+            )
+
+            dimensions_nodes[dimension["name"]] = set()
+            for dim_class in dimension["integration-ontology-top-classes"]:
+                dimensions_nodes[dimension["name"]] |= rdf_graph.get_nodes_typed_by(dim_class)
+
         # Getting all relationships
         self._logger.info("Building relationships and their components")
         for relationship_class_uri in configuration_parameters["integration-ontology-relationships-classes"]:
@@ -235,26 +525,24 @@ class RelationshipsModel:
                     relationship = Relationship(rel_index)
 
                     for dimension in configuration_parameters["dimensions"]:
-                        lp_dimension = integration_ontology.linking_predicates_descendants_expansion(
-                            dimension["integration-ontology-top-linking-predicates"]
-                        )
-
                         # We build a dimension of a relationship for each pair dimension / linking predicate
-                        for lp in lp_dimension:
+                        for lp in lp_dimensions[dimension["name"]]:
                             dim_lp_elements = set()
 
                             # Get nodes indices n such that rel_index -- linking predicate --> n and dim_class(n)
-                            for dim_class in dimension["integration-ontology-top-classes"]:
-                                for n in rdf_graph.get_node_linking_predicate_adjacency_typed_by(rel_index, lp,
-                                                                                                 dim_class):
-                                    # We add the element to the dimension
-                                    dim_lp_elements.add(self._get_element_index_from_cache_index(n, rdf_graph))
+                            for n in rdf_graph.get_node_linking_predicate_adjacency(rel_index, lp) & \
+                                    dimensions_nodes[dimension["name"]]:
+                                # We add the element to the dimension
+                                dim_lp_elements.add(self._get_element_index_from_cache_index(n, rdf_graph))
 
                             # We add the dimension to the relationship
-                            relationship.add_dimension(dimension["name"], lp, dim_lp_elements)
+                            relationship.add_dimension(dimension["name"], lp,
+                                                       self._intern_elements_set(dim_lp_elements))
 
                     self._relationships[rel_index] = relationship
 
+        del dimensions_nodes
+
         # Building partOf links
         self._logger.info("Building partOf links")
         for (node_index_1, node_index_2) in tqdm.tqdm(rdf_graph.get_part_of_links()):
@@ -272,17 +560,26 @@ class RelationshipsModel:
             self._elements[element_index_1].add_depends_on_adjacency(element_index_2)
 
         # Building relationships elements types
+        # Classes instantiated and their minimum are computed once per type set and shared by elements
         self._logger.info("Building relationships elements types")
+        type_sets_classes = {}
         for element in tqdm.tqdm(self._elements):
             # We can only use one URI from the elements URIs as type adjacency in RDF graph has been expanded
-            element_type = rdf_graph.get_type_adjacency(element.get_uris_indices().pop())
+            type_set_id = rdf_graph.get_node_type_set_id(element.get_uris_indices().pop())
 
-            for dimension in configuration_parameters["dimensions"]:
-                dimension_ontology = dimensions_ontologies[dimension["name"]]
-                element.set_classes_instantiated(
-                    dimension_ontology,
-                    dimension_ontology.get_classes_indices_from_uris_indices(element_type)
-                )
+            if type_set_id not in type_sets_classes:
+                element_type = rdf_graph.get_type_set(type_set_id)
+                type_sets_classes[type_set_id] = []
+
+                for dimension in configuration_parameters["dimensions"]:
+                    dimension_ontology = dimensions_ontologies[dimension["name"]]
+                    classes_indices = frozenset(dimension_ontology.get_classes_indices_from_uris_indices(element_type))
+                    type_sets_classes[type_set_id].append(
+                        (dimension_ontology, classes_indices, frozenset(dimension_ontology.min(classes_indices)))
+                    )
+
+            for dimension_ontology, classes_indices, msci in type_sets_classes[type_set_id]:
+                element.set_classes_instantiated(dimension_ontology, classes_indices, msci)
 
     def _get_element_index_from_cache_index(self, node_index, rdf_graph):
         """
@@ -306,28 +603,132 @@ class RelationshipsModel:
 
         return self._cache_index_to_elements_index[node_index]
 
-    def reconcile(self):
+    def reconcile(self, blocking=True, shard=None):
         """
-        Reconcile all relationships in the RelationshipsModel
-        :return: A list of dictionaries (uri_index_1, order_result, uri_index_2) where order_result is either
+        Reconcile all relationships in the RelationshipsModel. Results are yielded as soon as they are found
+        :param blocking: if true, only pairs of relationships given by the BlockingIndex are compared. Otherwise, all
+        pairs are compared. Results are identical.
+        :param shard: None to reconcile all pairs, or a tuple (shard_index, nb_shards) with 0 <= shard_index < nb_shards
+        to only reconcile the pairs of one shard of the pair space (see _prepare_reconciliation)
+        :return: A generator of tuples (uri_index_1, order_result, uri_index_2) where order_result is either
         OrderResult.EQUAL, EQUIV, LEQ, or GEQ. It can also be DO_RELATED if the dependsOn similarity is enabled for
         at least one dimension. INCOMPARABLE relationships are discarded
         """
-        reconciliation_results = []
 
-        with tqdm.tqdm(total=len(self._relationships) * (len(self._relationships) - 1) // 2) as pbar:
-            for rel1, rel2 in itertools.combinations(self._relationships.values(), 2):
-                result = self.compare(rel1, rel2)
+        profiles, blocking_index, rows = self._prepare_reconciliation(blocking, shard)
+        for i in tqdm.tqdm(rows):
+            yield from self._reconcile_row(profiles, blocking_index, i)
+
+    def reconcile_parallel(self, nb_processes, blocking=True, shard=None):
+        """
+        Reconcile all relationships in the RelationshipsModel with a pool of processes. The pair space is split in
+        chunks of rows (see _prepare_reconciliation). Processes are forked after the model is built and inherit it, so
+        that it is never pickled. Results are yielded as soon as chunks are done, in the same order as reconcile
+        :param nb_processes: number of worker processes
+        :param blocking: if true, only pairs of relationships given by the BlockingIndex are compared
+        :param shard: None to reconcile all pairs, or a tuple (shard_index, nb_shards), see reconcile
+        :return: generator of tuples (uri_index_1, order_result, uri_index_2), see reconcile
+        """
+
+        global _forked_reconciliation
+
+        profiles, blocking_index, rows = self._prepare_reconciliation(blocking, shard)
+
+        # Small chunks so that rows of different lengths are balanced between processes
+        chunk_size = max(1, len(rows) // (nb_processes * 64))
+        chunks = [rows[i:i + chunk_size] for i in range(0, len(rows), chunk_size)]
+
+        _forked_reconciliation = (self, profiles, blocking_index)
+        try:
+            with multiprocessing.get_context("fork").Pool(nb_processes) as pool:
+                with tqdm.tqdm(total=len(rows)) as pbar:
+                    for nb_rows, results, hits, misses in pool.imap(_reconcile_rows_in_worker, chunks):
+                        yield from results
+                        self._comparison_cache.add_statistics(hits, misses)
+                        pbar.update(nb_rows)
+
+        finally:
+            _forked_reconciliation = None
+
+    def _prepare_reconciliation(self, blocking, shard):
+        """
+        Returns the profiles to reconcile, the BlockingIndex to use and the rows to reconcile.
+        Relationships are grouped in profiles by signature (see Relationship.get_signature): relationships of a profile
+        are EQUAL and the comparison of two profiles holds for all their members. Relationships are sorted by URI so
+        that positions do not depend on the order of the triplestore results.
+        The row i contains the pairs of relationships inside profile i and the pairs (i, j) of profiles with j > i.
+        Rows i and n - 1 - i contain n - 1 pairs of profiles together, shards are balanced by assigning such couples of
+        rows in a round-robin fashion
+        :param blocking: if true, a BlockingIndex is built on the profiles. Otherwise, all pairs of profiles are
+        compared
+        :param shard: None to reconcile all rows, or a tuple (shard_index, nb_shards)
+        :return: a tuple (list of profiles, i.e., lists of Relationships, BlockingIndex or None, list of positions of
+        rows to reconcile)
+        """
+
+        relationships = sorted(
+            self._relationships.values(),
+            key=lambda r: self._cache_manager.get_element_from_index(r.get_uri_index())
+        )
+
+        signatures_to_profiles = {}
+        for relationship in relationships:
+            signature = relationship.get_signature()
+
+            if signature not in signatures_to_profiles:
+                signatures_to_profiles[signature] = []
+
+            signatures_to_profiles[signature].append(relationship)
+
+        profiles = list(signatures_to_profiles.values())
+        del signatures_to_profiles
+        self._logger.info("%d relationships in %d profiles" % (len(relationships), len(profiles)))
+
+        rows = list(range(len(profiles)))
+        if shard is not None:
+            shard_index, nb_shards = shard
+            rows = [i for i in rows if min(i, len(profiles) - 1 - i) % nb_shards == shard_index]
+
+        blocking_index = None
+        if blocking:
+            self._logger.info("Building blocking index")
+            blocking_index = BlockingIndex(
+                [profile[0] for profile in profiles],
+                self._elements,
+                self._preorders,
+                {d["name"] for d in self._dimensions if d["depends-on-similarity"]}
+            )
+
+        return profiles, blocking_index, rows
+
+    def _reconcile_row(self, profiles, blocking_index, i):
+        """
+        Reconciles the relationships inside the profile at position i and compares this profile with the profiles after
+        it. Each comparison of two profiles is done once on their first relationships and expanded to their members
+        :param profiles: list of profiles (lists of Relationships with the same signature) to reconcile
+        :param blocking_index: BlockingIndex built on profiles, or None to compare all pairs of profiles
+        :param i: position of the profile in profiles
+        :return: generator of tuples (uri_index_1, order_result, uri_index_2) for pairs that are not INCOMPARABLE
+        """
+
+        profile1 = profiles[i]
+        for rel1, rel2 in itertools.combinations(profile1, 2):
+            yield rel1.get_uri_index(), OrderResult.EQUAL, rel2.get_uri_index()
+
+        if blocking_index is None:
+            candidates = range(i + 1, len(profiles))
 
-                if result != OrderResult.INCOMPARABLE:
-                    reconciliation_results.append({
-                        "uri_index_1": rel1.get_uri_index(),
-                        "order_result": result,
-                        "uri_index_2": rel2.get_uri_index()
-                    })
-                pbar.update(1)
+        else:
+            candidates = blocking_index.get_candidates(i)
 
-        return reconciliation_results
+        for j in candidates:
+            profile2 = profiles[j]
+            result = self.compare(profile1[0], profile2[0])
+
+            if result != OrderResult.INCOMPARABLE:
+                for rel1 in profile1:
+                    for rel2 in profile2:
+                        yield rel1.get_uri_index(), result, rel2.get_uri_index()
 
     def explain_reconciliation(self, rel_node_1, rel_node_2):
         """
@@ -366,9 +767,10 @@ class RelationshipsModel:
             while compare_result != OrderResult.INCOMPARABLE and len(lp_dimension) != 0:
                 lp = lp_dimension.pop()
 
-                preorder_result = self._preorders[dimension["name"]].compare(
-                    {self._elements[i] for i in rel1.get_dimension(dimension["name"], lp)},
-                    {self._elements[i] for i in rel2.get_dimension(dimension["name"], lp)}
+                preorder_result = self._compare_dimension(
+                    dimension["name"],
+                    rel1.get_dimension_frozenset(dimension["name"], lp),
+                    rel2.get_dimension_frozenset(dimension["name"], lp)
                 )
 
                 compare_result &= preorder_result
@@ -401,9 +803,10 @@ class RelationshipsModel:
             )
 
             for lp in lp_dimension:
-                preorder_result = self._preorders[dimension["name"]].compare(
-                    {self._elements[i] for i in rel1.get_dimension(dimension["name"], lp)},
-                    {self._elements[i] for i in rel2.get_dimension(dimension["name"], lp)}
+                preorder_result = self._compare_dimension(
+                    dimension["name"],
+                    rel1.get_dimension_frozenset(dimension["name"], lp),
+                    rel2.get_dimension_frozenset(dimension["name"], lp)
                 )
 
                 self._logger.info(dimension["name"] + " / " + lp + " => " + str(preorder_result))
@@ -472,9 +875,10 @@ class RelationshipsModel:
             dimension["integration-ontology-top-linking-predicates"]
         )
 
-        return all(self._preorders[dimension["name"]].compare(
-            {self._elements[i] for i in rel1.get_dimension(dimension["name"], lp)},
-            {self._elements[i] for i in rel2.get_dimension(dimension["name"], lp)}
+        return all(self._compare_dimension(
+            dimension["name"],
+            rel1.get_dimension_frozenset(dimension["name"], lp),
+            rel2.get_dimension_frozenset(dimension["name"], lp)
         ) & OrderResult.EQUIVALENT == OrderResult.EQUIVALENT for lp in lp_dimension)
 
     def _is_depends_on_equivalent(self, rel1, rel2, do_dimension):
@@ -499,27 +903,23 @@ class RelationshipsModel:
 
             if other_dimension == do_dimension:
                 if any(
-                        len(self._depends_on_union(rel1.get_dimension(do_dimension["name"], p1))) != 0
+                        len(self._depends_on_union(rel1.get_dimension_frozenset(do_dimension["name"], p1))) != 0
                         and
-                        self._depends_on_union(rel1.get_dimension(do_dimension["name"], p1))
+                        self._depends_on_union(rel1.get_dimension_frozenset(do_dimension["name"], p1))
                         ==
-                        self._depends_on_union(rel2.get_dimension(other_dimension["name"], p1))
+                        self._depends_on_union(rel2.get_dimension_frozenset(other_dimension["name"], p1))
                         for p1 in lp_do_dimension
                 ):
                     return True
 
             else:
                 if any(
-                        len(self._depends_on_union(rel1.get_dimension(do_dimension["name"], p1))) != 0
+                        len(self._depends_on_union(rel1.get_dimension_frozenset(do_dimension["name"], p1))) != 0
                         and
-                        self._preorders[other_dimension["name"]].compare(
-                            {
-                                self._elements[i]
-                                for i in self._depends_on_union(rel1.get_dimension(do_dimension["name"], p1))
-                            },
-                            {
-                                self._elements[i] for i in rel2.get_dimension(other_dimension["name"], p2)
-                            }
+                        self._compare_dimension(
+                            other_dimension["name"],
+                            self._depends_on_union(rel1.get_dimension_frozenset(do_dimension["name"], p1)),
+                            rel2.get_dimension_frozenset(other_dimension["name"], p2)
                         ) & OrderResult.EQUIVALENT == OrderResult.EQUIVALENT
                         for p1 in lp_do_dimension for p2 in lp_other_dimension
                 ):
@@ -530,16 +930,92 @@ class RelationshipsModel:
     def _depends_on_union(self, elements_indices):
         """
         Returns the set of indices of elements in the dependsOn adjacency of the elements whose indices are in
-        elements_indices
+        elements_indices. Unions are memoized and interned
+        :param elements_indices: an interned frozenset of indices of elements
+        :return: interned frozenset of indices of elements in the dependsOn adjacency of the elements whose indices are
+        in elements_indices
+        """
+
+        if elements_indices not in self._depends_on_unions:
+            retval = set()
+
+            for i in elements_indices:
+                retval |= self._elements[i].get_depends_on_adjacency()
+
+            self._depends_on_unions[elements_indices] = self._intern_elements_set(retval)
+
+        return self._depends_on_unions[elements_indices]
+
+    def _intern_elements_set(self, elements_indices):
+        """
+        Returns the interned frozenset equal to the given set of elements indices
         :param elements_indices: a set of indices of elements
-        :return: set of indices of elements in the dependsOn adjacency of the elements whose indices are in
-        elements_indices
+        :return: the interned frozenset equal to elements_indices
         """
 
-        retval = set()
+        elements_indices = frozenset(elements_indices)
 
-        for i in elements_indices:
-            retval |= self._elements[i].get_depends_on_adjacency()
+        if elements_indices not in self._interned_elements_sets:
+            self._interned_elements_sets[elements_indices] = elements_indices
 
-        return retval
+        return self._interned_elements_sets[elements_indices]
+
+    def _compare_dimension(self, dimension_name, elements_indices_1, elements_indices_2):
+        """
+        Compares two sets of RelationshipElements with the preorder of a dimension. Results are memoized in the
+        ComparisonCache
+        :param dimension_name: name of the dimension whose preorder is used
+        :param elements_indices_1: interned frozenset of indices of RelationshipElements
+        :param elements_indices_2: interned frozenset of indices of RelationshipElements
+        :return: OrderResult.EQUAL, EQUIVALENT, LEQ, GEQ or INCOMPARABLE
+        """
 
+        key = (dimension_name, elements_indices_1, elements_indices_2)
+        result = self._comparison_cache.get(key)
+
+        if result is None:
+            result = self._preorders[dimension_name].compare(
+                {self._elements[i] for i in elements_indices_1},
+                {self._elements[i] for i in elements_indices_2}
+            )
+            self._comparison_cache.put(key, result)
+
+        return result
+
+    def get_comparison_cache_statistics(self):
+        """
+        Returns the hits and misses counters of the cache of comparisons of sets of RelationshipElements
+        :return: a tuple (hits, misses)
+        """
+
+        return self._comparison_cache.get_statistics()
+
+    def __getstate__(self):
+        """
+        Returns the state saved in a snapshot: the logger, the integration ontology (an rdflib graph, reloaded from its
+        file) and the memos of comparisons and dependsOn unions are excluded
+        :return: the state of the RelationshipsModel
+        """
+
+        state = dict(self.__dict__)
+        for attribute in ("_logger", "_integration_ontology", "_comparison_cache", "_depends_on_unions"):
+            del state[attribute]
+
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._logger = logging.getLogger()
+        self._integration_ontology = None
+        self._depends_on_unions = {}
+        self._comparison_cache = None
+
+    def restore(self, integration_ontology, comparison_cache_size):
+        """
+        Restores the attributes excluded from a snapshot once the RelationshipsModel is loaded
+        :param integration_ontology: the integration ontology used to represent the relationship
+        :param comparison_cache_size: maximum number of comparisons of sets of elements kept in the ComparisonCache
+        """
+
+        self._integration_ontology = integration_ontology
+        self._comparison_cache = ComparisonCache(comparison_cache_size)
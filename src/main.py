@@ -2,7 +2,12 @@ import argparse
 import json
 import logging
 
+from core.io.AsyncServerManager import AsyncServerManager
 from core.io.CacheManager import CacheManager
+from core.io.CompactCacheManager import CompactCacheManager
+from core.io.DumpReader import DumpReader
+from core.io.ModelSnapshot import ModelSnapshot
+from core.io.SelectiveServerManager import SelectiveServerManager
 from core.io.ServerManager import ServerManager
 from core.io.TTLWriter import TTLWriter
 from core.io.TqdmLoggingHandler import TqdmLoggingHandler
@@ -16,8 +21,8 @@ __author__ = "Pierre Monnin"
 
 
 def load_configuration(configuration_file_path):
-    with open(configuration_file_path, 'r') as configuration_file:
-        configuration_parameters = json.load(configuration_file, encoding="utf-8")
+    with open(configuration_file_path, 'r', encoding="utf-8") as configuration_file:
+        configuration_parameters = json.load(configuration_file)
 
     expected_fields = [
         "server-address",
@@ -69,6 +74,124 @@ def load_configuration(configuration_file_path):
     return configuration_parameters
 
 
+def parse_shard(shard):
+    """
+    Parses a shard given as i/N on the command line
+    :param shard: string i/N with 1 <= i <= N
+    :return: a tuple (shard_index, nb_shards) with 0 <= shard_index < nb_shards
+    """
+
+    try:
+        shard_number, nb_shards = (int(n) for n in shard.split("/"))
+
+    except ValueError:
+        raise argparse.ArgumentTypeError("Shard should be i/N, got " + shard)
+
+    if not 1 <= shard_number <= nb_shards:
+        raise argparse.ArgumentTypeError("Shard should be i/N with 1 <= i <= N, got " + shard)
+
+    return shard_number - 1, nb_shards
+
+
+def parse_positive_integer(value):
+    """
+    Parses an integer greater than or equal to 1 given on the command line
+    :param value: the string value
+    :return: the integer value
+    """
+
+    try:
+        integer = int(value)
+
+    except ValueError:
+        raise argparse.ArgumentTypeError("Expected an integer, got " + value)
+
+    if integer < 1:
+        raise argparse.ArgumentTypeError("Expected an integer >= 1, got " + value)
+
+    return integer
+
+
+def build_model(args, configuration_parameters, cache_manager, server_manager, integration_ontology):
+    """
+    Builds the RDF graph, the dimension ontologies and the relationships model
+    :param args: the parsed command line parameters
+    :param configuration_parameters: the configuration parameters of the scripts
+    :param cache_manager: global cache manager for the scripts (URI <-> node index in the graph)
+    :param server_manager: the ServerManager or DumpReader used to build the RDF graph
+    :param integration_ontology: the integration ontology used to represent relationships
+    :return: the RelationshipsModel
+    """
+
+    logger = logging.getLogger()
+
+    # RDF graph (owl:sameAs, rdfs:subClassOf, rdf:type, dependsOn, partOf and linking predicates adjacencies)
+    selective = args.selective and args.dump_file_paths is None
+    concurrent_queries = args.nb_concurrent_queries > 1 and args.dump_file_paths is None and not selective
+    if args.selective and args.dump_file_paths is not None:
+        logger.warning("--selective is ignored when the RDF graph is read from dumps")
+
+    if selective and args.nb_concurrent_queries > 1:
+        logger.warning("--concurrent-queries is ignored in selective mode (adjacencies are queried one after another)")
+
+    if selective:
+        rdf_graph_source = SelectiveServerManager(server_manager, configuration_parameters, integration_ontology)
+
+    elif concurrent_queries:
+        rdf_graph_source = AsyncServerManager(server_manager, args.nb_concurrent_queries)
+
+    else:
+        rdf_graph_source = server_manager
+
+    try:
+        rdf_graph = RDFGraph(
+            cache_manager,
+            rdf_graph_source,
+            integration_ontology,
+            configuration_parameters["part-of-predicates"],
+            configuration_parameters["has-part-predicates"],
+            configuration_parameters["depends-on-predicates"]
+        )
+
+    except BaseException:
+        # Queries still running are not waited for
+        if concurrent_queries:
+            rdf_graph_source.close(cancel=True)
+
+        raise
+
+    if concurrent_queries:
+        rdf_graph_source.close()
+
+    # Loading dimension ontologies
+    dimension_ontologies = {}
+    for i, d in enumerate(configuration_parameters["dimensions"]):
+        logger.info("Building %s dimension ontology" % d["name"])
+        logger.info("Base URIs: " + str(d["comparison-ontology-base-uris"]))
+
+        dimension_ontologies[d["name"]] = DimensionOntology(
+            d["comparison-ontology-base-uris"],
+            server_manager,
+            args.nb_threads,
+            cache_manager,
+            rdf_graph,
+            args.local_classes
+        )
+
+    # Building relationships model
+    logging.info("Building relationships model")
+    relationships = RelationshipsModel(
+        rdf_graph,
+        integration_ontology,
+        dimension_ontologies,
+        configuration_parameters,
+        cache_manager,
+        args.comparison_cache_size
+    )
+
+    return relationships
+
+
 def main():
     # Parsing command line parameters and necessary configuration
     parser = argparse.ArgumentParser()
@@ -79,6 +202,29 @@ def main():
     parser.add_argument("--integration-ontology", dest="integration_ontology_file_path",
                         help="File path for the OWL file of the integration ontology", required=True)
     parser.add_argument("--threads", dest="nb_threads", help="Number of threads", type=int, default=1)
+    parser.add_argument("--comparison-cache-size", dest="comparison_cache_size", help="Maximum number of comparisons "
+                        "of sets of elements kept in memory", type=int, default=1000000)
+    parser.add_argument("--prefetch-workers", dest="prefetch_workers", help="Number of threads fetching the pages of "
+                        "large SPARQL results concurrently (1 fetches pages one after another)",
+                        type=parse_positive_integer, default=1)
+    parser.add_argument("--prefetch-window", dest="prefetch_window", help="Maximum number of pages requested but not "
+                        "processed yet when pages are fetched concurrently (default: twice the number of prefetch "
+                        "workers)", type=parse_positive_integer, default=None)
+    parser.add_argument("--concurrent-queries", dest="nb_concurrent_queries", help="Number of adjacencies (owl:sameAs, "
+                        "rdf:type, partOf, ...) queried concurrently while building the RDF graph", type=int, default=1)
+    parser.add_argument("--dump", dest="dump_file_paths", help="Local dump file (.nt, .nt.gz, .ttl, .ttl.gz) read "
+                        "instead of querying the triplestore (can be repeated)", action="append", default=None)
+    parser.add_argument("--snapshot", dest="snapshot_file_path", help="Snapshot file of the built model: loaded if "
+                        "it matches the configuration, the integration ontology and the triplestore (or dumps), "
+                        "created otherwise", default=None)
+    parser.add_argument("--selective", dest="selective", help="Only query the part of the RDF graph linked to "
+                        "relationships (and the classes hierarchy) with batched VALUES queries instead of all the "
+                        "edges of each predicate", action="store_true")
+    parser.add_argument("--local-classes", dest="local_classes", help="Select the classes of dimension ontologies "
+                        "among the classes of the RDF graph whose URI starts with a base URI instead of querying them",
+                        action="store_true")
+    parser.add_argument("--compact-cache", dest="compact_cache", help="Store URIs as namespaces and local names in "
+                        "contiguous buffers (less memory, slower lookups)", action="store_true")
     subparsers = parser.add_subparsers(title="Subcommands", description="Valid subcommands", dest="subcommand",
                                        help="Subcommands changing the execution mode")
 
@@ -86,6 +232,12 @@ def main():
     batch_parser = subparsers.add_parser("batch", help="Run PGxLOD-Reconciliation-Rules in batch mode on the entire "
                                                        "Knowledge Base")
     batch_parser.add_argument("--output", help="Path to the output TTL file", required=True)
+    batch_parser.add_argument("--exhaustive", dest="exhaustive", help="Compare all pairs of relationships instead of "
+                              "the pairs given by the blocking index", action="store_true")
+    batch_parser.add_argument("--shard", dest="shard", help="Only reconcile the i-th of N deterministic shards of the "
+                              "pairs of relationships (format: i/N with 1 <= i <= N)", type=parse_shard, default=None)
+    batch_parser.add_argument("--processes", dest="nb_processes", help="Number of processes used to reconcile "
+                              "relationships", type=int, default=1)
 
     # Subcommand explain
     explain_parser = subparsers.add_parser("explain", help="Run PGxLOD-Reconciliation-Rules in a mode explaining the "
@@ -115,7 +267,15 @@ def main():
         exit(-1)
 
     # Global Cache Manager
-    cache_manager = CacheManager()
+    cache_manager = CompactCacheManager() if args.compact_cache else CacheManager()
+
+    # Global Server Manager, its HTTP connections pool is shared by all the queries. Local dumps replace it if given
+    if args.dump_file_paths is not None:
+        server_manager = DumpReader(args.dump_file_paths, cache_manager)
+
+    else:
+        server_manager = ServerManager(configuration_parameters, args.max_rows, args.prefetch_workers,
+                                       args.prefetch_window)
 
     # Loading IntegrationOntology
     logger.info("Building Integration Ontology Model")
@@ -126,89 +286,90 @@ def main():
          for predicate_uri in d["integration-ontology-top-linking-predicates"]}
     )
 
-    # RDF graph (owl:sameAs, rdfs:subClassOf, rdf:type, dependsOn, partOf and linking predicates adjacencies)
-    rdf_graph = RDFGraph(
-        cache_manager,
-        ServerManager(configuration_parameters, args.max_rows),
-        integration_ontology,
-        configuration_parameters["part-of-predicates"],
-        configuration_parameters["has-part-predicates"],
-        configuration_parameters["depends-on-predicates"]
-    )
+    # Snapshot of the model, loaded if it is still valid
+    snapshot = None
+    model = None
+    if args.snapshot_file_path is not None:
+        snapshot = ModelSnapshot(args.snapshot_file_path, configuration_parameters,
+                                 args.integration_ontology_file_path, server_manager.get_fingerprint(),
+                                 {"local-classes": args.local_classes, "selective": args.selective,
+                                  "compact-cache": args.compact_cache})
+        model = snapshot.load(integration_ontology, args.comparison_cache_size)
 
-    # Loading dimension ontologies
-    dimension_ontologies = {}
-    for i, d in enumerate(configuration_parameters["dimensions"]):
-        logger.info("Building %s dimension ontology" % d["name"])
-        logger.info("Base URIs: " + str(d["comparison-ontology-base-uris"]))
+    if model is None:
+        relationships = build_model(args, configuration_parameters, cache_manager, server_manager,
+                                    integration_ontology)
 
-        dimension_ontologies[d["name"]] = DimensionOntology(
-            d["comparison-ontology-base-uris"],
-            configuration_parameters,
-            args.max_rows,
-            args.nb_threads,
-            cache_manager,
-            rdf_graph
-        )
+        if snapshot is not None:
+            snapshot.save(cache_manager, relationships)
 
-    # Building relationships model
-    logging.info("Building relationships model")
-    relationships = RelationshipsModel(
-        rdf_graph,
-        integration_ontology,
-        dimension_ontologies,
-        configuration_parameters,
-        cache_manager
-    )
+    else:
+        cache_manager, relationships = model
 
     if args.subcommand == "batch":
         logger.info("Batch mode")
+        if args.shard is not None:
+            logger.info("Shard %d/%d" % (args.shard[0] + 1, args.shard[1]))
+
         logger.info("Reconciling relationships")
 
         ttl_writer = TTLWriter(args.output)
 
-        for result in relationships.reconcile():
-            if result["order_result"] == OrderResult.EQUAL:
-                ttl_writer.write_triple("<" + cache_manager.get_element_from_index(result["uri_index_1"]) + ">",
-                                        "<" + configuration_parameters["output-equal-predicate"] + ">",
-                                        "<" + cache_manager.get_element_from_index(result["uri_index_2"]) + ">")
-                ttl_writer.write_triple("<" + cache_manager.get_element_from_index(result["uri_index_2"]) + ">",
-                                        "<" + configuration_parameters["output-equal-predicate"] + ">",
-                                        "<" + cache_manager.get_element_from_index(result["uri_index_1"]) + ">")
-
-            elif result["order_result"] == OrderResult.EQUIVALENT:
-                ttl_writer.write_triple("<" + cache_manager.get_element_from_index(result["uri_index_1"]) + ">",
-                                        "<" + configuration_parameters["output-equiv-predicate"] + ">",
-                                        "<" + cache_manager.get_element_from_index(result["uri_index_2"]) + ">")
-                ttl_writer.write_triple("<" + cache_manager.get_element_from_index(result["uri_index_2"]) + ">",
-                                        "<" + configuration_parameters["output-equiv-predicate"] + ">",
-                                        "<" + cache_manager.get_element_from_index(result["uri_index_1"]) + ">")
-
-            elif result["order_result"] == OrderResult.LEQ:
-                ttl_writer.write_triple("<" + cache_manager.get_element_from_index(result["uri_index_1"]) + ">",
-                                        "<" + configuration_parameters["output-leq-predicate"] + ">",
-                                        "<" + cache_manager.get_element_from_index(result["uri_index_2"]) + ">")
-                ttl_writer.write_triple("<" + cache_manager.get_element_from_index(result["uri_index_2"]) + ">",
-                                        "<" + configuration_parameters["output-geq-predicate"] + ">",
-                                        "<" + cache_manager.get_element_from_index(result["uri_index_1"]) + ">")
-
-            elif result["order_result"] == OrderResult.GEQ:
-                ttl_writer.write_triple("<" + cache_manager.get_element_from_index(result["uri_index_1"]) + ">",
-                                        "<" + configuration_parameters["output-geq-predicate"] + ">",
-                                        "<" + cache_manager.get_element_from_index(result["uri_index_2"]) + ">")
-                ttl_writer.write_triple("<" + cache_manager.get_element_from_index(result["uri_index_2"]) + ">",
-                                        "<" + configuration_parameters["output-leq-predicate"] + ">",
-                                        "<" + cache_manager.get_element_from_index(result["uri_index_1"]) + ">")
-
-            elif result["order_result"] == OrderResult.DO_RELATED:
-                ttl_writer.write_triple("<" + cache_manager.get_element_from_index(result["uri_index_1"]) + ">",
-                                        "<" + configuration_parameters["output-do-related-predicate"] + ">",
-                                        "<" + cache_manager.get_element_from_index(result["uri_index_2"]) + ">")
-                ttl_writer.write_triple("<" + cache_manager.get_element_from_index(result["uri_index_2"]) + ">",
-                                        "<" + configuration_parameters["output-do-related-predicate"] + ">",
-                                        "<" + cache_manager.get_element_from_index(result["uri_index_1"]) + ">")
-
-        ttl_writer.close()
+        try:
+            if args.nb_processes > 1:
+                reconciliation_results = relationships.reconcile_parallel(args.nb_processes,
+                                                                          blocking=not args.exhaustive,
+                                                                          shard=args.shard)
+
+            else:
+                reconciliation_results = relationships.reconcile(blocking=not args.exhaustive, shard=args.shard)
+
+            for uri_index_1, order_result, uri_index_2 in reconciliation_results:
+                if order_result == OrderResult.EQUAL:
+                    ttl_writer.write_triple("<" + cache_manager.get_element_from_index(uri_index_1) + ">",
+                                            "<" + configuration_parameters["output-equal-predicate"] + ">",
+                                            "<" + cache_manager.get_element_from_index(uri_index_2) + ">")
+                    ttl_writer.write_triple("<" + cache_manager.get_element_from_index(uri_index_2) + ">",
+                                            "<" + configuration_parameters["output-equal-predicate"] + ">",
+                                            "<" + cache_manager.get_element_from_index(uri_index_1) + ">")
+
+                elif order_result == OrderResult.EQUIVALENT:
+                    ttl_writer.write_triple("<" + cache_manager.get_element_from_index(uri_index_1) + ">",
+                                            "<" + configuration_parameters["output-equiv-predicate"] + ">",
+                                            "<" + cache_manager.get_element_from_index(uri_index_2) + ">")
+                    ttl_writer.write_triple("<" + cache_manager.get_element_from_index(uri_index_2) + ">",
+                                            "<" + configuration_parameters["output-equiv-predicate"] + ">",
+                                            "<" + cache_manager.get_element_from_index(uri_index_1) + ">")
+
+                elif order_result == OrderResult.LEQ:
+                    ttl_writer.write_triple("<" + cache_manager.get_element_from_index(uri_index_1) + ">",
+                                            "<" + configuration_parameters["output-leq-predicate"] + ">",
+                                            "<" + cache_manager.get_element_from_index(uri_index_2) + ">")
+                    ttl_writer.write_triple("<" + cache_manager.get_element_from_index(uri_index_2) + ">",
+                                            "<" + configuration_parameters["output-geq-predicate"] + ">",
+                                            "<" + cache_manager.get_element_from_index(uri_index_1) + ">")
+
+                elif order_result == OrderResult.GEQ:
+                    ttl_writer.write_triple("<" + cache_manager.get_element_from_index(uri_index_1) + ">",
+                                            "<" + configuration_parameters["output-geq-predicate"] + ">",
+                                            "<" + cache_manager.get_element_from_index(uri_index_2) + ">")
+                    ttl_writer.write_triple("<" + cache_manager.get_element_from_index(uri_index_2) + ">",
+                                            "<" + configuration_parameters["output-leq-predicate"] + ">",
+                                            "<" + cache_manager.get_element_from_index(uri_index_1) + ">")
+
+                elif order_result == OrderResult.DO_RELATED:
+                    ttl_writer.write_triple("<" + cache_manager.get_element_from_index(uri_index_1) + ">",
+                                            "<" + configuration_parameters["output-do-related-predicate"] + ">",
+                                            "<" + cache_manager.get_element_from_index(uri_index_2) + ">")
+                    ttl_writer.write_triple("<" + cache_manager.get_element_from_index(uri_index_2) + ">",
+                                            "<" + configuration_parameters["output-do-related-predicate"] + ">",
+                                            "<" + cache_manager.get_element_from_index(uri_index_1) + ">")
+
+        finally:
+            ttl_writer.close()
+
+        hits, misses = relationships.get_comparison_cache_statistics()
+        logger.info("Comparison cache: %d hits, %d misses" % (hits, misses))
 
     elif args.subcommand == "explain":
         logger.info("Explain mode")
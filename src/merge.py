@@ -0,0 +1,59 @@
+import argparse
+import logging
+
+import tqdm
+
+from core.io.TTLWriter import TTLWriter
+from core.io.TqdmLoggingHandler import TqdmLoggingHandler
+
+__author__ = "Pierre Monnin"
+
+
+def main():
+    # Parsing command line parameters
+    parser = argparse.ArgumentParser(description="Merge the output TTL files of the shards of a batch run into one "
+                                                 "TTL file without duplicated triples")
+    parser.add_argument("--output", help="Path to the merged output TTL file", required=True)
+    parser.add_argument("inputs", help="Paths to the output TTL files of the shards", nargs="+")
+    args = parser.parse_args()
+
+    # Logging parameters
+    logger = logging.getLogger()
+    tqdm_logging_handler = TqdmLoggingHandler()
+    tqdm_logging_handler.setFormatter(logging.Formatter(fmt="[%(asctime)s][%(levelname)s] %(message)s"))
+    logger.addHandler(tqdm_logging_handler)
+    logger.setLevel(logging.INFO)
+
+    logger.info("PGxLOD-Reconciliation rules - Shards merge")
+
+    ttl_writer = TTLWriter(args.output)
+    written_triples = set()
+    nb_duplicates = 0
+
+    try:
+        for input_file_path in args.inputs:
+            logger.info("Merging %s" % input_file_path)
+
+            with open(input_file_path, 'r') as input_file:
+                for line in tqdm.tqdm(input_file):
+                    # Lines are written by TTLWriter as "subject predicate object.\n"
+                    triple = tuple(line.rstrip("\n")[:-1].split(" "))
+
+                    if len(triple) != 3:
+                        continue
+
+                    if triple in written_triples:
+                        nb_duplicates += 1
+
+                    else:
+                        written_triples.add(triple)
+                        ttl_writer.write_triple(*triple)
+
+    finally:
+        ttl_writer.close()
+
+    logger.info("%d triples written, %d duplicates discarded" % (len(written_triples), nb_duplicates))
+
+
+if __name__ == '__main__':
+    main()
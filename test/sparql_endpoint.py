@@ -0,0 +1,107 @@
+import argparse
+import json
+import logging
+import re
+import socketserver
+import threading
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import rdflib
+
+__author__ = "Pierre Monnin"
+
+
+class SPARQLRequestHandler(BaseHTTPRequestHandler):
+    """
+    Answers SPARQL queries (GET or POST, parameter query) on the RDF graph of the server with JSON results. The
+    Virtuoso syntax "select count(...) as ?count" used by the scripts is rewritten into standard SPARQL. Results are
+    truncated to the maximum number of rows of the server, if any
+    """
+
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        logging.getLogger().debug(format % args)
+
+    def _send(self, status_code, content_type, body):
+        self.send_response(status_code)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _answer(self, parameters):
+        query = re.sub(r"select\s+(count\([^)]*\))\s+as\s+\?count", r"select (\1 as ?count)",
+                       parameters.get("query", [""])[0], flags=re.I)
+
+        try:
+            # rdflib graphs are not safe for concurrent queries
+            with self.server.graph_lock:
+                results = json.loads(self.server.graph.query(query).serialize(format="json"))
+
+        except Exception as e:
+            self._send(400, "text/plain", str(e).encode("utf-8"))
+            return
+
+        # As Virtuoso, results are silently truncated to ResultSetMaxRows rows
+        if self.server.max_rows is not None and "results" in results:
+            results["results"]["bindings"] = results["results"]["bindings"][:self.server.max_rows]
+
+        self._send(200, "application/sparql-results+json", json.dumps(results).encode("utf-8"))
+
+    def do_GET(self):
+        self._answer(parse_qs(urlparse(self.path).query))
+
+    def do_POST(self):
+        content_length = int(self.headers.get("Content-Length", 0))
+        self._answer(parse_qs(self.rfile.read(content_length).decode("utf-8")))
+
+
+class ThreadingSPARQLServer(socketserver.ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+
+def create_server(file_paths, port, max_rows=None):
+    """
+    Creates the SPARQL endpoint serving the given RDF files at http://127.0.0.1:PORT/sparql
+    :param file_paths: RDF files loaded in the default graph
+    :param port: port of the endpoint (0 to use any free port, see server.server_address)
+    :param max_rows: maximum number of rows of the results (ResultSetMaxRows of Virtuoso), None for no limit
+    :return: the ThreadingSPARQLServer, not started yet (see serve_forever)
+    """
+
+    graph = rdflib.Graph()
+    for file_path in file_paths:
+        logging.info("Loading %s" % file_path)
+        graph.parse(file_path, format=rdflib.util.guess_format(file_path))
+
+    server = ThreadingSPARQLServer(("127.0.0.1", port), SPARQLRequestHandler)
+    server.graph = graph
+    server.graph_lock = threading.Lock()
+    server.max_rows = max_rows
+
+    return server
+
+
+def main():
+    # Parsing command line parameters
+    parser = argparse.ArgumentParser(description="Local stand-in SPARQL endpoint serving RDF files, to run the "
+                                                 "tests without a triplestore")
+    parser.add_argument("--port", help="Port of the endpoint (queried at http://127.0.0.1:PORT/sparql)", type=int,
+                        default=8890)
+    parser.add_argument("--max-rows", dest="max_rows", help="Maximum number of rows of the results (ResultSetMaxRows "
+                        "of Virtuoso)", type=int, default=None)
+    parser.add_argument("files", help="RDF files loaded in the default graph", nargs="+")
+    args = parser.parse_args()
+
+    logging.basicConfig(format="[%(asctime)s][%(levelname)s] %(message)s", level=logging.INFO)
+
+    server = create_server(args.files, args.port, args.max_rows)
+
+    logging.info("Serving %d triples at http://127.0.0.1:%d/sparql" % (len(server.graph), args.port))
+    server.serve_forever()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,86 @@
+import threading
+import unittest
+import unittest.mock
+
+import testutils
+from core.io.AsyncServerManager import AsyncServerManager
+from core.io.CacheManager import CacheManager
+from core.io.ServerManager import ServerManager
+
+__author__ = "Pierre Monnin"
+
+
+class AsyncServerManagerTest(unittest.TestCase):
+    """
+    Adjacencies queried concurrently must be the ones queried one after another, and the event loop must be closed
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        cls._server, cls._configuration_parameters = testutils.start_test_endpoint([testutils.TEST_ONTOLOGY])
+        cls._integration_ontology = testutils.load_integration_ontology(cls._configuration_parameters)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls._server.shutdown()
+        cls._server.server_close()
+
+    def test_predicates_edges(self):
+        server_manager = ServerManager(self._configuration_parameters, 1000)
+        predicates = [testutils.OWL_SAMEAS, testutils.RDFS_SUBCLASSOF, testutils.RDF_TYPE, testutils.PGXO + "causes"]
+
+        expected = [set(edges) for edges in server_manager.query_predicates_edges(predicates)]
+
+        for max_concurrent_queries in (1, 3):
+            with self.subTest(max_concurrent_queries=max_concurrent_queries):
+                async_server_manager = AsyncServerManager(server_manager, max_concurrent_queries)
+
+                try:
+                    self.assertEqual([set(edges) for edges in async_server_manager.query_predicates_edges(predicates)],
+                                     expected)
+
+                finally:
+                    async_server_manager.close()
+
+    def test_model(self):
+        for options in ({}, {"nb_concurrent_queries": 4}):
+            with self.subTest(**options):
+                cache_manager = CacheManager()
+                relationships = testutils.build_model(ServerManager(self._configuration_parameters, 1000),
+                                                      cache_manager, self._configuration_parameters,
+                                                      self._integration_ontology, local_classes=True, **options)
+
+                self.assertEqual(testutils.get_reconciliation_triples(relationships, cache_manager),
+                                 testutils.get_expected_test_triples())
+
+    def test_closed_on_error(self):
+        nb_threads = threading.active_count()
+
+        with unittest.mock.patch("main.RDFGraph", side_effect=RuntimeError):
+            with self.assertRaises(RuntimeError):
+                testutils.build_model(ServerManager(self._configuration_parameters, 1000), CacheManager(),
+                                      self._configuration_parameters, self._integration_ontology,
+                                      nb_concurrent_queries=4)
+
+        self.assertEqual(threading.active_count(), nb_threads)
+
+    def test_cancelled_on_error(self):
+        predicates = [testutils.RDF_TYPE, testutils.RDFS_SUBCLASSOF, testutils.PGXO + "causes"]
+
+        # Pages of 2 rows: queries running when the first rows are consumed are blocked on their queues
+        async_server_manager = AsyncServerManager(ServerManager(self._configuration_parameters, 2), 2)
+        edges = next(async_server_manager.query_predicates_edges(predicates))
+        next(edges)
+
+        threads = list(async_server_manager._executor._threads)
+        self.assertEqual(len(threads), 2)
+        async_server_manager.close(cancel=True)
+
+        # Blocked queries stop without any further row consumed
+        for thread in threads:
+            thread.join(5)
+            self.assertFalse(thread.is_alive())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,62 @@
+import os
+import tempfile
+import unittest
+
+import testutils
+from core.io.CacheManager import CacheManager
+from core.io.DumpReader import DumpReader
+
+__author__ = "Pierre Monnin"
+
+
+class BlockingIndexTest(unittest.TestCase):
+    """
+    The pairs given by the BlockingIndex must lead to the same results as the comparison of all pairs
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        cls._directory = tempfile.TemporaryDirectory()
+        cls._configuration_parameters = testutils.load_test_configuration()
+        cls._integration_ontology = testutils.load_integration_ontology(cls._configuration_parameters)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls._directory.cleanup()
+
+    def _build_model(self, file_path):
+        cache_manager = CacheManager()
+        relationships = testutils.build_model(DumpReader([file_path], cache_manager), cache_manager,
+                                              self._configuration_parameters, self._integration_ontology,
+                                              dump_file_paths=[file_path])
+
+        return cache_manager, relationships
+
+    def test_test_graph(self):
+        file_path = os.path.join(self._directory.name, "test.nt")
+        testutils.write_test_graph(file_path)
+        cache_manager, relationships = self._build_model(file_path)
+
+        blocking_triples = testutils.get_reconciliation_triples(relationships, cache_manager, blocking=True)
+        self.assertEqual(blocking_triples, testutils.get_expected_test_triples())
+        self.assertEqual(blocking_triples,
+                         testutils.get_reconciliation_triples(relationships, cache_manager, blocking=False))
+
+    def test_random_graphs(self):
+        for seed in range(1, 6):
+            with self.subTest(seed=seed):
+                file_path = os.path.join(self._directory.name, "random-%d.nt" % seed)
+                testutils.write_random_graph(file_path, seed)
+                cache_manager, relationships = self._build_model(file_path)
+
+                # Elements are typed by the top classes of the dimensions through the rdfs:subClassOf hierarchy
+                for d in self._configuration_parameters["dimensions"]:
+                    self.assertTrue(any(dimension_name == d["name"] for r in relationships._relationships.values()
+                                        for dimension_name, lp in r.get_non_empty_dimensions()))
+
+                self.assertEqual(testutils.get_reconciliation_triples(relationships, cache_manager, blocking=True),
+                                 testutils.get_reconciliation_triples(relationships, cache_manager, blocking=False))
+
+
+if __name__ == '__main__':
+    unittest.main()
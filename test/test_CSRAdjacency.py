@@ -0,0 +1,88 @@
+import pickle
+import random
+import unittest
+
+import testutils  # noqa: F401 (scripts path)
+from core.model.CSRAdjacency import CSRAdjacency
+
+__author__ = "Pierre Monnin"
+
+
+class CSRAdjacencyTest(unittest.TestCase):
+    """
+    A CSRAdjacency must answer as the dictionary of sets it is built from
+    """
+
+    @staticmethod
+    def _random_adjacency(seed, nb_nodes=200, nb_edges=1000):
+        generator = random.Random(seed)
+        adjacency = {}
+
+        for _ in range(nb_edges):
+            adjacency.setdefault(generator.randrange(nb_nodes), set()).add(generator.randrange(nb_nodes))
+
+        # Nodes without neighbors are not stored
+        adjacency[nb_nodes + 1] = set()
+
+        return adjacency
+
+    def test_empty(self):
+        adjacency = CSRAdjacency({})
+
+        self.assertEqual(len(adjacency), 0)
+        self.assertEqual(adjacency.get_nb_edges(), 0)
+        self.assertNotIn(0, adjacency)
+        self.assertEqual(list(adjacency.get_neighbors(0)), [])
+        self.assertFalse(adjacency.has_neighbor(0, 0))
+        self.assertEqual(list(adjacency.get_edges()), [])
+        self.assertEqual(len(adjacency.get_transpose()), 0)
+
+    def test_dictionary_emptied(self):
+        dictionary = {1: {2, 3}, 0: {1}}
+        CSRAdjacency(dictionary)
+
+        self.assertEqual(dictionary, {})
+
+    def test_random_adjacencies(self):
+        for seed in range(5):
+            with self.subTest(seed=seed):
+                expected = self._random_adjacency(seed)
+                adjacency = CSRAdjacency({n: set(neighbors) for n, neighbors in expected.items()})
+                expected = {n: neighbors for n, neighbors in expected.items() if len(neighbors) != 0}
+
+                self.assertEqual(len(adjacency), len(expected))
+                self.assertEqual(list(adjacency.get_nodes()), sorted(expected))
+                self.assertEqual(adjacency.get_nb_edges(), sum(len(neighbors) for neighbors in expected.values()))
+                self.assertEqual(set(adjacency.get_edges()), {(n, m) for n in expected for m in expected[n]})
+
+                for n in range(-1, 205):
+                    self.assertEqual(n in adjacency, n in expected)
+                    self.assertEqual(list(adjacency.get_neighbors(n)), sorted(expected.get(n, set())))
+
+                    for m in range(-1, 205, 7):
+                        self.assertEqual(adjacency.has_neighbor(n, m), m in expected.get(n, set()))
+
+    def test_transpose(self):
+        for seed in range(5):
+            with self.subTest(seed=seed):
+                adjacency = CSRAdjacency(self._random_adjacency(seed))
+                transpose = adjacency.get_transpose()
+
+                self.assertEqual(set(transpose.get_edges()), {(m, n) for n, m in adjacency.get_edges()})
+                self.assertEqual(list(transpose.get_nodes()), sorted({m for n, m in adjacency.get_edges()}))
+
+                for n in transpose.get_nodes():
+                    neighbors = list(transpose.get_neighbors(n))
+                    self.assertEqual(neighbors, sorted(neighbors))
+
+                self.assertEqual(set(transpose.get_transpose().get_edges()), set(adjacency.get_edges()))
+
+    def test_pickle(self):
+        adjacency = CSRAdjacency(self._random_adjacency(0))
+        unpickled = pickle.loads(pickle.dumps(adjacency, protocol=pickle.HIGHEST_PROTOCOL))
+
+        self.assertEqual(list(unpickled.get_edges()), list(adjacency.get_edges()))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,117 @@
+import os
+import pickle
+import random
+import tempfile
+import unittest
+
+import testutils
+from core.io.CacheManager import CacheManager
+from core.io.CompactCacheManager import CompactCacheManager
+from core.io.DumpReader import DumpReader
+
+__author__ = "Pierre Monnin"
+
+
+class CompactCacheManagerTest(unittest.TestCase):
+    """
+    A CompactCacheManager must answer as a CacheManager: same indices, elements and prefix queries, whatever the
+    namespaces and the local names of the elements
+    """
+
+    @staticmethod
+    def _random_elements(seed, nb_elements=3000):
+        generator = random.Random(seed)
+        namespaces = ["http://example.org/", "http://example.org/a/", "http://example.org/ontology#", "urn:isbn:",
+                      "http://purl.obolibrary.org/obo/", "_:", ""]
+        characters = "abAB01_-.é€\U0001F600 /#:"
+
+        elements = [generator.choice(namespaces) +
+                    "".join(generator.choice(characters) for _ in range(generator.randrange(0, 6)))
+                    for _ in range(nb_elements)]
+
+        # Separators only, literals with spaces and quotes
+        return elements + ["/", "#", ":", "://", 'a "quoted" literal', "back\\slash", "new\nline"]
+
+    def _assert_same(self, compact_cache_manager, cache_manager, elements):
+        self.assertEqual(compact_cache_manager.get_size(), cache_manager.get_size())
+
+        for element in elements:
+            self.assertTrue(compact_cache_manager.is_element_in_cache(element))
+            self.assertEqual(compact_cache_manager.get_element_index(element), cache_manager.get_element_index(element))
+
+        for i in range(cache_manager.get_size()):
+            self.assertEqual(compact_cache_manager.get_element_from_index(i), cache_manager.get_element_from_index(i))
+
+        self.assertEqual(compact_cache_manager.get_element_from_index(cache_manager.get_size()), "")
+        self.assertEqual(compact_cache_manager.get_size(), cache_manager.get_size())
+
+    def test_elements(self):
+        for seed in range(3):
+            with self.subTest(seed=seed):
+                elements = self._random_elements(seed)
+                compact_cache_manager = CompactCacheManager()
+                cache_manager = CacheManager()
+
+                # Table resized several times
+                for element in elements:
+                    self.assertEqual(compact_cache_manager.get_element_index(element),
+                                     cache_manager.get_element_index(element))
+
+                self._assert_same(compact_cache_manager, cache_manager, elements)
+
+                for element in ("http://example.org/unknown\U0001F600", "http://unknown.org/a", "unknown"):
+                    self.assertFalse(compact_cache_manager.is_element_in_cache(element))
+
+    def test_prefixes(self):
+        elements = self._random_elements(0)
+        compact_cache_manager = CompactCacheManager()
+        cache_manager = CacheManager()
+
+        start_strings = {"", "h", "http://example.org", "http://example.org/", "http://example.org/a", "HTTP://",
+                         "urn:", "urn:isbn", "_:", "é", "http://example.org/é€", "http://example.org/\U0001F600",
+                         "http://unknown.org/"}
+        start_strings.update(e[:length] for e in elements[::50] for length in range(len(e) + 1))
+
+        for part in (elements[:len(elements) // 2], elements[len(elements) // 2:-10], elements[-10:]):
+            # New elements are merged into the prefix index of the CacheManager (sorted with it or inserted into it)
+            for element in part:
+                compact_cache_manager.get_element_index(element)
+                cache_manager.get_element_index(element)
+
+            for start_string in start_strings:
+                expected = {i for i in range(cache_manager.get_size())
+                            if cache_manager.get_element_from_index(i).startswith(start_string)}
+
+                self.assertEqual(compact_cache_manager.get_element_indexes_from_start_string(start_string), expected)
+                self.assertEqual(cache_manager.get_element_indexes_from_start_string(start_string), expected)
+
+    def test_pickle(self):
+        elements = self._random_elements(1)
+        compact_cache_manager = CompactCacheManager()
+        cache_manager = CacheManager()
+
+        for element in elements:
+            compact_cache_manager.get_element_index(element)
+            cache_manager.get_element_index(element)
+
+        unpickled = pickle.loads(pickle.dumps(compact_cache_manager, protocol=pickle.HIGHEST_PROTOCOL))
+        self._assert_same(unpickled, cache_manager, elements)
+
+    def test_model(self):
+        with tempfile.TemporaryDirectory() as directory:
+            file_paths = [os.path.join(directory, "test.nt")]
+            testutils.write_test_graph(file_paths[0])
+
+            configuration_parameters = testutils.load_test_configuration()
+            cache_manager = CompactCacheManager()
+            relationships = testutils.build_model(DumpReader(file_paths, cache_manager), cache_manager,
+                                                  configuration_parameters,
+                                                  testutils.load_integration_ontology(configuration_parameters),
+                                                  dump_file_paths=file_paths)
+
+        self.assertEqual(testutils.get_reconciliation_triples(relationships, cache_manager),
+                         testutils.get_expected_test_triples())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,70 @@
+import unittest
+
+import testutils  # noqa: F401 (scripts path)
+from core.reconciliation.preorders import OrderResult
+from core.reconciliation.relationships import ComparisonCache
+
+__author__ = "Pierre Monnin"
+
+DIMENSION = "dimension"
+
+
+class ComparisonCacheTest(unittest.TestCase):
+    """
+    The ComparisonCache must evict the least recently used comparison once full and count its hits and misses
+    """
+
+    @staticmethod
+    def _get_key(i):
+        return DIMENSION, frozenset([i]), frozenset([i + 1])
+
+    def test_capacity_one(self):
+        cache = ComparisonCache(1)
+        self.assertIsNone(cache.get(self._get_key(0)))
+
+        cache.put(self._get_key(0), OrderResult.LEQ)
+        self.assertEqual(cache.get(self._get_key(0)), OrderResult.LEQ)
+
+        # The second comparison evicts the first one
+        cache.put(self._get_key(1), OrderResult.GEQ)
+        self.assertIsNone(cache.get(self._get_key(0)))
+        self.assertEqual(cache.get(self._get_key(1)), OrderResult.GEQ)
+
+        self.assertEqual(cache.get_statistics(), (2, 2))
+
+    def test_capacity_two(self):
+        cache = ComparisonCache(2)
+        cache.put(self._get_key(0), OrderResult.LEQ)
+        cache.put(self._get_key(1), OrderResult.GEQ)
+
+        # Getting the first comparison makes the second one the least recently used
+        self.assertEqual(cache.get(self._get_key(0)), OrderResult.LEQ)
+        cache.put(self._get_key(2), OrderResult.EQUIVALENT)
+        self.assertIsNone(cache.get(self._get_key(1)))
+        self.assertEqual(cache.get(self._get_key(0)), OrderResult.LEQ)
+        self.assertEqual(cache.get(self._get_key(2)), OrderResult.EQUIVALENT)
+
+        # Getting the first comparison again makes the third one the least recently used
+        self.assertEqual(cache.get(self._get_key(0)), OrderResult.LEQ)
+        cache.put(self._get_key(3), OrderResult.DO_RELATED)
+        self.assertIsNone(cache.get(self._get_key(2)))
+        self.assertEqual(cache.get(self._get_key(0)), OrderResult.LEQ)
+        self.assertEqual(cache.get(self._get_key(3)), OrderResult.DO_RELATED)
+
+        self.assertEqual(cache.get_statistics(), (6, 2))
+
+    def test_statistics(self):
+        cache = ComparisonCache(2)
+
+        # INCOMPARABLE is a cached result, not a miss
+        cache.put(self._get_key(0), OrderResult.INCOMPARABLE)
+        self.assertEqual(cache.get(self._get_key(0)), OrderResult.INCOMPARABLE)
+        self.assertIsNone(cache.get(self._get_key(1)))
+        self.assertEqual(cache.get_statistics(), (1, 1))
+
+        cache.add_statistics(3, 4)
+        self.assertEqual(cache.get_statistics(), (4, 5))
+
+
+if __name__ == '__main__':
+    unittest.main()
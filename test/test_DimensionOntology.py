@@ -0,0 +1,69 @@
+import itertools
+import os
+import random
+import tempfile
+import unittest
+
+import testutils
+from core.io.CacheManager import CacheManager
+from core.io.DumpReader import DumpReader
+
+__author__ = "Pierre Monnin"
+
+
+class DimensionOntologyTest(unittest.TestCase):
+    """
+    Subsumption tests on the frozen ancestors of a DimensionOntology must give the results of their definitions on the
+    ancestors of each class
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        cls._directory = tempfile.TemporaryDirectory()
+        cls._configuration_parameters = testutils.load_test_configuration()
+        cls._integration_ontology = testutils.load_integration_ontology(cls._configuration_parameters)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls._directory.cleanup()
+
+    def _get_dimension_ontology(self, seed):
+        file_path = os.path.join(self._directory.name, "random-%d.nt" % seed)
+        testutils.write_random_graph(file_path, seed)
+
+        cache_manager = CacheManager()
+        relationships = testutils.build_model(DumpReader([file_path], cache_manager), cache_manager,
+                                              self._configuration_parameters, self._integration_ontology,
+                                              dump_file_paths=[file_path], local_classes=True)
+
+        return relationships._preorders["Phenotype"]._dimension_ontology
+
+    def test_subsumption(self):
+        for seed in range(1, 4):
+            with self.subTest(seed=seed):
+                dimension_ontology = self._get_dimension_ontology(seed)
+                classes = list(range(len(dimension_ontology._classes)))
+                ancestors = [dimension_ontology._classes[c].get_ancestors() for c in classes]
+                self.assertGreater(len(classes), 10)
+                self.assertTrue(any(len(a) > 1 for a in ancestors))
+
+                for c1, c2 in itertools.product(classes, repeat=2):
+                    self.assertEqual(dimension_ontology.is_subsumed(c1, c2), c1 == c2 or c2 in ancestors[c1])
+                    self.assertEqual(c2 in ancestors[c1],
+                                     c1 in dimension_ontology._classes[c2].get_descendants())
+
+                generator = random.Random(seed)
+                for _ in range(500):
+                    classes_indices = set(generator.sample(classes, generator.randint(0, 6)))
+                    c1 = generator.choice(classes)
+
+                    # Definitions of min and is_subsumed_by_any on the ancestors of each class
+                    expected_min = {c for c in classes_indices
+                                    if not any(c in ancestors[d] for d in classes_indices - {c})}
+                    self.assertEqual(dimension_ontology.min(classes_indices), expected_min)
+                    self.assertEqual(dimension_ontology.is_subsumed_by_any(c1, classes_indices),
+                                     any(c1 == c2 or c2 in ancestors[c1] for c2 in classes_indices))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,127 @@
+import gzip
+import os
+import shutil
+import tempfile
+import unittest
+import unittest.mock
+
+import rdflib
+import rdflib.plugins.stores.memory
+
+import testutils
+from core.io.CacheManager import CacheManager
+from core.io.DumpReader import DumpReader
+
+__author__ = "Pierre Monnin"
+
+
+class DumpReaderTest(unittest.TestCase):
+    """
+    Edges read from N-Triples and Turtle dumps (compressed or not) must be the ones of the RDF graph, and the model
+    built from them must give the expected results
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        cls._directory = tempfile.TemporaryDirectory()
+        cls._configuration_parameters = testutils.load_test_configuration()
+        cls._integration_ontology = testutils.load_integration_ontology(cls._configuration_parameters)
+
+        cls._file_paths = {}
+        for extension, rdf_format in (("nt", "nt"), ("ttl", "turtle")):
+            cls._file_paths[extension] = os.path.join(cls._directory.name, "test." + extension)
+            testutils.write_test_graph(cls._file_paths[extension], rdf_format)
+
+            cls._file_paths[extension + ".gz"] = cls._file_paths[extension] + ".gz"
+            with open(cls._file_paths[extension], 'rb') as file, gzip.open(cls._file_paths[extension] + ".gz",
+                                                                            'wb') as compressed_file:
+                shutil.copyfileobj(file, compressed_file)
+
+        cls._graph = rdflib.Graph()
+        cls._graph.parse(testutils.TEST_ONTOLOGY, format="xml")
+
+    @classmethod
+    def tearDownClass(cls):
+        cls._directory.cleanup()
+
+    def _get_expected_edges(self, predicate):
+        # Blank nodes labels depend on the parser, they are only counted
+        return sorted((str(s), str(o)) for s, o in self._graph.subject_objects(rdflib.URIRef(predicate))
+                      if not isinstance(s, rdflib.BNode) and not isinstance(o, rdflib.BNode)), \
+            sum(1 for s, o in self._graph.subject_objects(rdflib.URIRef(predicate))
+                if isinstance(s, rdflib.BNode) or isinstance(o, rdflib.BNode))
+
+    @staticmethod
+    def _get_edges_uris(edges, cache_manager):
+        # Edges are yielded as pairs of nodes indices
+        return [(cache_manager.get_element_from_index(n1), cache_manager.get_element_from_index(n2))
+                for n1, n2 in edges]
+
+    def test_edges(self):
+        predicates = [testutils.OWL_SAMEAS, testutils.RDFS_SUBCLASSOF, testutils.RDF_TYPE, testutils.PGXO + "causes",
+                      "http://www.w3.org/2000/01/rdf-schema#label"]
+
+        for extension, file_path in self._file_paths.items():
+            with self.subTest(extension=extension):
+                cache_manager = CacheManager()
+                dump_reader = DumpReader([file_path], cache_manager)
+
+                for predicate, edges in zip(predicates, dump_reader.query_predicates_edges(predicates)):
+                    edges = self._get_edges_uris(edges, cache_manager)
+                    blank_edges = [e for e in edges if e[0].startswith("_:") or e[1].startswith("_:")]
+
+                    self.assertEqual((sorted(e for e in edges if e not in blank_edges), len(blank_edges)),
+                                     self._get_expected_edges(predicate))
+
+    def test_escapes(self):
+        file_path = os.path.join(self._directory.name, "escapes.nt")
+        with open(file_path, 'w', encoding="utf-8") as file:
+            file.write("# comment\n")
+            file.write('<http://example.org/caf\\u00E9> <http://example.org/p> "a \\"quoted\\" \\\\ \\n"@en .\n')
+            file.write("<http://example.org/s> <http://example.org/p> "
+                       "\"1\"^^<http://www.w3.org/2001/XMLSchema#integer> .\n")
+            file.write("_:b0 <http://example.org/p> <http://example.org/\\U0001F600> .\n")
+            file.write("<http://example.org/s> <http://example.org/q> <http://example.org/o> .\n")
+
+        cache_manager = CacheManager()
+        edges = next(DumpReader([file_path], cache_manager).query_predicates_edges(["http://example.org/p"]))
+
+        self.assertEqual(sorted(self._get_edges_uris(edges, cache_manager)), [("_:b0", "http://example.org/\U0001F600"),
+                                         ("http://example.org/café", 'a "quoted" \\ \n'),
+                                         ("http://example.org/s", "1")])
+
+    def test_turtle_not_stored(self):
+        dump_reader = DumpReader([self._file_paths["ttl.gz"]], CacheManager())
+
+        with unittest.mock.patch.object(rdflib.plugins.stores.memory.Memory, "add") as memory_add:
+            self.assertNotEqual(len(list(next(dump_reader.query_predicates_edges([testutils.RDF_TYPE])))), 0)
+
+        memory_add.assert_not_called()
+
+    def test_classes(self):
+        dump_reader = DumpReader([self._file_paths["nt"]], CacheManager())
+
+        with self.assertRaises(RuntimeError):
+            dump_reader.query_classes([testutils.PGXO + "test/"], 1)
+
+        list(dump_reader.query_predicates_edges([testutils.RDF_TYPE]))
+        classes = dump_reader.query_classes([testutils.PGXO.upper() + "TEST/"], 1)
+
+        self.assertNotEqual(len(classes), 0)
+        self.assertTrue(all(c.startswith(testutils.PGXO + "test/") for c in classes))
+
+    def test_model(self):
+        for extension in ("nt.gz", "ttl"):
+            with self.subTest(extension=extension):
+                cache_manager = CacheManager()
+                file_paths = [self._file_paths[extension]]
+                relationships = testutils.build_model(DumpReader(file_paths, cache_manager), cache_manager,
+                                                      self._configuration_parameters, self._integration_ontology,
+                                                      dump_file_paths=file_paths)
+
+                self.assertEqual(testutils.get_reconciliation_triples(relationships, cache_manager),
+                                 testutils.get_expected_test_triples())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,118 @@
+import os
+import tempfile
+import unittest
+
+import testutils
+from core.io.CacheManager import CacheManager
+from core.io.DumpReader import DumpReader
+from core.io.ModelSnapshot import ModelSnapshot
+from core.io.ServerManager import ServerManager
+
+__author__ = "Pierre Monnin"
+
+
+class ModelSnapshotTest(unittest.TestCase):
+    """
+    A saved model must be loaded back with the same results, and only while the configuration, the integration
+    ontology, the source of the RDF graph and the model options are unchanged
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        cls._directory = tempfile.TemporaryDirectory()
+        cls._configuration_parameters = testutils.load_test_configuration()
+        cls._integration_ontology = testutils.load_integration_ontology(cls._configuration_parameters)
+
+        cls._dump_file_path = os.path.join(cls._directory.name, "test.nt")
+        testutils.write_test_graph(cls._dump_file_path)
+
+        cls._cache_manager = CacheManager()
+        cls._relationships = testutils.build_model(DumpReader([cls._dump_file_path], cls._cache_manager),
+                                                   cls._cache_manager, cls._configuration_parameters,
+                                                   cls._integration_ontology, dump_file_paths=[cls._dump_file_path])
+
+    @classmethod
+    def tearDownClass(cls):
+        cls._directory.cleanup()
+
+    def setUp(self):
+        self._snapshot_file_path = os.path.join(self._directory.name, "model.snapshot")
+        if os.path.isfile(self._snapshot_file_path):
+            os.remove(self._snapshot_file_path)
+
+    def _get_snapshot(self, configuration_parameters=None, source_fingerprint=None, model_options=None):
+        return ModelSnapshot(self._snapshot_file_path,
+                             configuration_parameters if configuration_parameters is not None
+                             else self._configuration_parameters,
+                             testutils.TEST_ONTOLOGY,
+                             source_fingerprint if source_fingerprint is not None
+                             else DumpReader([self._dump_file_path], CacheManager()).get_fingerprint(),
+                             model_options if model_options is not None else {"local-classes": False})
+
+    def test_round_trip(self):
+        self.assertIsNone(self._get_snapshot().load(self._integration_ontology, 10000))
+
+        self._get_snapshot().save(self._cache_manager, self._relationships)
+        self.assertFalse(os.path.isfile(self._snapshot_file_path + ".tmp"))
+
+        cache_manager, relationships = self._get_snapshot().load(self._integration_ontology, 10000)
+
+        self.assertEqual(testutils.get_reconciliation_triples(relationships, cache_manager),
+                         testutils.get_expected_test_triples())
+
+    def test_outdated(self):
+        self._get_snapshot().save(self._cache_manager, self._relationships)
+
+        configuration_parameters = dict(self._configuration_parameters, timeout=1)
+        self.assertIsNone(self._get_snapshot(configuration_parameters=configuration_parameters)
+                          .load(self._integration_ontology, 10000))
+        self.assertIsNone(self._get_snapshot(model_options={"local-classes": True})
+                          .load(self._integration_ontology, 10000))
+
+        # Dumps with the same content but not the same modification time are not changed
+        os.utime(self._dump_file_path, (0, 0))
+        self.assertIsNotNone(self._get_snapshot().load(self._integration_ontology, 10000))
+
+        changed_dump_file_path = os.path.join(self._directory.name, "changed.nt")
+        with open(self._dump_file_path, 'r', encoding="utf-8") as file, \
+                open(changed_dump_file_path, 'w', encoding="utf-8") as changed_file:
+            changed_file.write(file.read().replace("http://pgxo.loria.fr/test/", "http://pgxo.loria.fr/changed/", 1))
+
+        fingerprint = DumpReader([changed_dump_file_path], CacheManager()).get_fingerprint()
+        self.assertIsNone(self._get_snapshot(source_fingerprint=fingerprint).load(self._integration_ontology, 10000))
+
+    def test_dataset_version(self):
+        configuration_parameters = dict(self._configuration_parameters, **{"dataset-version": "1"})
+        fingerprint = ServerManager(configuration_parameters, 1000).get_fingerprint()
+
+        self._get_snapshot(configuration_parameters, fingerprint).save(self._cache_manager, self._relationships)
+        self.assertIsNotNone(self._get_snapshot(configuration_parameters, fingerprint)
+                             .load(self._integration_ontology, 10000))
+
+        configuration_parameters["dataset-version"] = "2"
+        self.assertNotEqual(ServerManager(configuration_parameters, 1000).get_fingerprint(), fingerprint)
+
+    def test_invalid(self):
+        with open(self._snapshot_file_path, 'wb') as snapshot_file:
+            snapshot_file.write(b"not a snapshot")
+
+        self.assertIsNone(self._get_snapshot().load(self._integration_ontology, 10000))
+
+    def test_truncated(self):
+        self._get_snapshot().save(self._cache_manager, self._relationships)
+
+        with open(self._snapshot_file_path, 'rb') as snapshot_file:
+            content = snapshot_file.read()
+
+        # Truncated in the header, in the model and just before its end
+        for size in (10, len(content) // 2, len(content) - 1):
+            with self.subTest(size=size):
+                with open(self._snapshot_file_path, 'wb') as snapshot_file:
+                    snapshot_file.write(content[:size])
+
+                with self.assertLogs(level="WARNING"):
+                    self.assertIsNone(self._get_snapshot().load(self._integration_ontology, 10000))
+
+
+if __name__ == '__main__':
+    unittest.main()
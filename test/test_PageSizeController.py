@@ -0,0 +1,109 @@
+import threading
+import unittest
+
+import testutils  # noqa: F401 (scripts path)
+from core.io.PageSizeController import PageSizeController
+
+__author__ = "Pierre Monnin"
+
+SHAPE = "?e1 <http://example.org/p> ?e2 . "
+
+
+class PageSizeControllerTest(unittest.TestCase):
+    """
+    Page sizes must be halved by failed, slow or large pages, grow back after successful pages and stay between the
+    minimum and the maximum page sizes
+    """
+
+    def test_decrease(self):
+        controller = PageSizeController(1000, 10.0, 1000000, 100)
+        self.assertEqual(controller.get_page_size(SHAPE), 1000)
+
+        controller.record_failure(SHAPE, 1000)
+        self.assertEqual(controller.get_page_size(SHAPE), 500)
+
+        controller.record_success(SHAPE, 500, 1.0, 2000000)
+        self.assertEqual(controller.get_page_size(SHAPE), 250)
+
+        controller.record_success(SHAPE, 250, 20.0, 1000)
+        self.assertEqual(controller.get_page_size(SHAPE), 125)
+
+        # Other shapes are not changed
+        self.assertEqual(controller.get_page_size(SHAPE + "?e1 a ?c . "), 1000)
+
+    def test_floor(self):
+        controller = PageSizeController(1000, 10.0, 1000000, 300)
+
+        for _ in range(5):
+            controller.record_failure(SHAPE, controller.get_page_size(SHAPE))
+
+        self.assertEqual(controller.get_page_size(SHAPE), 300)
+
+        # A minimum page size above the maximum page size is lowered to it
+        controller = PageSizeController(50, 10.0, 1000000)
+        controller.record_failure(SHAPE, 50)
+        self.assertEqual(controller.get_page_size(SHAPE), 50)
+
+    def test_recovery_and_ceiling(self):
+        controller = PageSizeController(1000, 10.0, 1000000, 100)
+        controller.record_success(SHAPE, 1000, 1.0, 1000)
+        self.assertEqual(controller.get_page_size(SHAPE), 1000)
+
+        controller.record_failure(SHAPE, 1000)
+        controller.record_failure(SHAPE, 500)
+        self.assertEqual(controller.get_page_size(SHAPE), 250)
+
+        page_sizes = []
+        for _ in range(10):
+            controller.record_success(SHAPE, controller.get_page_size(SHAPE), 1.0, 1000)
+            page_sizes.append(controller.get_page_size(SHAPE))
+
+        self.assertEqual(page_sizes, [350, 450, 550, 650, 750, 850, 950, 1000, 1000, 1000])
+
+    def test_concurrent_decreases(self):
+        controller = PageSizeController(1000, 10.0, 1000000, 100)
+        nb_threads = 8
+        barrier = threading.Barrier(nb_threads)
+
+        # Concurrent pages of the same size fail together: the page size is only halved once
+        def fail_page():
+            page_size = controller.get_page_size(SHAPE)
+            barrier.wait()
+            controller.record_failure(SHAPE, page_size)
+
+        threads = [threading.Thread(target=fail_page) for _ in range(nb_threads)]
+        for thread in threads:
+            thread.start()
+
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(controller.get_page_size(SHAPE), 500)
+
+        # A late slow page of the previous size does not decrease it again
+        controller.record_success(SHAPE, 1000, 20.0, 1000)
+        self.assertEqual(controller.get_page_size(SHAPE), 500)
+
+    def test_latency_independent_of_page_size(self):
+        controller = PageSizeController(1000, 10.0, 1000000, 100)
+
+        controller.record_success(SHAPE, 1000, 20.0, 1000)
+        self.assertEqual(controller.get_page_size(SHAPE), 500)
+
+        # Smaller pages that are not faster do not decrease the page size further
+        controller.record_success(SHAPE, 500, 20.0, 1000)
+        controller.record_success(SHAPE, 500, 25.0, 1000)
+        self.assertEqual(controller.get_page_size(SHAPE), 500)
+
+        # Faster but still slow pages do
+        controller.record_success(SHAPE, 500, 15.0, 1000)
+        self.assertEqual(controller.get_page_size(SHAPE), 250)
+
+        # Once pages are fast again, a slow page decreases the page size whatever its latency
+        controller.record_success(SHAPE, 250, 1.0, 1000)
+        controller.record_success(SHAPE, 350, 30.0, 1000)
+        self.assertEqual(controller.get_page_size(SHAPE), 175)
+
+
+if __name__ == '__main__':
+    unittest.main()
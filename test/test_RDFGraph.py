@@ -0,0 +1,121 @@
+import os
+import tempfile
+import unittest
+
+import testutils
+from core.io.CacheManager import CacheManager
+from core.io.DumpReader import DumpReader
+from core.model.RDFGraph import RDFGraph
+
+__author__ = "Pierre Monnin"
+
+EX = "http://example.org/"
+
+
+class RDFGraphTest(unittest.TestCase):
+    """
+    Nodes having the same expanded types must share one interned type set, and the type queries of RDFGraph must
+    answer as the expanded rdf:type adjacency, including for untyped nodes
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        # Many nodes typed by one leaf class, some of them only through owl:sameAs, a node with another class and
+        # untyped nodes, all linked to a relationship
+        cls._sameas_edges = [(EX + "Mid", EX + "MidAlias")] + [(EX + "n%d" % i, EX + "alias%d" % i) for i in range(20)]
+        cls._subclassof_edges = [(EX + "Leaf", EX + "Mid"), (EX + "MidAlias", EX + "Top"), (EX + "Other", EX + "Top")]
+        cls._type_edges = [(EX + "n%d" % i, EX + "Leaf") for i in range(20, 300)] + \
+                          [(EX + "alias%d" % i, EX + "Leaf") for i in range(20)] + \
+                          [(EX + "k", EX + "Leaf"), (EX + "k", EX + "Other")]
+        cls._linked_nodes = [EX + "n%d" % i for i in range(0, 300, 7)] + [EX + "k", EX + "u0", EX + "u1"]
+
+        cls._directory = tempfile.TemporaryDirectory()
+        file_path = os.path.join(cls._directory.name, "graph.nt")
+        with open(file_path, 'w', encoding="utf-8") as file:
+            for predicate, edges in ((testutils.OWL_SAMEAS, cls._sameas_edges),
+                                     (testutils.RDFS_SUBCLASSOF, cls._subclassof_edges),
+                                     (testutils.RDF_TYPE, cls._type_edges),
+                                     (testutils.PGXO + "causes", [(EX + "r", n) for n in cls._linked_nodes])):
+                for s, o in edges:
+                    file.write("<%s> <%s> <%s> .\n" % (s, predicate, o))
+
+        configuration_parameters = testutils.load_test_configuration()
+        cls._cache_manager = CacheManager()
+        cls._rdf_graph = RDFGraph(cls._cache_manager, DumpReader([file_path], cls._cache_manager),
+                                  testutils.load_integration_ontology(configuration_parameters),
+                                  configuration_parameters["part-of-predicates"],
+                                  configuration_parameters["has-part-predicates"],
+                                  configuration_parameters["depends-on-predicates"])
+
+    @classmethod
+    def tearDownClass(cls):
+        cls._directory.cleanup()
+
+    def _get_expected_types(self, node):
+        # Asserted types of the owl:sameAs nodes, expanded with owl:sameAs and rdfs:subClassOf links
+        neighbors = {}
+        for s, o in self._sameas_edges:
+            neighbors.setdefault(s, set()).add(o)
+            neighbors.setdefault(o, set()).add(s)
+
+        same_nodes = {node} | neighbors.get(node, set())
+        for s, o in self._subclassof_edges:
+            neighbors.setdefault(s, set()).add(o)
+
+        types = {o for s, o in self._type_edges if s in same_nodes}
+        queue = list(types)
+        while len(queue) != 0:
+            for n in neighbors.get(queue.pop(), ()):
+                if n not in types:
+                    types.add(n)
+                    queue.append(n)
+
+        return {self._cache_manager.get_element_index(t) for t in types}
+
+    def test_shared_type_set(self):
+        leaf_nodes = [EX + "n%d" % i for i in range(300)] + [EX + "alias%d" % i for i in range(20)]
+        type_sets_ids = {self._rdf_graph.get_node_type_set_id(self._cache_manager.get_element_index(n))
+                         for n in leaf_nodes}
+
+        self.assertEqual(len(type_sets_ids), 1)
+        self.assertNotEqual(type_sets_ids, {-1})
+        self.assertNotIn(self._rdf_graph.get_node_type_set_id(self._cache_manager.get_element_index(EX + "k")),
+                         type_sets_ids)
+
+        for n in (EX + "u0", EX + "r"):
+            self.assertEqual(self._rdf_graph.get_node_type_set_id(self._cache_manager.get_element_index(n)), -1)
+
+        self.assertEqual(self._rdf_graph.get_node_type_set_id(self._cache_manager.get_size() + 1), -1)
+
+    def test_type_adjacency(self):
+        for i in range(self._cache_manager.get_size()):
+            self.assertEqual(self._rdf_graph.get_type_adjacency(i),
+                             self._get_expected_types(self._cache_manager.get_element_from_index(i)))
+
+    def test_nodes_typed_by(self):
+        for class_uri in (EX + "Leaf", EX + "Mid", EX + "MidAlias", EX + "Top", EX + "Other"):
+            class_index = self._cache_manager.get_element_index(class_uri)
+            expected = {i for i in range(self._cache_manager.get_size())
+                        if class_index in self._get_expected_types(self._cache_manager.get_element_from_index(i))}
+
+            self.assertEqual(self._rdf_graph.get_nodes_typed_by(class_uri), expected)
+
+        self.assertEqual(self._rdf_graph.get_nodes_typed_by(EX + "Unknown"), set())
+
+    def test_linking_predicate_adjacency_typed_by(self):
+        r = self._cache_manager.get_element_index(EX + "r")
+        linked_nodes = self._rdf_graph.get_node_linking_predicate_adjacency(r, testutils.PGXO + "causes")
+
+        self.assertEqual(linked_nodes, {self._cache_manager.get_element_index(n) for n in self._linked_nodes})
+
+        for class_uri in (EX + "Leaf", EX + "Top", EX + "Other", EX + "Unknown"):
+            expected = {n for n in linked_nodes if self._cache_manager.is_element_in_cache(class_uri) and
+                        self._cache_manager.get_element_index(class_uri) in
+                        self._get_expected_types(self._cache_manager.get_element_from_index(n))}
+
+            self.assertEqual(self._rdf_graph.get_node_linking_predicate_adjacency_typed_by(
+                r, testutils.PGXO + "causes", class_uri), expected)
+
+
+if __name__ == '__main__':
+    unittest.main()
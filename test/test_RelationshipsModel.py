@@ -0,0 +1,114 @@
+import logging
+import multiprocessing
+import os
+import sys
+import tempfile
+import unittest
+import unittest.mock
+
+import testutils
+from core.io.CacheManager import CacheManager
+from core.io.DumpReader import DumpReader
+from core.io.TTLWriter import TTLWriter
+import merge
+
+__author__ = "Pierre Monnin"
+
+
+class RelationshipsModelTest(unittest.TestCase):
+    """
+    Reconciliations split between processes or shards must give the results of the serial reconciliation
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        cls._directory = tempfile.TemporaryDirectory()
+        cls._configuration_parameters = testutils.load_test_configuration()
+        cls._integration_ontology = testutils.load_integration_ontology(cls._configuration_parameters)
+
+        # Random graphs and the graph of the tests
+        cls._models = []
+        for seed in range(1, 4):
+            file_path = os.path.join(cls._directory.name, "random-%d.nt" % seed)
+            testutils.write_random_graph(file_path, seed)
+            cls._models.append(cls._build_model(file_path))
+
+        file_path = os.path.join(cls._directory.name, "test.nt")
+        testutils.write_test_graph(file_path)
+        cls._models.append(cls._build_model(file_path))
+
+    @classmethod
+    def tearDownClass(cls):
+        cls._directory.cleanup()
+
+    @classmethod
+    def _build_model(cls, file_path):
+        cache_manager = CacheManager()
+        relationships = testutils.build_model(DumpReader([file_path], cache_manager), cache_manager,
+                                              cls._configuration_parameters, cls._integration_ontology,
+                                              dump_file_paths=[file_path])
+
+        return cache_manager, relationships
+
+    @unittest.skipUnless("fork" in multiprocessing.get_all_start_methods(), "reconcile_parallel needs fork")
+    def test_parallel(self):
+        for i, (cache_manager, relationships) in enumerate(self._models):
+            for blocking in (True, False):
+                with self.subTest(model=i, blocking=blocking):
+                    results = list(relationships.reconcile(blocking))
+                    self.assertNotEqual(len(results), 0)
+
+                    for nb_processes in (1, 3):
+                        self.assertEqual(list(relationships.reconcile_parallel(nb_processes, blocking)), results)
+
+    def _merge(self, input_file_paths, output_file_path):
+        logger = logging.getLogger()
+        handlers, level = list(logger.handlers), logger.level
+
+        try:
+            with unittest.mock.patch.object(sys, "argv", ["merge.py", "--output", output_file_path] +
+                                            input_file_paths):
+                merge.main()
+
+        finally:
+            logger.handlers, logger.level = handlers, level
+
+        with open(output_file_path, 'r') as output_file:
+            return output_file.read().splitlines()
+
+    def test_shards(self):
+        for i, (cache_manager, relationships) in enumerate(self._models):
+            results = list(relationships.reconcile())
+            triples = testutils.get_reconciliation_triples(relationships, cache_manager)
+            nb_rows = len(relationships._prepare_reconciliation(False, None)[2])
+
+            for nb_shards in (1, 2, 3):
+                with self.subTest(model=i, nb_shards=nb_shards):
+                    # Shards partition the rows and the results of the unsharded run
+                    rows = []
+                    shards_results = []
+                    file_paths = []
+
+                    for shard_index in range(nb_shards):
+                        rows += relationships._prepare_reconciliation(False, (shard_index, nb_shards))[2]
+                        shards_results += relationships.reconcile(shard=(shard_index, nb_shards))
+
+                        file_paths.append(os.path.join(self._directory.name, "shard-%d.ttl" % shard_index))
+                        ttl_writer = TTLWriter(file_paths[-1])
+                        for uri_1, key, uri_2 in sorted(testutils.get_reconciliation_triples(
+                                relationships, cache_manager, shard=(shard_index, nb_shards))):
+                            ttl_writer.write_triple("<%s>" % uri_1, "<%s>" % key, "<%s>" % uri_2)
+
+                        ttl_writer.close()
+
+                    self.assertEqual(sorted(rows), list(range(nb_rows)))
+                    self.assertCountEqual(shards_results, results)
+
+                    # Merged outputs (with a shard given twice) contain each triple once
+                    lines = self._merge(file_paths + file_paths[:1], os.path.join(self._directory.name, "merged.ttl"))
+                    self.assertEqual(len(lines), len(set(lines)))
+                    self.assertEqual(set(lines), {"<%s> <%s> <%s>." % triple for triple in triples})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,53 @@
+import unittest
+
+import rdflib
+
+import testutils
+from core.io.CacheManager import CacheManager
+from core.io.SelectiveServerManager import SelectiveServerManager
+from core.io.ServerManager import ServerManager
+
+__author__ = "Pierre Monnin"
+
+
+class SelectiveServerManagerTest(unittest.TestCase):
+    """
+    The model built from the part of the RDF graph linked to relationships must give the expected results
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        cls._server, cls._configuration_parameters = testutils.start_test_endpoint([testutils.TEST_ONTOLOGY])
+        cls._configuration_parameters["values-batch-size"] = 1000
+        cls._integration_ontology = testutils.load_integration_ontology(cls._configuration_parameters)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls._server.shutdown()
+        cls._server.server_close()
+
+    def test_model(self):
+        cache_manager = CacheManager()
+
+        with self.assertLogs(level="WARNING") as logs:
+            relationships = testutils.build_model(ServerManager(self._configuration_parameters, 1000), cache_manager,
+                                                  self._configuration_parameters, self._integration_ontology,
+                                                  selective=True, nb_concurrent_queries=4, local_classes=True)
+
+        self.assertTrue(any("--concurrent-queries is ignored" in line for line in logs.output))
+        self.assertEqual(testutils.get_reconciliation_triples(relationships, cache_manager),
+                         testutils.get_expected_test_triples())
+
+    def test_hierarchy(self):
+        server_manager = SelectiveServerManager(ServerManager(self._configuration_parameters, 1000),
+                                                self._configuration_parameters, self._integration_ontology)
+        edges = server_manager._query_subgraph(False)
+
+        # Only the rdfs:subClassOf edges above the types of the queried nodes are queried
+        hierarchy = {(str(s), str(o)) for s, o in self._server.graph.subject_objects(rdflib.RDFS.subClassOf)}
+        self.assertLess(edges[testutils.RDFS_SUBCLASSOF], hierarchy)
+        self.assertNotEqual(len(edges[testutils.RDFS_SUBCLASSOF]), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
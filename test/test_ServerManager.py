@@ -0,0 +1,279 @@
+import os
+import tempfile
+import threading
+import unittest
+import unittest.mock
+
+import rdflib
+import requests
+
+import testutils
+from core.io.ServerManager import ServerManager
+
+__author__ = "Pierre Monnin"
+
+EX = "http://example.org/"
+
+
+class ServerManagerTest(unittest.TestCase):
+    """
+    Paged listings of ServerManager against the stand-in SPARQL endpoint must return each row exactly once, whatever
+    the page size, the ResultSetMaxRows of the server or truncated pages
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        cls._directory = tempfile.TemporaryDirectory()
+        cls._file_path = os.path.join(cls._directory.name, "graph.ttl")
+
+        graph = rdflib.Graph()
+        for i in range(40):
+            graph.add((rdflib.URIRef(EX + "s%d" % (i % 7)), rdflib.URIRef(EX + "p"), rdflib.URIRef(EX + "o%d" % i)))
+
+        # Blank nodes as subjects and objects
+        for i in range(5):
+            graph.add((rdflib.BNode(), rdflib.URIRef(EX + "p"), rdflib.URIRef(EX + "o%d" % i)))
+            graph.add((rdflib.URIRef(EX + "s%d" % i), rdflib.URIRef(EX + "p"), rdflib.BNode()))
+
+        # Literals whose string values need escaping in keyset filters
+        for i, label in enumerate(['a "quoted" label', "back\\slash", "new\nline", "café", "a", "a "]):
+            graph.add((rdflib.URIRef(EX + "s%d" % (i % 2)), rdflib.URIRef(EX + "label"), rdflib.Literal(label)))
+
+        # Distinct terms with the same string value
+        for o in (rdflib.Literal("a"), rdflib.Literal("a", lang="en"), rdflib.Literal("a", lang="fr"),
+                  rdflib.Literal("a", datatype=rdflib.XSD.token), rdflib.URIRef(EX + "o0"), rdflib.Literal(EX + "o0")):
+            graph.add((rdflib.URIRef(EX + "s0"), rdflib.URIRef(EX + "tie"), o))
+
+        # owl:sameAs chains of depth 3 written in both directions, the first one linked to a blank node
+        for i in range(30):
+            graph.add((rdflib.URIRef(EX + "c%d_0" % i), rdflib.OWL.sameAs, rdflib.URIRef(EX + "c%d_1" % i)))
+            graph.add((rdflib.URIRef(EX + "c%d_2" % i), rdflib.OWL.sameAs, rdflib.URIRef(EX + "c%d_1" % i)))
+            graph.add((rdflib.URIRef(EX + "c%d_2" % i), rdflib.OWL.sameAs, rdflib.URIRef(EX + "c%d_3" % i)))
+
+        blank_node = rdflib.BNode()
+        graph.add((rdflib.URIRef(EX + "c0_3"), rdflib.OWL.sameAs, blank_node))
+        graph.add((blank_node, rdflib.OWL.sameAs, rdflib.URIRef(EX + "hidden")))
+
+        graph.serialize(destination=cls._file_path, format="turtle", encoding="utf-8")
+
+        cls._server, cls._configuration_parameters = testutils.start_test_endpoint([cls._file_path])
+        cls._configuration_parameters["max-retries"] = 1
+
+    @classmethod
+    def tearDownClass(cls):
+        cls._server.shutdown()
+        cls._server.server_close()
+        cls._directory.cleanup()
+
+    def _assert_listing(self, server_manager, predicate, server=None):
+        # Blank nodes labels are the ones of the graph of the endpoint
+        graph = (server if server is not None else self._server).graph
+        expected = [(str(s), str(o)) for s, o in graph.subject_objects(rdflib.URIRef(EX + predicate))]
+
+        rows = list(server_manager.query_two_elements_stream("?e1 <%s%s> ?e2 . " % (EX, predicate)))
+
+        self.assertEqual(sorted(rows), sorted(expected))
+
+    def test_page_sizes(self):
+        for max_rows in (2, 7, 1000):
+            with self.subTest(max_rows=max_rows):
+                self._assert_listing(ServerManager(self._configuration_parameters, max_rows), "p")
+
+        for max_rows in (1, 4):
+            with self.subTest(max_rows=max_rows):
+                self._assert_listing(ServerManager(self._configuration_parameters, max_rows), "label")
+
+    def test_same_string_values(self):
+        for max_rows in (1, 2):
+            with self.subTest(max_rows=max_rows):
+                self._assert_listing(ServerManager(self._configuration_parameters, max_rows), "tie")
+
+    def test_single_count(self):
+        server_manager = ServerManager(self._configuration_parameters, 7)
+        try_query = server_manager._try_query
+        queries = []
+
+        def counting_try_query(query):
+            queries.append(query)
+            return try_query(query)
+
+        server_manager._try_query = counting_try_query
+        rows = list(server_manager.query_two_elements_stream("?e1 <%sp> ?e2 . " % EX, verbose=True))
+
+        # One count checks both listings and gives the progress bar total, listings end on pages that are not full
+        self.assertEqual(len([q for q in queries if "count(" in q]), 1)
+        self.assertLessEqual(len(queries), 1 + len(rows) // 7 + 2)
+
+    def test_server_max_rows(self):
+        server, configuration_parameters = testutils.start_test_endpoint([self._file_path], max_rows=4)
+
+        try:
+            self._assert_listing(ServerManager(configuration_parameters, 10), "p", server)
+
+        finally:
+            server.shutdown()
+            server.server_close()
+
+    def test_truncated_page(self):
+        server_manager = ServerManager(self._configuration_parameters, 10)
+        try_query = server_manager._try_query
+        truncated_pages = []
+
+        # Every third page loses its last rows, as a partial result after a timeout
+        def truncating_try_query(query):
+            results = try_query(query)
+
+            if " LIMIT " in query and len(results[0]["results"]["bindings"]) > 3:
+                truncated_pages.append(query)
+
+                if len(truncated_pages) % 3 == 1:
+                    results[0]["results"]["bindings"] = results[0]["results"]["bindings"][:3]
+
+            return results
+
+        server_manager._try_query = truncating_try_query
+        self._assert_listing(server_manager, "p")
+        self.assertGreater(len(truncated_pages), 1)
+
+    def test_concurrent_pages(self):
+        for prefetch_workers, prefetch_window in ((3, None), (2, 1), (2, 0)):
+            with self.subTest(prefetch_workers=prefetch_workers, prefetch_window=prefetch_window):
+                server_manager = ServerManager(self._configuration_parameters, 7, prefetch_workers, prefetch_window)
+                self.assertGreaterEqual(server_manager.prefetch_window, 1)
+                self._assert_listing(server_manager, "p")
+
+    def test_concurrent_server_max_rows(self):
+        server, configuration_parameters = testutils.start_test_endpoint([self._file_path], max_rows=4)
+
+        try:
+            self._assert_listing(ServerManager(configuration_parameters, 10, 3), "p", server)
+
+        finally:
+            server.shutdown()
+            server.server_close()
+
+    def test_values_rows(self):
+        server_manager = ServerManager(self._configuration_parameters, 3)
+        server_manager.values_batch_size = 1
+        values = [EX + "s0", EX + "s1", EX + "s1", "_:b0", 'a "quoted" label']
+
+        with self.assertLogs(level="WARNING") as logs:
+            rows = list(server_manager.query_values_rows(["e1", "e2"], "?e1 <%sp> ?e2 . " % EX, "e1", values))
+
+        self.assertEqual(len(rows), len(set(rows)))
+        self.assertEqual(set(rows), {(str(s), str(o)) for s, o in self._server.graph.subject_objects(
+            rdflib.URIRef(EX + "p")) if str(s) in values})
+        self.assertIn("2 values skipped", logs.output[0])
+
+    def test_sameas_expansion(self):
+        server_manager = ServerManager(self._configuration_parameters, 1000)
+        try_query = server_manager._try_query
+        queries = []
+
+        def counting_try_query(query):
+            queries.append(query)
+            return try_query(query)
+
+        server_manager._try_query = counting_try_query
+        nb_queries = []
+
+        for nb_seeds in (1, 30):
+            with self.subTest(nb_seeds=nb_seeds):
+                del queries[:]
+                with self.assertLogs(level="WARNING"):
+                    expansion = server_manager.sameas_expansion([EX + "c%d_0" % i for i in range(nb_seeds)])
+
+                # The blank node (returned as a bare label) is kept but not expanded
+                self.assertEqual({e for e in expansion if e.startswith(EX)},
+                                 {EX + "c%d_%d" % (i, j) for i in range(nb_seeds) for j in range(4)})
+                self.assertEqual(len([e for e in expansion if not e.startswith(EX)]), 1)
+                self.assertNotIn(EX + "hidden", expansion)
+                nb_queries.append(len(queries))
+
+        # One unpaged query for each level of the expansion, whatever the number of seeds
+        self.assertEqual(nb_queries, [4, 4])
+
+    @staticmethod
+    def _get_response(status_code):
+        response = requests.Response()
+        response.status_code = status_code
+        response.encoding = "utf-8"
+        response._content = b'{"results": {"bindings": []}}'
+
+        return response
+
+    def _query_responses(self, status_codes, max_retries=3):
+        # Each try gets the next response of status_codes, backoff sleeps are recorded instead of slept
+        server_manager = ServerManager(self._configuration_parameters, 10)
+        server_manager.max_retries = max_retries
+        server_manager.retry_backoff = 0.5
+        session = unittest.mock.Mock()
+        session.get.side_effect = [self._get_response(status_code) for status_code in status_codes]
+        server_manager._get_session = lambda: session
+
+        with unittest.mock.patch("core.io.ServerManager.time.sleep") as sleep:
+            try:
+                return server_manager.query_server("select * where { ?s ?p ?o }"), session.get.call_count, \
+                    [call[0][0] for call in sleep.call_args_list]
+
+            except requests.RequestException as e:
+                return e, session.get.call_count, [call[0][0] for call in sleep.call_args_list]
+
+    def test_retries(self):
+        with self.assertLogs(level="CRITICAL"):
+            results, nb_tries, sleeps = self._query_responses([404, 200])
+        self.assertEqual(results, {"results": {"bindings": []}})
+        self.assertEqual((nb_tries, sleeps), (2, [0.5]))
+
+        with self.assertLogs(level="CRITICAL"):
+            results, nb_tries, sleeps = self._query_responses([500, 502, 200])
+        self.assertEqual(results, {"results": {"bindings": []}})
+        self.assertEqual((nb_tries, sleeps), (3, [0.5, 1.0]))
+
+        # Retries are exhausted
+        with self.assertLogs(level="CRITICAL"):
+            error, nb_tries, sleeps = self._query_responses([503] * 4)
+        self.assertIsInstance(error, requests.ConnectionError)
+        self.assertEqual((nb_tries, sleeps), (4, [0.5, 1.0, 2.0]))
+
+        # Other responses are not retried
+        for status_code in (204, 302, 400, 403):
+            with self.subTest(status_code=status_code):
+                with self.assertLogs(level="CRITICAL"):
+                    error, nb_tries, sleeps = self._query_responses([status_code, 200])
+                self.assertIsInstance(error, requests.HTTPError)
+                self.assertEqual(error.response.status_code, status_code)
+                self.assertEqual((nb_tries, sleeps), (1, []))
+
+    def test_thread_sessions(self):
+        server_manager = ServerManager(self._configuration_parameters, 10)
+        sessions = []
+
+        def get_sessions():
+            sessions.append((server_manager._get_session(), server_manager._get_session()))
+
+        threads = [threading.Thread(target=get_sessions) for _ in range(3)]
+        for thread in threads:
+            thread.start()
+
+        for thread in threads:
+            thread.join()
+
+        # One session per thread, all using the same connection pool
+        self.assertTrue(all(s1 is s2 for s1, s2 in sessions))
+        self.assertEqual(len({id(s1) for s1, s2 in sessions}), 3)
+        self.assertTrue(all(s1.get_adapter(self._configuration_parameters["server-address"]) is
+                            server_manager._adapter for s1, s2 in sessions))
+
+    def test_missing_rows(self):
+        server_manager = ServerManager(self._configuration_parameters, 10)
+        query_count_rows = server_manager.query_count_rows
+        server_manager.query_count_rows = lambda variables, where_clause: query_count_rows(variables,
+                                                                                          where_clause) + 1
+
+        with self.assertRaises(requests.ConnectionError):
+            list(server_manager.query_two_elements_stream("?e1 <%sp> ?e2 . " % EX))
+
+
+if __name__ == '__main__':
+    unittest.main()
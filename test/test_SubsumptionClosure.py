@@ -0,0 +1,103 @@
+import random
+import unittest
+
+import testutils  # noqa: F401 (scripts path)
+from core.model.CSRAdjacency import CSRAdjacency
+from core.model.SubsumptionClosure import SubsumptionClosure
+
+__author__ = "Pierre Monnin"
+
+
+class SubsumptionClosureTest(unittest.TestCase):
+    """
+    Closures must be the nodes reached by a breadth-first search following owl:sameAs and rdfs:subClassOf links, with
+    rdfs:subClassOf cycles and owl:sameAs components merging several SCCs
+    """
+
+    @staticmethod
+    def _build(subclassof_edges, sameas_groups):
+        sameas_components = [tuple(sorted(group)) for group in sameas_groups]
+        sameas_component = {n: i for i, group in enumerate(sameas_components) for n in group}
+
+        subclassof = {}
+        for n, m in subclassof_edges:
+            subclassof.setdefault(n, set()).add(m)
+
+        return SubsumptionClosure(sameas_component, sameas_components, CSRAdjacency(subclassof))
+
+    @staticmethod
+    def _bfs(nodes, subclassof_edges, sameas_groups):
+        neighbors = {}
+        for n, m in subclassof_edges:
+            neighbors.setdefault(n, set()).add(m)
+
+        for group in sameas_groups:
+            for n in group:
+                neighbors.setdefault(n, set()).update(group)
+
+        reached = set(nodes)
+        queue = list(nodes)
+        while len(queue) != 0:
+            n = queue.pop(0)
+
+            for m in neighbors.get(n, ()):
+                if m not in reached:
+                    reached.add(m)
+                    queue.append(m)
+
+        return reached
+
+    @staticmethod
+    def _random_hierarchy(seed, nb_nodes=150):
+        generator = random.Random(seed)
+
+        # Mostly a DAG (edges towards smaller nodes) with some back edges creating cycles
+        subclassof_edges = {(n, generator.randrange(n)) for n in range(1, nb_nodes)
+                            for _ in range(generator.choice((1, 1, 1, 2, 3)))}
+        subclassof_edges.update((generator.randrange(nb_nodes), generator.randrange(nb_nodes)) for _ in range(5))
+
+        # owl:sameAs components over nodes of the hierarchy and nodes outside of it
+        nodes = list(range(nb_nodes + 30))
+        generator.shuffle(nodes)
+        sameas_groups = [nodes[i:i + generator.randrange(2, 5)] for i in range(0, 60, 5)]
+
+        return subclassof_edges, sameas_groups
+
+    def _assert_closures(self, subclassof_edges, sameas_groups, nb_nodes):
+        closure = self._build(subclassof_edges, sameas_groups)
+
+        for n in range(nb_nodes):
+            self.assertEqual(closure.get_closure([n]), self._bfs([n], subclassof_edges, sameas_groups))
+
+        for seeds in ([], [3, 5], [0, 7, 7, 20], list(range(0, nb_nodes, 3))):
+            self.assertEqual(closure.get_closure(seeds), self._bfs(seeds, subclassof_edges, sameas_groups))
+
+    def test_cycles(self):
+        # 1 <-> 2 <-> 3 cycle under 0, 4 in a self-loop, 5 -> 6 -> 5 -> 4 and a cycle through a diamond
+        subclassof_edges = {(1, 0), (2, 1), (3, 2), (1, 3), (4, 4), (5, 6), (6, 5), (5, 4), (7, 8), (7, 9), (8, 10),
+                            (9, 10), (10, 7), (10, 0)}
+        self._assert_closures(subclassof_edges, [], 12)
+
+    def test_sameas_merged_sccs(self):
+        # owl:sameAs links 2 and 5 (distinct branches) and 3 and 0 (creating a cycle through the hierarchy)
+        subclassof_edges = {(1, 0), (2, 1), (3, 2), (4, 0), (5, 4), (6, 5), (7, 6)}
+        self._assert_closures(subclassof_edges, [{2, 5}, {3, 0}, {8, 9}], 10)
+
+    def test_random_hierarchies(self):
+        for seed in range(10):
+            with self.subTest(seed=seed):
+                subclassof_edges, sameas_groups = self._random_hierarchy(seed)
+                self._assert_closures(subclassof_edges, sameas_groups, 185)
+
+    def test_shared_chain(self):
+        # Each class of a chain shares the closure of its superclass: one row entry per class
+        nb_nodes = 1000
+        closure = self._build({(n, n - 1) for n in range(1, nb_nodes)}, [])
+
+        self.assertEqual(len(closure._closure_indices), nb_nodes)
+        self.assertEqual(closure.get_closure([nb_nodes - 1]), set(range(nb_nodes)))
+        self.assertEqual(closure.get_closure([500, 10]), set(range(501)))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -37,6 +37,23 @@ if [ ${missing} = "true" ]
 then
     printred "=> Dependencies missing, check log";
 else
+    printgreen "=> Starting unit tests"
+    python3 -m unittest discover -s test
+
+    if [ "$1" = "--stand-in" ]
+    then
+        # Local stand-in SPARQL endpoint at the address of test/test-conf.json, stopped when the tests end
+        python3 test/sparql_endpoint.py --port 8890 test/pgxo+test.owl &
+        endpoint_pid=$!
+        trap 'kill ${endpoint_pid}' EXIT
+
+        until python3 -c "import socket; socket.create_connection(('127.0.0.1', 8890)).close()" 2>/dev/null
+        do
+            kill -0 ${endpoint_pid} 2>/dev/null || { printred "=> Stand-in SPARQL endpoint failed"; exit 1; }
+            sleep 1
+        done
+    fi
+
     printgreen "=> Starting tests"
     python3 src/main.py --configuration test/test-conf.json --max-rows 10000 --integration-ontology test/pgxo+test.owl batch --output test/output.ttl
 
@@ -0,0 +1,237 @@
+import argparse
+import json
+import os
+import random
+import sys
+import threading
+
+import rdflib
+
+# Progress bars of the scripts are not displayed during the tests
+os.environ.setdefault("TQDM_DISABLE", "1")
+
+TEST_DIRECTORY = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(os.path.dirname(TEST_DIRECTORY), "src"))
+
+from core.model.IntegrationOntology import IntegrationOntology  # noqa: E402
+from core.reconciliation.preorders import OrderResult  # noqa: E402
+import main  # noqa: E402
+import sparql_endpoint  # noqa: E402
+
+__author__ = "Pierre Monnin"
+
+TEST_CONFIGURATION = os.path.join(TEST_DIRECTORY, "test-conf.json")
+TEST_ONTOLOGY = os.path.join(TEST_DIRECTORY, "pgxo+test.owl")
+
+PGXO = "http://pgxo.loria.fr/"
+RDF_TYPE = "http://www.w3.org/1999/02/22-rdf-syntax-ns#type"
+RDFS_SUBCLASSOF = "http://www.w3.org/2000/01/rdf-schema#subClassOf"
+OWL_SAMEAS = "http://www.w3.org/2002/07/owl#sameAs"
+OWL_CLASS = "http://www.w3.org/2002/07/owl#Class"
+PART_OF = "http://purl.obolibrary.org/obo/BFO_0000050"
+HAS_PART = "http://purl.obolibrary.org/obo/BFO_0000051"
+DEPENDS_ON = "http://purl.obolibrary.org/obo/RO_0002502"
+
+# Triples expected from the test ontology (see test/testrun.sh and test/documentation-tests.pdf), as
+# (relationship, output predicate key, relationship)
+EXPECTED_TEST_TRIPLES = {
+    ("r1", "equal", "r2"), ("r2", "equal", "r1"), ("r3", "equal", "r1"), ("r1", "equal", "r3"),
+    ("r3", "equal", "r2"), ("r2", "equal", "r3"), ("r5", "leq", "r4"), ("r4", "geq", "r5"),
+    ("r7", "leq", "r6"), ("r6", "geq", "r7"), ("r7", "equal", "r12"), ("r12", "equal", "r7"),
+    ("r12", "leq", "r6"), ("r6", "geq", "r12"), ("r15", "leq", "r6"), ("r6", "geq", "r15"),
+    ("r12", "equiv", "r15"), ("r15", "equiv", "r12"), ("r7", "equiv", "r15"), ("r15", "equiv", "r7"),
+    ("r8", "leq", "r9"), ("r9", "geq", "r8"), ("r10", "leq", "r16"), ("r16", "geq", "r10"),
+    ("r11", "leq", "r10"), ("r10", "geq", "r11"), ("r11", "leq", "r16"), ("r16", "geq", "r11")
+} | {
+    (r1, "do-related", r2) for r in ["r8", "r9", "r15", "r12", "r7", "r6", "r5", "r4", "r3", "r2", "r1", "r14"]
+    for r1, r2 in (("r13", r), (r, "r13"))
+}
+
+
+def load_test_configuration():
+    """
+    Returns the configuration parameters of the tests
+    :return: dictionary of the configuration parameters of test/test-conf.json
+    """
+
+    with open(TEST_CONFIGURATION, 'r') as configuration_file:
+        return json.load(configuration_file)
+
+
+def load_integration_ontology(configuration_parameters):
+    """
+    Returns the integration ontology of the tests
+    :param configuration_parameters: the configuration parameters of the tests
+    :return: the IntegrationOntology built from test/pgxo+test.owl
+    """
+
+    return IntegrationOntology(
+        TEST_ONTOLOGY,
+        {predicate_uri
+         for d in configuration_parameters["dimensions"]
+         for predicate_uri in d["integration-ontology-top-linking-predicates"]}
+    )
+
+
+def start_test_endpoint(file_paths, max_rows=None):
+    """
+    Starts the stand-in SPARQL endpoint (test/sparql_endpoint.py) serving the given files on a free port, in a
+    background thread
+    :param file_paths: RDF files served by the endpoint
+    :param max_rows: maximum number of rows of the results (ResultSetMaxRows), None for no limit
+    :return: a tuple (server, configuration parameters of the tests using the endpoint), stop the server with
+    server.shutdown() and server.server_close()
+    """
+
+    server = sparql_endpoint.create_server(file_paths, 0, max_rows)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    configuration_parameters = load_test_configuration()
+    configuration_parameters["server-address"] = "http://127.0.0.1:%d/sparql" % server.server_address[1]
+    configuration_parameters["retry-backoff"] = 0.0
+
+    return server, configuration_parameters
+
+
+def write_test_graph(file_path, rdf_format="nt"):
+    """
+    Writes the RDF graph of the tests (test/pgxo+test.owl) in another format
+    :param file_path: path of the written file
+    :param rdf_format: rdflib serialization format
+    """
+
+    graph = rdflib.Graph()
+    graph.parse(TEST_ONTOLOGY, format="xml")
+    graph.serialize(destination=file_path, format=rdf_format, encoding="utf-8")
+
+
+def write_random_graph(file_path, seed, nb_relationships=60):
+    """
+    Writes a random N-Triples graph of relationships using the classes and linking predicates of the test ontology:
+    classes hierarchies, owl:sameAs links between relationships, elements and classes, partOf / hasPart and dependsOn
+    links. Phenotype classes are in the comparison ontology of the test configuration (http://pgxo.loria.fr/test/).
+    The classes and properties of the test ontology (without its individuals) are written too, so that elements are
+    typed by the top classes of the dimensions
+    :param file_path: path of the written file
+    :param seed: seed of the random generator
+    :param nb_relationships: number of relationships
+    """
+
+    generator = random.Random(seed)
+
+    # Classes and properties of the test ontology (rdfs:subClassOf hierarchy, linking predicates)
+    ontology = rdflib.Graph()
+    ontology.parse(TEST_ONTOLOGY, format="xml")
+    schema = {s for s, o in ontology.subject_objects(rdflib.RDF.type)
+              if o in (rdflib.OWL.Class, rdflib.OWL.ObjectProperty, rdflib.OWL.DatatypeProperty)}
+    triples = [(str(s), str(p), str(o)) for s, p, o in ontology
+               if s in schema and isinstance(o, rdflib.URIRef)]
+
+    phenotype_classes = [PGXO + "test/C%d" % i for i in range(20)]
+    for i, c in enumerate(phenotype_classes):
+        triples.append((c, RDF_TYPE, OWL_CLASS))
+        if i != 0:
+            triples.append((c, RDFS_SUBCLASSOF, phenotype_classes[generator.randrange(0, i)]))
+
+    triples.append((PGXO + "test/CAlias", OWL_SAMEAS, phenotype_classes[5]))
+
+    genes = [PGXO + "g%d" % i for i in range(10)]
+    drugs = [PGXO + "d%d" % i for i in range(8)]
+    phenotypes = [PGXO + "p%d" % i for i in range(12)]
+
+    for g in genes:
+        triples.append((g, RDF_TYPE, PGXO + generator.choice(["Gene", "Variant", "Haplotype"])))
+
+    for d in drugs:
+        triples.append((d, RDF_TYPE, PGXO + "Drug"))
+
+    for p in phenotypes:
+        triples.append((p, RDF_TYPE, PGXO + generator.choice(["Phenotype", "Disease"])))
+        for c in generator.sample(phenotype_classes, generator.randint(0, 2)):
+            triples.append((p, RDF_TYPE, c))
+
+    for _ in range(6):
+        g1, g2 = generator.sample(genes, 2)
+        triples.append((g1, PART_OF, g2))
+
+    for _ in range(2):
+        triples.append((generator.choice(genes), HAS_PART, generator.choice(genes)))
+
+    for _ in range(6):
+        triples.append((generator.choice(phenotypes), DEPENDS_ON, generator.choice(drugs + genes)))
+
+    triples += [(PGXO + "p0", OWL_SAMEAS, PGXO + "p0x"), (PGXO + "p0x", RDF_TYPE, PGXO + "Phenotype"),
+                (PGXO + "d0", OWL_SAMEAS, PGXO + "d0x"), (PGXO + "d0x", OWL_SAMEAS, PGXO + "d0y")]
+
+    linking_predicates = [PGXO + "isAssociatedWith", PGXO + "isNotAssociatedWith", PGXO + "causes",
+                          PGXO + "isCausedBy"]
+    for r in range(nb_relationships):
+        relationship = PGXO + "rel%d" % r
+        triples.append((relationship, RDF_TYPE, PGXO + "PharmacogenomicRelationship"))
+
+        for pool in (genes, drugs, phenotypes):
+            for e in generator.sample(pool, generator.randint(0, 2)):
+                triples.append((relationship, generator.choice(linking_predicates), e))
+
+    triples.append((PGXO + "rel0", OWL_SAMEAS, PGXO + "rel1"))
+
+    with open(file_path, 'w', encoding="utf-8") as file:
+        for s, p, o in triples:
+            file.write("<%s> <%s> <%s> .\n" % (s, p, o))
+
+
+def build_model(server_manager, cache_manager, configuration_parameters, integration_ontology, **options):
+    """
+    Builds the relationships model as main.py does
+    :param server_manager: the ServerManager or DumpReader used to build the RDF graph
+    :param cache_manager: the CacheManager of the model
+    :param configuration_parameters: the configuration parameters of the tests
+    :param integration_ontology: the integration ontology of the tests
+    :param options: command line options overriding the defaults (e.g., selective=True)
+    :return: the RelationshipsModel
+    """
+
+    args = argparse.Namespace(selective=False, dump_file_paths=None, nb_concurrent_queries=1, nb_threads=1,
+                              local_classes=False, comparison_cache_size=10000)
+
+    for option, value in options.items():
+        setattr(args, option, value)
+
+    return main.build_model(args, configuration_parameters, cache_manager, server_manager, integration_ontology)
+
+
+def get_reconciliation_triples(relationships, cache_manager, **reconcile_options):
+    """
+    Returns the triples written by main.py for the results of the reconciliation, with output predicates keys
+    :param relationships: the RelationshipsModel
+    :param cache_manager: the CacheManager of the model
+    :param reconcile_options: options of RelationshipsModel.reconcile (blocking, shard)
+    :return: set of triples (URI, output predicate key, URI)
+    """
+
+    keys = {
+        OrderResult.EQUAL: ("equal", "equal"),
+        OrderResult.EQUIVALENT: ("equiv", "equiv"),
+        OrderResult.LEQ: ("leq", "geq"),
+        OrderResult.GEQ: ("geq", "leq"),
+        OrderResult.DO_RELATED: ("do-related", "do-related")
+    }
+
+    triples = set()
+    for uri_index_1, order_result, uri_index_2 in relationships.reconcile(**reconcile_options):
+        uri_1 = cache_manager.get_element_from_index(uri_index_1)
+        uri_2 = cache_manager.get_element_from_index(uri_index_2)
+
+        triples.add((uri_1, keys[order_result][0], uri_2))
+        triples.add((uri_2, keys[order_result][1], uri_1))
+
+    return triples
+
+
+def get_expected_test_triples():
+    """
+    Returns the triples expected from the test ontology, with full URIs
+    :return: set of triples (URI, output predicate key, URI)
+    """
+
+    return {(PGXO + r1, key, PGXO + r2) for r1, key, r2 in EXPECTED_TEST_TRIPLES}